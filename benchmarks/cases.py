@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+
+"""The benchmark cases: one (or more) kiara operation runs for every module in this package.
+
+Every case has a name of the form '<operation>[<size>-<variant>]', which is also the key its baseline is stored under.
+Input data is only created when a case actually runs, and re-used between cases of the same size.
+"""
+
+import functools
+import os
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple
+
+from generators import (
+    NETWORK_KINDS,
+    create_corpus,
+    create_network,
+    tokenize,
+    write_csv_files,
+    write_gml,
+    write_text_files,
+)
+
+# the parameters of the generated data, per size
+SIZES: Dict[str, Dict[str, int]] = {
+    "small": {"num_nodes": 200, "avg_degree": 4, "num_documents": 200},
+    "medium": {"num_nodes": 2000, "avg_degree": 6, "num_documents": 5000},
+    "large": {"num_nodes": 20000, "avg_degree": 8, "num_documents": 100000},
+}
+DEFAULT_SIZES = ("small", "medium")
+
+# the number of source nodes to use for the shortest path based measures on large networks
+LARGE_NETWORK_SAMPLE_SIZE = 500
+
+
+class BenchmarkCase(NamedTuple):
+
+    name: str
+    operation: str
+    create_inputs: Callable[[], Dict[str, Any]]
+
+
+@functools.lru_cache(maxsize=None)
+def network(size: str, kind: str):
+    params = SIZES[size]
+    return create_network(kind, params["num_nodes"], params["avg_degree"])
+
+
+@functools.lru_cache(maxsize=None)
+def corpus(size: str, with_metadata: bool = False):
+    return create_corpus(SIZES[size]["num_documents"], with_metadata=with_metadata)
+
+
+def network_cases(size: str, work_dir: str) -> Iterator[BenchmarkCase]:
+
+    sampled = {"sample_size": LARGE_NETWORK_SAMPLE_SIZE} if size == "large" else {}
+
+    for kind in NETWORK_KINDS:
+        variant = f"{size}-{kind}"
+
+        def inputs(kind: str = kind, **extra: Any) -> Callable[[], Dict[str, Any]]:
+            return lambda: {"network_data": network(size, kind), **extra}
+
+        # modules/caitlin
+        yield BenchmarkCase(
+            f"create.degree_rank_list[{variant}]",
+            "create.degree_rank_list",
+            inputs(),
+        )
+        yield BenchmarkCase(
+            f"create.betweenness_rank_list[{variant}]",
+            "create.betweenness_rank_list",
+            inputs(**sampled),
+        )
+        yield BenchmarkCase(
+            f"create.eigenvector_rank_list[{variant}]",
+            "create.eigenvector_rank_list",
+            inputs(),
+        )
+        yield BenchmarkCase(
+            f"create.closeness_rank_list[{variant}]",
+            "create.closeness_rank_list",
+            inputs(**sampled),
+        )
+        yield BenchmarkCase(
+            f"create.centrality_rank_list[{variant}]",
+            "create.centrality_rank_list",
+            inputs(**sampled),
+        )
+        yield BenchmarkCase(
+            f"create.cut_point_list[{variant}]",
+            "create.cut_point_list",
+            inputs(),
+        )
+
+        # modules/lena
+        yield BenchmarkCase(
+            f"compute.modularity_group[{variant}]",
+            "compute.modularity_group",
+            inputs(),
+        )
+        yield BenchmarkCase(
+            f"compute.louvain_group[{variant}]",
+            "compute.louvain_group",
+            inputs(seed=1),
+        )
+        yield BenchmarkCase(
+            f"graph_components[{variant}]", "graph_components", inputs()
+        )
+
+        def gml_inputs(kind: str = kind) -> Dict[str, Any]:
+            path = os.path.join(work_dir, f"{size}-{kind}.gml")
+            if not os.path.exists(path):
+                write_gml(network(size, kind), path)
+            return {"file": path, "label": "id"}
+
+        yield BenchmarkCase(
+            f"onboard.gml_file[{variant}]", "onboard.gml_file", gml_inputs
+        )
+
+        def csv_inputs(kind: str = kind) -> Dict[str, Any]:
+            edges_path = os.path.join(work_dir, f"{size}-{kind}-edges.csv")
+            nodes_path = os.path.join(work_dir, f"{size}-{kind}-nodes.csv")
+            if not os.path.exists(edges_path):
+                write_csv_files(network(size, kind), edges_path, nodes_path)
+            return {"edges_file": edges_path, "nodes_file": nodes_path}
+
+        yield BenchmarkCase(
+            f"onboard.network_files[{variant}]", "onboard.network_files", csv_inputs
+        )
+
+
+def corpus_cases(size: str, work_dir: str) -> Iterator[BenchmarkCase]:
+
+    variant = f"{size}-corpus"
+
+    # modules/mariella
+    def text_files_inputs() -> Dict[str, Any]:
+        folder = os.path.join(work_dir, f"{size}-corpus")
+        if not os.path.exists(folder):
+            write_text_files(corpus(size), folder)
+        return {"path": folder}
+
+    yield BenchmarkCase(
+        f"onboard.text_corpus[{variant}]", "onboard.text_corpus", text_files_inputs
+    )
+    yield BenchmarkCase(
+        f"playground.tm_dash.file_name_metadata[{variant}]",
+        "playground.tm_dash.file_name_metadata",
+        lambda: {"table_input": corpus(size), "column_name": "file_name"},
+    )
+
+    def map_column_inputs() -> Dict[str, Any]:
+        table = corpus(size, with_metadata=True)
+        refs = table.column("publication").unique().to_pylist()
+        return {
+            "table_input": table,
+            "column_name": "publication",
+            "mapping_keys": [refs, [f"Publication {ref}" for ref in refs]],
+            "output_col_name": "publication_name",
+        }
+
+    yield BenchmarkCase(
+        f"playground.parse.date_array[{variant}]",
+        "playground.parse.date_array",
+        lambda: {
+            "array": corpus(size).column("file_name"),
+            "min_index": 11,
+            "max_index": 21,
+        },
+    )
+    yield BenchmarkCase(
+        f"playground.tm_dash.map_column[{variant}]",
+        "playground.tm_dash.map_column",
+        map_column_inputs,
+    )
+    yield BenchmarkCase(
+        f"playground.tm_dash.table_sample[{variant}]",
+        "playground.tm_dash.table_sample",
+        lambda: {"table_input": corpus(size)},
+    )
+    yield BenchmarkCase(
+        f"playground.tm_dash.add_column[{variant}]",
+        "playground.tm_dash.add_column",
+        lambda: {"table_input": corpus(size), "array_input": tokenize(corpus(size))},
+    )
+    yield BenchmarkCase(
+        f"playground.tm_dash.viz_data_query[{variant}]",
+        "playground.tm_dash.viz_data_query",
+        lambda: {"query_type": "month", "column": "publication"},
+    )
+    yield BenchmarkCase(
+        f"playground.tm_dash.viz_data[{variant}]",
+        "playground.tm_dash.viz_data",
+        lambda: {
+            "table_input": corpus(size, with_metadata=True),
+            "query_type": "month",
+        },
+    )
+    yield BenchmarkCase(
+        f"playground.get_lineage_data[{variant}]",
+        "playground.get_lineage_data",
+        lambda: {"table": corpus(size, with_metadata=True)},
+    )
+
+
+def create_cases(sizes: List[str], work_dir: str) -> List[BenchmarkCase]:
+    """Create all benchmark cases for the given sizes."""
+
+    cases = []
+    for size in sizes:
+        if size not in SIZES:
+            raise ValueError(
+                f"Invalid benchmark size '{size}', must be one of: {', '.join(SIZES)}"
+            )
+        cases.extend(network_cases(size, work_dir))
+        cases.extend(corpus_cases(size, work_dir))
+    return cases
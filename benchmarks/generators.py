@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+
+"""Synthetic input data for the benchmarks: networks and text corpora of (more or less) arbitrary size.
+
+Everything in here is seeded, so the same arguments always create the same data.
+"""
+
+import datetime
+from typing import List
+
+import networkx as nx
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from kiara_plugin.network_analysis.models import NetworkData
+
+NETWORK_KINDS = ("erdos_renyi", "barabasi_albert", "multi_weighted")
+
+# the share of edges that are duplicated for the 'multi_weighted' networks
+PARALLEL_EDGE_SHARE = 0.2
+
+
+def create_network(
+    kind: str, num_nodes: int, avg_degree: int, seed: int = 1
+) -> NetworkData:
+    """Create a network.
+
+    Arguments:
+        kind: 'erdos_renyi' (G(n, m) random graph), 'barabasi_albert' (preferential attachment, so a few hubs with a
+            high degree), or 'multi_weighted' (Erdős–Rényi, with some parallel edges and a 'weight' column)
+        num_nodes: the number of nodes
+        avg_degree: the (approximate) average degree of a node
+        seed: the random seed
+    """
+
+    if kind == "erdos_renyi":
+        G = nx.gnm_random_graph(num_nodes, num_nodes * avg_degree // 2, seed=seed)
+        sources, targets = edge_arrays(G)
+    elif kind == "barabasi_albert":
+        G = nx.barabasi_albert_graph(num_nodes, max(1, avg_degree // 2), seed=seed)
+        sources, targets = edge_arrays(G)
+    elif kind == "multi_weighted":
+        rng = np.random.default_rng(seed)
+        G = nx.gnm_random_graph(num_nodes, num_nodes * avg_degree // 2, seed=seed)
+        sources, targets = edge_arrays(G)
+        parallel = rng.choice(
+            len(sources), int(len(sources) * PARALLEL_EDGE_SHARE), replace=False
+        )
+        sources = np.concatenate([sources, sources[parallel]])
+        targets = np.concatenate([targets, targets[parallel]])
+    else:
+        raise ValueError(
+            f"Invalid network kind '{kind}', must be one of: {', '.join(NETWORK_KINDS)}"
+        )
+
+    nodes_table = pa.table(
+        {
+            "_node_id": pa.array(np.arange(num_nodes, dtype=np.int64)),
+            "_label": pa.array([f"node_{i}" for i in range(num_nodes)]),
+        }
+    )
+    edges = {"_source": pa.array(sources), "_target": pa.array(targets)}
+    if kind == "multi_weighted":
+        rng = np.random.default_rng(seed + 1)
+        edges["weight"] = pa.array(rng.integers(1, 10, len(sources)).astype(np.float64))
+
+    return NetworkData.create_network_data(
+        nodes_table=nodes_table, edges_table=pa.table(edges)
+    )
+
+
+def edge_arrays(G: nx.Graph):
+
+    edges = np.array(list(G.edges()), dtype=np.int64).reshape(-1, 2)
+    return edges[:, 0], edges[:, 1]
+
+
+def write_gml(network_data: NetworkData, path: str) -> str:
+    """Write a network to a GML file (integer node ids, plus a 'label' and an edge 'weight' attribute), and return the path."""
+
+    nodes_table = network_data.nodes.arrow_table
+    edges_table = network_data.edges.arrow_table
+
+    G = nx.MultiGraph()
+    G.add_nodes_from(
+        (node_id, {"label": label})
+        for node_id, label in zip(
+            nodes_table.column("_node_id").to_pylist(),
+            nodes_table.column("_label").to_pylist(),
+        )
+    )
+    weights = (
+        edges_table.column("weight").to_pylist()
+        if "weight" in edges_table.column_names
+        else [1.0] * edges_table.num_rows
+    )
+    G.add_edges_from(
+        (source, target, {"weight": weight})
+        for source, target, weight in zip(
+            edges_table.column("_source").to_pylist(),
+            edges_table.column("_target").to_pylist(),
+            weights,
+        )
+    )
+    nx.write_gml(G, path)
+    return path
+
+
+def write_csv_files(
+    network_data: NetworkData, edges_path: str, nodes_path: str
+) -> None:
+    """Write a network to an edge list and a node list CSV file ('Source'/'Target'/'weight' and 'Id'/'Label' columns)."""
+
+    import pyarrow.csv as csv
+
+    nodes_table = network_data.nodes.arrow_table
+    edges_table = network_data.edges.arrow_table
+
+    edges = {
+        "Source": edges_table.column("_source"),
+        "Target": edges_table.column("_target"),
+    }
+    if "weight" in edges_table.column_names:
+        edges["weight"] = edges_table.column("weight")
+    csv.write_csv(pa.table(edges), edges_path)
+    csv.write_csv(
+        pa.table(
+            {
+                "Id": nodes_table.column("_node_id"),
+                "Label": nodes_table.column("_label"),
+            }
+        ),
+        nodes_path,
+    )
+
+
+def write_text_files(corpus: pa.Table, folder: str) -> None:
+    """Write the documents of a corpus to text files in a folder, in sub-folders of (at most) 1000 files each."""
+
+    import os
+
+    file_names = corpus.column("file_name").to_pylist()
+    contents = corpus.column("content").to_pylist()
+    for i, (file_name, content) in enumerate(zip(file_names, contents)):
+        sub_folder = os.path.join(folder, f"batch_{i // 1000:04d}")
+        os.makedirs(sub_folder, exist_ok=True)
+        with open(os.path.join(sub_folder, file_name), "w", encoding="utf-8") as f:
+            f.write(content)
+
+
+def create_vocabulary(num_words: int, seed: int = 1) -> List[str]:
+
+    rng = np.random.default_rng(seed)
+    letters = np.array(list("abcdefghijklmnopqrstuvwxyz"))
+    lengths = rng.integers(2, 10, num_words)
+    return ["".join(rng.choice(letters, length)) for length in lengths]
+
+
+def create_corpus(
+    num_documents: int,
+    words_per_document: int = 200,
+    num_publications: int = 20,
+    with_metadata: bool = False,
+    seed: int = 1,
+) -> pa.Table:
+    """Create a corpus table, with LCCN style file names and a 'content' column.
+
+    File names follow the pattern '<publication ref>_<date>_ed-1_seq-<n>_ocr.txt', as expected by the
+    'playground.tm_dash.file_name_metadata' module. Words are drawn from a Zipf distribution, so the word frequencies
+    look a bit like natural language.
+
+    Arguments:
+        num_documents: the number of documents (rows)
+        words_per_document: the number of words per document
+        num_publications: the number of different publication references
+        with_metadata: also add the 'date' and 'publication' columns (what 'file_name_metadata' would extract)
+        seed: the random seed
+    """
+
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array(create_vocabulary(5000, seed=seed))
+
+    publications = np.array(
+        [f"sn{86000000 + i * 1013}" for i in range(num_publications)]
+    )
+    publication_idx = rng.integers(0, num_publications, num_documents)
+
+    start = datetime.date(1850, 1, 1)
+    days = rng.integers(0, 365 * 70, num_documents)
+    dates = [start + datetime.timedelta(days=int(d)) for d in days]
+
+    file_names = [
+        f"{publications[p]}_{date.isoformat()}_ed-1_seq-{i % 12 + 1}_ocr.txt"
+        for i, (p, date) in enumerate(zip(publication_idx, dates))
+    ]
+
+    word_idx = (
+        np.minimum(rng.zipf(1.3, num_documents * words_per_document), len(vocabulary))
+        - 1
+    )
+    words = vocabulary[word_idx].reshape(num_documents, words_per_document)
+    content = [" ".join(row) for row in words]
+
+    columns = {"file_name": pa.array(file_names), "content": pa.array(content)}
+    if with_metadata:
+        columns["date"] = pa.array(dates, type=pa.date32())
+        columns["publication"] = pa.array(publications[publication_idx])
+    return pa.table(columns)
+
+
+def tokenize(corpus: pa.Table) -> pa.Array:
+    """Split the 'content' column of a corpus into (whitespace separated) tokens."""
+
+    return pc.split_pattern(corpus.column("content"), pattern=" ").combine_chunks()
@@ -0,0 +1,356 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Run the benchmarks for the modules in this package, and compare the results against a stored baseline.
+
+Usage examples:
+
+    # run the default sizes, compare against 'benchmarks/baseline.json' (if it exists)
+    python benchmarks/run_benchmarks.py
+
+    # only the network modules, on medium sized networks, and store the results as the new baseline
+    python benchmarks/run_benchmarks.py --sizes medium --filter rank_list --save-baseline
+
+The run fails (exit code 1) if a case got slower, or used more memory, than its baseline by more than the threshold.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Set, Union
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE_PATH = os.path.join(BENCHMARKS_DIR, "baseline.json")
+
+# results are only compared if the baseline time is at least this long, shorter runs are mostly noise
+MIN_COMPARABLE_TIME = 0.05
+# an increase in peak memory is only reported if it is at least this big (in bytes)
+MIN_MEMORY_INCREASE = 1024 * 1024
+# how often (in seconds) the Arrow allocations and the resident set size are sampled during a run
+MEMORY_SAMPLE_INTERVAL = 0.002
+
+# the memory metrics of a result: Python allocations (as traced by 'tracemalloc', which doesn't see Arrow buffers or
+# other C allocations), bytes allocated by the Arrow memory pool, and the resident set size of the process; all
+# measured as the peak increase during a run
+MEMORY_METRICS = {
+    "peak_memory": "peak Python memory",
+    "peak_arrow_memory": "peak Arrow memory",
+    "peak_rss": "peak RSS",
+}
+
+_WARMED_UP_OPERATIONS: Set[str] = set()
+
+
+def _rss_reader() -> Union[Callable[[], int], None]:
+    """Return a function that returns the current resident set size of this process, if there is a way to get it."""
+
+    try:
+        import psutil
+
+        process = psutil.Process()
+        return lambda: process.memory_info().rss
+    except ImportError:
+        pass
+
+    if os.path.exists("/proc/self/statm"):
+        page_size = os.sysconf("SC_PAGE_SIZE")
+
+        def read_statm() -> int:
+            with open("/proc/self/statm", encoding="ascii") as f:
+                return int(f.read().split()[1]) * page_size
+
+        return read_statm
+    return None
+
+
+class MemorySampler(object):
+    """Samples the bytes allocated by the Arrow memory pool, and the resident set size, in a background thread.
+
+    Unlike 'tracemalloc', this includes Arrow buffers, and (for the RSS) all other allocations of C libraries. The
+    peaks are reported as the increase over the values at the start.
+    """
+
+    def __init__(self, interval: float = MEMORY_SAMPLE_INTERVAL):
+
+        import pyarrow as pa
+
+        self.interval: float = interval
+        self._arrow_pool = pa.default_memory_pool()
+        self._read_rss = _rss_reader()
+        self._stop = threading.Event()
+        self._thread: Union[threading.Thread, None] = None
+        self._start_values: Dict[str, int] = {}
+        self._peaks: Dict[str, int] = {}
+
+    def _sample(self) -> Dict[str, int]:
+
+        values = {"peak_arrow_memory": self._arrow_pool.bytes_allocated()}
+        if self._read_rss is not None:
+            values["peak_rss"] = self._read_rss()
+        return values
+
+    def _update(self) -> None:
+
+        for key, value in self._sample().items():
+            if value > self._peaks[key]:
+                self._peaks[key] = value
+
+    def _run(self) -> None:
+
+        while not self._stop.wait(self.interval):
+            self._update()
+
+    def __enter__(self) -> "MemorySampler":
+
+        self._start_values = self._sample()
+        self._peaks = dict(self._start_values)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._update()
+
+    def peaks(self) -> Dict[str, int]:
+        return {key: self._peaks[key] - self._start_values[key] for key in self._peaks}
+
+
+def measure(
+    kiara: Any, operation: str, inputs: Dict[str, Any], repeat: int
+) -> Dict[str, Any]:
+    """Run an operation several times, and return the minimum and median run time, and the peak memory use."""
+
+    # the first run of an operation includes imports and first-time setup in kiara, so it is not measured
+    if operation not in _WARMED_UP_OPERATIONS:
+        kiara.run_job(operation, inputs=inputs, comment="benchmark")
+        _WARMED_UP_OPERATIONS.add(operation)
+
+    # memory is measured in a separate run, since tracing allocations slows everything down
+    sampler = MemorySampler()
+    tracemalloc.start()
+    try:
+        with sampler:
+            kiara.run_job(operation, inputs=inputs, comment="benchmark")
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        kiara.run_job(operation, inputs=inputs, comment="benchmark")
+        times.append(time.perf_counter() - start)
+
+    return {
+        "time": min(times),
+        "median_time": statistics.median(times),
+        "peak_memory": peak_memory,
+        **sampler.peaks(),
+    }
+
+
+def compare(
+    result: Dict[str, Any],
+    baseline: Union[Dict[str, Any], None],
+    threshold: float,
+    memory_threshold: float,
+) -> List[str]:
+    """Return a list of regressions of a result compared to its baseline."""
+
+    if not baseline or result.get("status") != "ok" or baseline.get("status") != "ok":
+        return []
+
+    regressions = []
+    if baseline["time"] >= MIN_COMPARABLE_TIME and result["time"] > baseline["time"] * (
+        1 + threshold
+    ):
+        regressions.append(
+            f"time {result['time']:.3f}s > baseline {baseline['time']:.3f}s (+{threshold:.0%})"
+        )
+    for metric, description in MEMORY_METRICS.items():
+        # baselines created before a metric was added don't have it
+        if metric not in result or metric not in baseline:
+            continue
+        if result[metric] - baseline[metric] >= MIN_MEMORY_INCREASE and result[
+            metric
+        ] > baseline[metric] * (1 + memory_threshold):
+            regressions.append(
+                f"{description} {format_bytes(result[metric])} > baseline {format_bytes(baseline[metric])} (+{memory_threshold:.0%})"
+            )
+    return regressions
+
+
+def format_bytes(num: float) -> str:
+
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(num) < 1024 or unit == "GB":
+            return f"{num:.1f}{unit}"
+        num /= 1024
+    return f"{num:.1f}GB"
+
+
+def load_baseline(path: str) -> Dict[str, Any]:
+
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(path: str, results: Dict[str, Dict[str, Any]]) -> None:
+    """Merge the results into the baseline file, so partial runs only update their own cases."""
+
+    baseline = load_baseline(path)
+    baseline.setdefault("cases", {}).update(results)
+    baseline["machine"] = {
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+
+
+def create_benchmark_api(base_path: str) -> Any:
+    """Create a kiara API with a new, empty context in 'base_path', so benchmark runs don't end up in the user's data store.
+
+    The API is also made the default instance, since some modules (like the lineage ones) use 'KiaraAPI.instance()'
+    to look up values.
+    """
+
+    from kiara.api import KiaraAPI
+    from kiara.context import KiaraConfig
+
+    kiara = KiaraAPI(kiara_config=KiaraConfig.create_in_folder(base_path))
+    KiaraAPI._default_instance = kiara
+    return kiara
+
+
+def main(argv: Union[List[str], None] = None) -> int:
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--sizes",
+        default=None,
+        help="comma separated list of sizes to run (small, medium, large)",
+    )
+    parser.add_argument(
+        "--filter", default=None, help="only run cases whose name contains this string"
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="number of timed runs per case (default: 3)",
+    )
+    parser.add_argument(
+        "--baseline", default=DEFAULT_BASELINE_PATH, help="path to the baseline file"
+    )
+    parser.add_argument(
+        "--save-baseline", action="store_true", help="store the results as new baseline"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.5,
+        help="allowed slowdown compared to the baseline (default: 0.5, i.e. 50%%)",
+    )
+    parser.add_argument(
+        "--memory-threshold",
+        type=float,
+        default=0.25,
+        help="allowed increase in peak memory compared to the baseline (default: 0.25)",
+    )
+    parser.add_argument(
+        "--output", default=None, help="also write the results to this (json) file"
+    )
+    args = parser.parse_args(argv)
+
+    # results of earlier runs must not be re-used
+    os.environ["KIARA_PLAYGROUND_CACHE_MAX_SIZE"] = "0"
+
+    from cases import DEFAULT_SIZES, create_cases
+
+    sizes = args.sizes.split(",") if args.sizes else list(DEFAULT_SIZES)
+    baseline = load_baseline(args.baseline).get("cases", {})
+
+    results: Dict[str, Dict[str, Any]] = {}
+    failed: List[str] = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        kiara = create_benchmark_api(os.path.join(work_dir, "kiara"))
+        cases = [
+            case
+            for case in create_cases(sizes, work_dir)
+            if not args.filter or args.filter in case.name
+        ]
+        print(  # noqa: T201
+            f"{'case':<70} {'time':>10} {'python':>10} {'arrow':>10} {'rss':>10}"
+        )
+        for case in cases:
+            try:
+                inputs = case.create_inputs()
+                result = {
+                    "status": "ok",
+                    **measure(kiara, case.operation, inputs, args.repeat),
+                }
+            except Exception as e:
+                result = {
+                    "status": "error",
+                    "error": str(e).splitlines()[0] if str(e) else type(e).__name__,
+                }
+            results[case.name] = result
+
+            if result["status"] != "ok":
+                print(f"{case.name:<70} ERROR: {result['error']}")  # noqa: T201
+                # a case that worked before must not start failing
+                if baseline.get(case.name, {}).get("status") == "ok":
+                    failed.append(case.name)
+                continue
+
+            regressions = compare(
+                result, baseline.get(case.name), args.threshold, args.memory_threshold
+            )
+            memory = " ".join(
+                f"{format_bytes(result[metric]) if metric in result else '-':>10}"
+                for metric in MEMORY_METRICS
+            )
+            line = f"{case.name:<70} {result['time']:>9.3f}s {memory}"
+            if case.name in baseline and baseline[case.name].get("status") == "ok":
+                line += f"  ({result['time'] / max(baseline[case.name]['time'], 1e-9):.2f}x baseline)"
+            print(line)  # noqa: T201
+            for regression in regressions:
+                print(f"    REGRESSION: {regression}")  # noqa: T201
+            if regressions:
+                failed.append(case.name)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.save_baseline:
+        save_baseline(args.baseline, results)
+        print(f"Baseline saved to: {args.baseline}")  # noqa: T201
+
+    if failed:
+        print(  # noqa: T201
+            f"\n{len(failed)} case(s) regressed compared to their baseline: {', '.join(failed)}"
+        )
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, BENCHMARKS_DIR)
+    sys.exit(main())
@@ -1,9 +1,27 @@
+from concurrent.futures import ThreadPoolExecutor
 from kiara.api import KiaraModule
-import networkx as nx
-from operator import itemgetter
-import pandas as pd
+from kiara.exceptions import KiaraProcessingException
+from typing import Union
+import pyarrow as pa
 
 from kiara_plugin.network_analysis.models import NetworkData
+from kiara_plugin.playground.utils.cache import cached_process
+from kiara_plugin.playground.utils.centrality import (
+    calculate_betweenness,
+    calculate_closeness,
+    calculate_eigenvector,
+)
+from kiara_plugin.playground.utils.networks import (
+    DEFAULT_WEIGHT_COLUMN_NAME,
+    RANK_METHODS,
+    NetworkArrays,
+    augment_network_data,
+    calculate_degree,
+    calculate_weighted_degree,
+    create_ranking_table,
+    rank_nodes,
+    read_node_column,
+)
 
 
 KIARA_METADATA = {
@@ -13,12 +31,16 @@ KIARA_METADATA = {
     "description": "Kiara modules for: network_analysis",
 }
 
+CENTRALITY_MEASURES = ('degree', 'betweenness', 'eigenvector', 'closeness')
+# measures that calculate in their own pool of worker processes
+POOL_MEASURES = ('betweenness', 'closeness')
+
 class Degree_Ranking(KiaraModule):
     """Creates an ordered table with the rank and raw score for degree and weighted degree.
     Unweighted degree centrality uses an undirected graph and measures the number of independent connections each node has.
     Weighted degree centrality uses a directed graph and measures the total number of connections or weight attached to a node.
     
-    Uses networkx degree.
+    Degrees are computed directly from the edges table (grouped counts over integer node ids), the results are the same as networkx degree.
     https://networkx.org/documentation/stable/reference/generated/networkx.classes.function.degree.html"""
     
     _module_type_name = 'create.degree_rank_list'
@@ -29,6 +51,16 @@ class Degree_Ranking(KiaraModule):
                 "type": "network_data",
                 "doc": "The network graph being queried."
             },
+            "rank_method": {
+                "type": "string",
+                "default": "competition",
+                "doc": "How nodes with tied scores are ranked: 'competition' (1224), 'dense' (1223) or 'ordinal' (1234)."
+            },
+            "top_k": {
+                "type": "integer",
+                "doc": "Only include the k highest ranked nodes in the result table. The updated network data always contains the scores of all nodes.",
+                "optional": True
+            },
             "weighted_degree":{
                 "type": "boolean",
                 "default": True,
@@ -45,7 +77,7 @@ class Degree_Ranking(KiaraModule):
         return {
             "network_result": {
                 "type": "table",
-                "doc" : "A table showing the rank and raw score for degree centrality."
+                "doc" : "A table showing the rank and raw score for degree centrality. The 'Node' column contains the node ids (as in the nodes table), the 'Label' column the node labels."
             },
             "centrality_network": {
                 "type": "network_data",
@@ -53,93 +85,51 @@ class Degree_Ranking(KiaraModule):
             }
         }
 
+    @cached_process()
     def process(self, inputs, outputs):
         edges = inputs.get_value_obj('network_data')
         wd = inputs.get_value_data('weighted_degree')
+        rank_method = inputs.get_value_data('rank_method')
+        top_k = inputs.get_value_data('top_k')
+        if rank_method not in RANK_METHODS:
+            raise KiaraProcessingException(f"Invalid rank method '{rank_method}', allowed: {', '.join(RANK_METHODS)}.")
         weight_name = inputs.get_value_data('weight_column_name')
 
         network_data: NetworkData = edges.data  # check the source for the NetworkData class to see what
                                                 # convenience methods it can give you:
                                                 # https://github.com/DHARPA-Project/kiara_plugin.network_analysis/blob/develop/src/kiara_plugin/network_analysis/models.py#L52
 
-        G = network_data.as_networkx_graph(nx.Graph)
-        G.remove_edges_from(list(nx.selfloop_edges(G)))
-        
-        def result_func(list):
-            rank, count, previous, result = (0, 0, None, {})
-            for key, num in list:
-                count += 1
-                if num != previous:
-                    rank += count
-                    previous = num
-                    count = 0
-                result[key] = num, rank
-            return result
-        
-        degree = {}
-        for node in G:
-            degree[node]= G.degree(node)
-        nx.set_node_attributes(G, degree, 'Degree Score')
-            
-        sorted_dict = [[item[1][1], item [0], item[1][0]] for item in sorted(result_func(sorted(degree.items(), key=itemgetter(1), reverse =True)).items(), key=itemgetter(1), reverse =True)]
-
-        df= pd.DataFrame(sorted_dict, columns=['Rank','Node','Degree'])
-        
-        
-        if wd == True:
-            if weight_name == '':
-                MG = network_data.as_networkx_graph(nx.MultiDiGraph)
-            
-                graph = nx.DiGraph()
-                for u,v,data in MG.edges(data=True):
-                    w = data['weight'] if 'weight' in data else 1
-                    if graph.has_edge(u,v):
-                        graph[u][v]['weight'] += w
-                    else:
-                        graph.add_edge(u, v, weight=w)
-                
-                weight_degree = {}
-                for node in graph:
-                    weight_degree[node]= graph.degree(node, weight='weight')
-                nx.set_node_attributes(G, weight_degree, 'Weighted Degree Score')
-                
-                edge_weight = nx.get_edge_attributes(graph, 'weight')
-                nx.set_edge_attributes(G, edge_weight, 'weight')
-                        
-                df2 = pd.DataFrame(list(weight_degree.items()), columns=['Node', 'Weighted Degree'])
-                df = df.merge(df2, how='left', on='Node').reset_index(drop=True)
-            
-            if weight_name != '':
-                MG = network_data.as_networkx_graph(nx.MultiDiGraph)
-                edge_weight = nx.get_edge_attributes(MG, weight_name)
-                for u,v,key in edge_weight:
-                    nx.set_edge_attributes(MG, edge_weight, 'weight')
-            
-                graph = nx.DiGraph()
-                for u,v,data in MG.edges(data=True):
-                    w = data['weight'] if 'weight' in data else 1
-                    if graph.has_edge(u,v):
-                        graph[u][v]['weight'] += w
-                    else:
-                        graph.add_edge(u, v, weight=w)
-                
-                weight_degree = {}
-                for node in graph:
-                    weight_degree[node]= graph.degree(node, weight='weight')
-                nx.set_node_attributes(G, weight_degree, 'Weighted Degree Score')
-            
-                df2 = pd.DataFrame(list(weight_degree.items()), columns=['Node', 'Weighted Degree'])
-                df = df.merge(df2, how='left', on='Node').reset_index(drop=True)
-                
-        attribute_network = NetworkData.create_from_networkx_graph(G)
-        
+        # work on the edges table directly, no need to build a networkx graph for degree counts
+        arrays = NetworkArrays.from_network_data(network_data, weight_column_name=weight_name)
+
+        degree = calculate_degree(arrays)
+        result = {'Degree': degree}
+        node_columns = {'Degree Score': pa.array(degree)}
+        edge_columns = {}
+
+        if wd:
+            weight_degree = calculate_weighted_degree(arrays)
+            result['Weighted Degree'] = weight_degree
+            node_columns['Weighted Degree Score'] = pa.array(weight_degree)
+
+            if arrays.weights is None:
+                # attach the aggregated parallel edge count as weight, so other modules can pick it up
+                inverse, summed = arrays.aggregate_parallel_edges()
+                edge_columns[DEFAULT_WEIGHT_COLUMN_NAME] = pa.array(summed[inverse])
+
+        df = create_ranking_table(arrays.node_ids, result, method=rank_method, top_k=top_k, labels=arrays.labels)
+        attribute_network = augment_network_data(
+            network_data, node_columns=node_columns, edge_columns=edge_columns
+        )
+
         outputs.set_values(network_result=df, centrality_network=attribute_network)
 
 class Betweenness_Ranking(KiaraModule):
     """Creates an ordered table with the rank and raw score for betweenness centrality.
     Betweenness centrality measures the percentage of all shortest paths that a node appears on, therefore measuring the likeliness that a node may act as a connector or 'intermediary'.
     
-    Uses a directed graph and networkx.betweenness_centrality()
+    Uses a directed graph and Brandes' algorithm (the same as networkx.betweenness_centrality()), the source nodes are split across a pool of worker processes.
+    If 'sample_size' is set, only that many randomly chosen source nodes (pivots) are used to approximate the scores, and the standard error of the approximation is reported.
     https://networkx.org/documentation/stable/reference/algorithms/generated/networkx.algorithms.centrality.betweenness_centrality.html#networkx.algorithms.centrality.betweenness_centrality"""
     
     _module_type_name = 'create.betweenness_rank_list'
@@ -150,6 +140,16 @@ class Betweenness_Ranking(KiaraModule):
                 "type": "network_data",
                 "doc": "The network graph being queried."
             },
+            "rank_method": {
+                "type": "string",
+                "default": "competition",
+                "doc": "How nodes with tied scores are ranked: 'competition' (1224), 'dense' (1223) or 'ordinal' (1234)."
+            },
+            "top_k": {
+                "type": "integer",
+                "doc": "Only include the k highest ranked nodes in the result table. The updated network data always contains the scores of all nodes.",
+                "optional": True
+            },
             "weighted_betweenness":{
                 "type": "boolean",
                 "default": True,
@@ -164,6 +164,21 @@ class Betweenness_Ranking(KiaraModule):
                 "type": "boolean",
                 "default": True,
                 "doc": "How the weights given should be interpreted. If 'True', weight will be defined positively as 'strength', and these edges will be prioritised in shortest path calculations. If 'False', weight will be defined negatively as 'cost' or 'distance', and these edges will be avoided in shortest path calculations."
+            },
+            "sample_size": {
+                "type": "integer",
+                "doc": "The number of randomly selected source nodes (pivots) used to approximate betweenness. If not set, betweenness is calculated exactly, using all nodes as sources.",
+                "optional": True
+            },
+            "seed": {
+                "type": "integer",
+                "doc": "The seed for the random selection of pivots, set this to get reproducible approximations.",
+                "optional": True
+            },
+            "processes": {
+                "type": "integer",
+                "doc": "The number of worker processes the source nodes are split across. If not set, all available cores are used.",
+                "optional": True
             }
         }
 
@@ -171,70 +186,85 @@ class Betweenness_Ranking(KiaraModule):
         return {
             "network_result": {
                 "type": "table",
-                "doc" : "A table showing the rank and raw score for betweenness centrality."
+                "doc" : "A table showing the rank and raw score for betweenness centrality. The 'Node' column contains the node ids (as in the nodes table), the 'Label' column the node labels."
             },
             "centrality_network": {
                 "type": "network_data",
                 "doc": "Updated network data with betweenness ranking assigned as a node attribute."
+            },
+            "betweenness_info": {
+                "type": "dict",
+                "doc": "Details about how the scores were calculated, including the error estimate if pivots were sampled."
             }
         }
 
+    @cached_process("processes", seed_input="seed", random_inputs=("sample_size",))
     def process(self, inputs, outputs):
         edges = inputs.get_value_obj('network_data')
         wd = inputs.get_value_data('weighted_betweenness')
+        rank_method = inputs.get_value_data('rank_method')
+        top_k = inputs.get_value_data('top_k')
+        if rank_method not in RANK_METHODS:
+            raise KiaraProcessingException(f"Invalid rank method '{rank_method}', allowed: {', '.join(RANK_METHODS)}.")
         weight_name = inputs.get_value_data('weight_column_name')
         wm = inputs.get_value_data('weight_meaning')
+        sample_size = inputs.get_value_data('sample_size')
+        seed = inputs.get_value_data('seed')
+        processes = inputs.get_value_data('processes')
 
         network_data: NetworkData = edges.data  # check the source for the NetworkData class to see what
                                                 # convenience methods it can give you:
                                                 # https://github.com/DHARPA-Project/kiara_plugin.network_analysis/blob/develop/src/kiara_plugin/network_analysis/models.py#L52
 
-        G = network_data.as_networkx_graph(nx.DiGraph)
-        G.remove_edges_from(list(nx.selfloop_edges(G)))
-        
-        def result_func(list):
-            rank, count, previous, result = (0, 0, None, {})
-            for key, num in list:
-                count += 1
-                if num != previous:
-                    rank += count
-                    previous = num
-                    count = 0
-                result[key] = num, rank
-            return result
-        
-        between = nx.betweenness_centrality(G)
-        nx.set_node_attributes(G, between, 'Betweenness Score')
-        sorted_dict = [[item[1][1], item [0], item[1][0]] for item in sorted(result_func(sorted(between.items(), key=itemgetter(1), reverse =True)).items(), key=itemgetter(1), reverse =True)]
-        
-        df= pd.DataFrame(sorted_dict)
-        df.columns = ['Rank', 'Node', 'Score']
-        
-        if wd == True:
-            graph = network_data.as_networkx_graph(nx.DiGraph)
-            edge_weight = nx.get_edge_attributes(graph, weight_name)
-            for u,v,key in edge_weight:
-                nx.set_edge_attributes(graph, edge_weight, 'weight')
-                        
-            if wm == True:
-                for u,v,d in graph.edges(data=True):
-                    d['weight'] == (1/d['weight'])
-                
-            weight_betweenness = nx.betweenness_centrality(graph, weight='weight')
-            nx.set_node_attributes(G, weight_betweenness, 'Weighted Betweenness Score')
-                    
-            df2 = pd.DataFrame(list(weight_betweenness.items()), columns=['Node', 'Weighted Betweenness'])
-            df = df.merge(df2, how='left', on='Node').reset_index(drop=True)
-         
-        attribute_network = NetworkData.create_from_networkx_graph(G)
-        
-        outputs.set_values(network_result=df, centrality_network=attribute_network)
+        if sample_size is not None and sample_size < 1:
+            raise KiaraProcessingException(f"Invalid sample size '{sample_size}': must be a positive integer.")
+
+        arrays = NetworkArrays.from_network_data(network_data, weight_column_name=weight_name)
+
+        between, between_error = calculate_betweenness(
+            arrays.to_csr(directed=True, weighted=False),
+            sample_size=sample_size,
+            seed=seed,
+            processes=processes,
+        )
+        result = {'Score': between}
+        node_columns = {'Betweenness Score': pa.array(between)}
+
+        info = {
+            'sampled': between_error is not None,
+            'sample_size': arrays.num_nodes if between_error is None else sample_size,
+            'seed': seed,
+        }
+        if between_error is not None:
+            result['Score Error'] = between_error
+            info['max_error'] = float(between_error.max(initial=0.0))
+
+        if wd:
+            # strong connections are short ones if weight means 'strength'
+            weight_between, weight_between_error = calculate_betweenness(
+                arrays.to_csr(directed=True, weighted=True, weight_as_distance=wm, parallel_edges='sum' if wm else 'min'),
+                weighted=True,
+                sample_size=sample_size,
+                seed=seed,
+                processes=processes,
+            )
+            result['Weighted Betweenness'] = weight_between
+            node_columns['Weighted Betweenness Score'] = pa.array(weight_between)
+            if weight_between_error is not None:
+                result['Weighted Betweenness Error'] = weight_between_error
+                info['max_weighted_error'] = float(weight_between_error.max(initial=0.0))
+
+        df = create_ranking_table(arrays.node_ids, result, method=rank_method, top_k=top_k, labels=arrays.labels)
+        attribute_network = augment_network_data(network_data, node_columns=node_columns)
+
+        outputs.set_values(network_result=df, centrality_network=attribute_network, betweenness_info=info)
 
 class Eigenvector_Ranking(KiaraModule):
-    """Creates an ordered table with the rank and raw score for betweenness centrality.
+    """Creates an ordered table with the rank and raw score for eigenvector centrality.
     Eigenvector centrality measures the extent to which a node is connected to other nodes of importance or influence.
     
-    Uses an undirected graph networkx.eigenvector_centrality()
+    Uses an undirected graph and the same power iteration as networkx.eigenvector_centrality(), on a sparse adjacency matrix.
+    The iteration stops when the change between two iterations is below 'tolerance', or after 'iterations' steps. It can be warm-started from the scores of an earlier run on the same network.
     https://networkx.org/documentation/stable/reference/algorithms/generated/networkx.algorithms.centrality.eigenvector_centrality.html#networkx.algorithms.centrality.eigenvector_centrality"""
    
     _module_type_name = 'create.eigenvector_rank_list'
@@ -245,9 +275,30 @@ class Eigenvector_Ranking(KiaraModule):
                 "type": "network_data",
                 "doc": "The network graph being queried."
             },
+            "rank_method": {
+                "type": "string",
+                "default": "competition",
+                "doc": "How nodes with tied scores are ranked: 'competition' (1224), 'dense' (1223) or 'ordinal' (1234)."
+            },
+            "top_k": {
+                "type": "integer",
+                "doc": "Only include the k highest ranked nodes in the result table. The updated network data always contains the scores of all nodes.",
+                "optional": True
+            },
             "iterations": {
                 "type" : "integer",
-                "default": 1000
+                "default": 1000,
+                "doc": "The maximum number of power iterations, for both the unweighted and the weighted calculation."
+            },
+            "tolerance": {
+                "type": "float",
+                "default": 1.0e-6,
+                "doc": "The error tolerance used to check convergence: iteration stops once the summed change of all scores is below the number of nodes multiplied by this value."
+            },
+            "previous_result": {
+                "type": "network_data",
+                "doc": "The 'centrality_network' output of an earlier run of this module on the same network. If provided, its scores are used as starting vectors, which usually converges in a few iterations.",
+                "optional": True
             },
             "weighted_eigenvector":{
                 "type": "boolean",
@@ -270,71 +321,79 @@ class Eigenvector_Ranking(KiaraModule):
         return {
             "network_result": {
                 "type": "table",
-                "doc" : "A table showing the rank and raw score for eigenvector centrality."
+                "doc" : "A table showing the rank and raw score for eigenvector centrality. The 'Node' column contains the node ids (as in the nodes table), the 'Label' column the node labels."
             },
             "centrality_network": {
                 "type": "network_data",
                 "doc": "Updated network data with eigenvector ranking assigned as a node attribute."
+            },
+            "eigenvector_info": {
+                "type": "dict",
+                "doc": "The number of iterations that were run, and whether the calculation converged within the tolerance."
             }
         }
 
+    @cached_process()
     def process(self, inputs, outputs):
         edges = inputs.get_value_obj('network_data')
         iterations = inputs.get_value_data("iterations")
+        tolerance = inputs.get_value_data("tolerance")
         wd = inputs.get_value_data('weighted_eigenvector')
+        rank_method = inputs.get_value_data('rank_method')
+        top_k = inputs.get_value_data('top_k')
+        if rank_method not in RANK_METHODS:
+            raise KiaraProcessingException(f"Invalid rank method '{rank_method}', allowed: {', '.join(RANK_METHODS)}.")
         weight_name = inputs.get_value_data('weight_column_name')
         wm = inputs.get_value_data('weight_meaning')
+        previous: Union[NetworkData, None] = inputs.get_value_data('previous_result')
 
         network_data: NetworkData = edges.data  # check the source for the NetworkData class to see what
                                                 # convenience methods it can give you:
                                                 # https://github.com/DHARPA-Project/kiara_plugin.network_analysis/blob/develop/src/kiara_plugin/network_analysis/models.py#L52
 
-        G = network_data.as_networkx_graph(nx.Graph)
-        G.remove_edges_from(list(nx.selfloop_edges(G)))
-        
-        def result_func(list):
-            rank, count, previous, result = (0, 0, None, {})
-            for key, num in list:
-                count += 1
-                if num != previous:
-                    rank += count
-                    previous = num
-                    count = 0
-                result[key] = num, rank
-            return result
-        
-        eigenvector = nx.eigenvector_centrality(G, max_iter=iterations)
-        nx.set_node_attributes(G, eigenvector, 'Eigenvector Score')
-        sorted_dict = [[item[1][1], item [0], item[1][0]] for item in sorted(result_func(sorted(eigenvector.items(), key=itemgetter(1), reverse =True)).items(), key=itemgetter(1), reverse =True)]
-        
-        df= pd.DataFrame(sorted_dict)
-        df.columns = ['Rank', 'Node', 'Score']
-        
-        if wd == True:
-            graph = network_data.as_networkx_graph(nx.Graph)
-            edge_weight = nx.get_edge_attributes(graph, weight_name)
-            for u,v,key in edge_weight:
-                nx.set_edge_attributes(graph, edge_weight, 'weight')
-
-            if wm == False:
-                for u,v,d in graph.edges(data=True):
-                    d['weight'] == (1/d['weight'])
-                
-            weight_eigenvector = nx.eigenvector_centrality(graph, weight='weight', max_iter=100000)
-            nx.set_node_attributes(G, weight_eigenvector, 'Weighted Eigenvector Score')
-                        
-            df2 = pd.DataFrame(list(weight_eigenvector.items()), columns=['Node', 'Weighted Eigenvector'])
-            df = df.merge(df2, how='left', on='Node').reset_index(drop=True)
-        
-        attribute_network = NetworkData.create_from_networkx_graph(G)
-        
-        outputs.set_values(network_result=df, centrality_network=attribute_network)
+        arrays = NetworkArrays.from_network_data(network_data, weight_column_name=weight_name)
+
+        eigenvector, steps, converged = calculate_eigenvector(
+            arrays.to_csr(directed=False, weighted=False),
+            tolerance=tolerance,
+            max_iterations=iterations,
+            start=read_node_column(previous, 'Eigenvector Score', arrays.num_nodes),
+        )
+        result = {'Score': eigenvector}
+        node_columns = {'Eigenvector Score': pa.array(eigenvector)}
+        info = {
+            'tolerance': tolerance,
+            'max_iterations': iterations,
+            'warm_start': previous is not None,
+            'iterations': steps,
+            'converged': converged,
+        }
+
+        if wd:
+            # eigenvector centrality needs strengths, so invert weights that mean 'distance'
+            weight_eigenvector, weight_steps, weight_converged = calculate_eigenvector(
+                arrays.to_csr(directed=False, weighted=True, weight_as_distance=not wm, parallel_edges='sum' if wm else 'min'),
+                tolerance=tolerance,
+                max_iterations=iterations,
+                start=read_node_column(previous, 'Weighted Eigenvector Score', arrays.num_nodes),
+            )
+            result['Weighted Eigenvector'] = weight_eigenvector
+            node_columns['Weighted Eigenvector Score'] = pa.array(weight_eigenvector)
+            info['weighted_iterations'] = weight_steps
+            info['weighted_converged'] = weight_converged
+
+        df = create_ranking_table(arrays.node_ids, result, method=rank_method, top_k=top_k, labels=arrays.labels)
+        attribute_network = augment_network_data(network_data, node_columns=node_columns)
+
+        outputs.set_values(network_result=df, centrality_network=attribute_network, eigenvector_info=info)
 
 class Closeness_Ranking(KiaraModule):
     """Creates an ordered table with the rank and raw score for closeness centrality.
     Closeness centrality measures the average shortest distance path between a node and all reachable nodes in the network.
     
-    Uses a directed graph and networkx.closeness_centrality()
+    Uses a directed graph and the same definition as networkx.closeness_centrality(). Shortest paths are calculated for batches of nodes (BFS, or Dijkstra for the weighted variant) in a pool of worker processes.
+    Harmonic closeness (the sum of inverse distances, as in networkx.harmonic_centrality()) can be used instead, which is better suited for disconnected graphs.
+    If 'sample_size' is set, only the distances from that many randomly chosen source nodes are calculated, and the scores are extrapolated from those.
     https://networkx.org/documentation/stable/reference/algorithms/generated/networkx.algorithms.centrality.closeness_centrality.html#networkx.algorithms.centrality.closeness_centrality"""
     
     _module_type_name = 'create.closeness_rank_list'
@@ -345,6 +404,16 @@ class Closeness_Ranking(KiaraModule):
                 "type": "network_data",
                 "doc": "The network graph being queried."
             },
+            "rank_method": {
+                "type": "string",
+                "default": "competition",
+                "doc": "How nodes with tied scores are ranked: 'competition' (1224), 'dense' (1223) or 'ordinal' (1234)."
+            },
+            "top_k": {
+                "type": "integer",
+                "doc": "Only include the k highest ranked nodes in the result table. The updated network data always contains the scores of all nodes.",
+                "optional": True
+            },
             "weighted_closeness":{
                 "type": "boolean",
                 "default": True,
@@ -359,6 +428,26 @@ class Closeness_Ranking(KiaraModule):
                 "type": "boolean",
                 "default": True,
                 "doc": "How the weights given should be interpreted. If 'True', weight will be defined positively as 'strength', and these edges will be prioritised in shortest path calculations. If 'False', weight will be defined negatively as 'cost' or 'distance', and these edges will be avoided in shortest path calculations."
+            },
+            "harmonic": {
+                "type": "boolean",
+                "default": False,
+                "doc": "Whether to calculate harmonic closeness (the sum of the inverse distances from all other nodes) instead of closeness. Harmonic closeness is well-defined for networks that are not connected."
+            },
+            "sample_size": {
+                "type": "integer",
+                "doc": "The number of randomly selected source nodes used to approximate closeness. If not set, closeness is calculated exactly, using all nodes.",
+                "optional": True
+            },
+            "seed": {
+                "type": "integer",
+                "doc": "The seed for the random selection of source nodes, set this to get reproducible approximations.",
+                "optional": True
+            },
+            "processes": {
+                "type": "integer",
+                "doc": "The number of worker processes the shortest path calculations are split across. If not set, all available cores are used.",
+                "optional": True
             }
         }
 
@@ -366,61 +455,284 @@ class Closeness_Ranking(KiaraModule):
         return {
             "network_result": {
                 "type": "table",
-                "doc" : "A table showing the rank and raw score for closeness centrality."
+                "doc" : "A table showing the rank and raw score for closeness centrality. The 'Node' column contains the node ids (as in the nodes table), the 'Label' column the node labels."
             },
             "centrality_network": {
                 "type": "network_data",
                 "doc": "Updated network data with closeness ranking assigned as a node attribute."
+            },
+            "closeness_info": {
+                "type": "dict",
+                "doc": "Details about how the scores were calculated."
             }
         }
 
+    @cached_process("processes", seed_input="seed", random_inputs=("sample_size",))
     def process(self, inputs, outputs):
         edges = inputs.get_value_obj('network_data')
         wd = inputs.get_value_data('weighted_closeness')
+        rank_method = inputs.get_value_data('rank_method')
+        top_k = inputs.get_value_data('top_k')
+        if rank_method not in RANK_METHODS:
+            raise KiaraProcessingException(f"Invalid rank method '{rank_method}', allowed: {', '.join(RANK_METHODS)}.")
         weight_name = inputs.get_value_data('weight_column_name')
         wm = inputs.get_value_data('weight_meaning')
+        harmonic = inputs.get_value_data('harmonic')
+        sample_size = inputs.get_value_data('sample_size')
+        seed = inputs.get_value_data('seed')
+        processes = inputs.get_value_data('processes')
 
         network_data: NetworkData = edges.data  # check the source for the NetworkData class to see what
                                                 # convenience methods it can give you:
                                                 # https://github.com/DHARPA-Project/kiara_plugin.network_analysis/blob/develop/src/kiara_plugin/network_analysis/models.py#L52
 
-        G = network_data.as_networkx_graph(nx.DiGraph)
-        G.remove_edges_from(list(nx.selfloop_edges(G)))
-        
-        def result_func(list):
-            rank, count, previous, result = (0, 0, None, {})
-            for key, num in list:
-                count += 1
-                if num != previous:
-                    rank += count
-                    previous = num
-                    count = 0
-                result[key] = num, rank
-            return result
-        
-        closeness = nx.closeness_centrality(G)
-        nx.set_node_attributes(G, closeness, 'Closeness Score')
-        sorted_dict = [[item[1][1], item [0], item[1][0]] for item in sorted(result_func(sorted(closeness.items(), key=itemgetter(1), reverse =True)).items(), key=itemgetter(1), reverse =True)]
-        
-        df= pd.DataFrame(sorted_dict)
-        df.columns = ['Rank', 'Node', 'Score']
-        
-        if wd == True:
-            graph = network_data.as_networkx_graph(nx.DiGraph)
-            edge_weight = nx.get_edge_attributes(graph, weight_name)
-            for u,v,key in edge_weight:
-                nx.set_edge_attributes(graph, edge_weight, 'weight')
-                        
-            if wm == True:
-                for u,v,d in graph.edges(data=True):
-                    d['weight'] == (1/d['weight'])
-                
-            weight_closeness = nx.closeness_centrality(graph, weight='weight')
-            nx.set_node_attributes(G, weight_closeness, 'Weighted Closeness Score')
-                        
-            df2 = pd.DataFrame(list(weight_closeness.items()), columns=['Node', 'Weighted Closeness'])
-            df = df.merge(df2, how='left', on='Node').reset_index(drop=True)
-        
-        attribute_network = NetworkData.create_from_networkx_graph(G)
-        
-        outputs.set_values(network_result=df, centrality_network=attribute_network)
+        if sample_size is not None and sample_size < 1:
+            raise KiaraProcessingException(f"Invalid sample size '{sample_size}': must be a positive integer.")
+
+        arrays = NetworkArrays.from_network_data(network_data, weight_column_name=weight_name)
+        attr_name = 'Harmonic Closeness' if harmonic else 'Closeness'
+
+        closeness = calculate_closeness(
+            arrays.to_csr(directed=True, weighted=False),
+            harmonic=harmonic,
+            sample_size=sample_size,
+            seed=seed,
+            processes=processes,
+        )
+        result = {'Score': closeness}
+        node_columns = {f'{attr_name} Score': pa.array(closeness)}
+        info = {
+            'harmonic': harmonic,
+            'sampled': sample_size is not None and sample_size < arrays.num_nodes,
+            'sample_size': arrays.num_nodes if sample_size is None else min(sample_size, arrays.num_nodes),
+            'seed': seed,
+        }
+
+        if wd:
+            # strong connections are short ones if weight means 'strength'
+            weight_closeness = calculate_closeness(
+                arrays.to_csr(directed=True, weighted=True, weight_as_distance=wm, parallel_edges='sum' if wm else 'min'),
+                weighted=True,
+                harmonic=harmonic,
+                sample_size=sample_size,
+                seed=seed,
+                processes=processes,
+            )
+            result[f'Weighted {attr_name}'] = weight_closeness
+            node_columns[f'Weighted {attr_name} Score'] = pa.array(weight_closeness)
+
+        df = create_ranking_table(arrays.node_ids, result, method=rank_method, top_k=top_k, labels=arrays.labels)
+        attribute_network = augment_network_data(network_data, node_columns=node_columns)
+
+        outputs.set_values(network_result=df, centrality_network=attribute_network, closeness_info=info)
+
+class Centrality_Ranking(KiaraModule):
+    """Creates one ordered table with the rank and raw score for several centrality measures at once.
+    The network is read only once, and the selected measures (degree, betweenness, eigenvector and closeness) are calculated from that single representation, degree and eigenvector concurrently.
+    The results are the same as those of the individual 'create.<measure>_rank_list' modules, and the updated network data carries the same node attributes.
+
+    The table is ordered by the rank of the first selected measure."""
+
+    _module_type_name = 'create.centrality_rank_list'
+
+    def create_inputs_schema(self):
+        return {
+            "network_data": {
+                "type": "network_data",
+                "doc": "The network graph being queried."
+            },
+            "rank_method": {
+                "type": "string",
+                "default": "competition",
+                "doc": "How nodes with tied scores are ranked: 'competition' (1224), 'dense' (1223) or 'ordinal' (1234)."
+            },
+            "top_k": {
+                "type": "integer",
+                "doc": "Only include the k highest ranked nodes in the result table. The updated network data always contains the scores of all nodes.",
+                "optional": True
+            },
+            "measures": {
+                "type": "list",
+                "default": list(CENTRALITY_MEASURES),
+                "doc": f"The centrality measures to calculate, any of: {', '.join(CENTRALITY_MEASURES)}."
+            },
+            "weighted": {
+                "type": "boolean",
+                "default": True,
+                "doc": "Boolean to indicate whether to calculate the weighted variant of each measure as well as the unweighted one."
+            },
+            "weight_column_name": {
+                "type" : "string",
+                "default": '',
+                "doc": "The name of the column in the edge table containing data for the 'weight' of an edge. If there is a column already named 'weight', this will be automatically selected. If otherwise left empty, weight is calculated by aggregrating parallel edges where edge weight is assigned a weight of 1."
+            },
+            "weight_meaning":{
+                "type": "boolean",
+                "default": True,
+                "doc": "How the weights given should be interpreted. If 'True', weight will be defined positively as 'strength', and these edges will be prioritised in shortest path calculations. If 'False', weight will be defined negatively as 'cost' or 'distance', and these edges will be avoided in shortest path calculations."
+            },
+            "harmonic": {
+                "type": "boolean",
+                "default": False,
+                "doc": "Whether to calculate harmonic closeness instead of closeness."
+            },
+            "iterations": {
+                "type" : "integer",
+                "default": 1000,
+                "doc": "The maximum number of power iterations for eigenvector centrality."
+            },
+            "tolerance": {
+                "type": "float",
+                "default": 1.0e-6,
+                "doc": "The error tolerance used to check convergence of eigenvector centrality."
+            },
+            "sample_size": {
+                "type": "integer",
+                "doc": "The number of randomly selected source nodes used to approximate betweenness and closeness. If not set, both are calculated exactly.",
+                "optional": True
+            },
+            "seed": {
+                "type": "integer",
+                "doc": "The seed for the random selection of source nodes.",
+                "optional": True
+            },
+            "processes": {
+                "type": "integer",
+                "doc": "The number of worker processes used for betweenness and closeness. If not set, all available cores are used.",
+                "optional": True
+            }
+        }
+
+    def create_outputs_schema(self):
+        return {
+            "network_result": {
+                "type": "table",
+                "doc" : "A table showing the rank and raw score of every node, for each of the selected measures. The 'Node' column contains the node ids (as in the nodes table), the 'Label' column the node labels."
+            },
+            "centrality_network": {
+                "type": "network_data",
+                "doc": "Updated network data with the scores of all selected measures assigned as node attributes."
+            },
+            "centrality_info": {
+                "type": "dict",
+                "doc": "Details about how the scores were calculated, per measure."
+            }
+        }
+
+    @cached_process("processes", seed_input="seed", random_inputs=("sample_size",))
+    def process(self, inputs, outputs):
+        edges = inputs.get_value_obj('network_data')
+        measures = inputs.get_value_data('measures')
+        wd = inputs.get_value_data('weighted')
+        rank_method = inputs.get_value_data('rank_method')
+        top_k = inputs.get_value_data('top_k')
+        if rank_method not in RANK_METHODS:
+            raise KiaraProcessingException(f"Invalid rank method '{rank_method}', allowed: {', '.join(RANK_METHODS)}.")
+        weight_name = inputs.get_value_data('weight_column_name')
+        wm = inputs.get_value_data('weight_meaning')
+        harmonic = inputs.get_value_data('harmonic')
+        iterations = inputs.get_value_data('iterations')
+        tolerance = inputs.get_value_data('tolerance')
+        sample_size = inputs.get_value_data('sample_size')
+        seed = inputs.get_value_data('seed')
+        processes = inputs.get_value_data('processes')
+
+        network_data: NetworkData = edges.data
+
+        if not measures:
+            raise KiaraProcessingException(f"No centrality measures selected, choose at least one of: {', '.join(CENTRALITY_MEASURES)}.")
+        invalid = [m for m in measures if m not in CENTRALITY_MEASURES]
+        if invalid:
+            raise KiaraProcessingException(f"Invalid centrality measures '{', '.join(invalid)}', allowed: {', '.join(CENTRALITY_MEASURES)}.")
+        if sample_size is not None and sample_size < 1:
+            raise KiaraProcessingException(f"Invalid sample size '{sample_size}': must be a positive integer.")
+
+        # read the network only once, all measures work on (views of) the same arrays
+        arrays = NetworkArrays.from_network_data(network_data, weight_column_name=weight_name)
+        directed = arrays.to_csr(directed=True, weighted=False)
+        undirected = arrays.to_csr(directed=False, weighted=False)
+        if wd:
+            # parallel edges add up if weights mean 'strength', the shortest one counts if they mean 'distance'
+            reduction = 'sum' if wm else 'min'
+            directed_weighted = arrays.to_csr(directed=True, weighted=True, weight_as_distance=wm, parallel_edges=reduction)
+            undirected_weighted = arrays.to_csr(directed=False, weighted=True, weight_as_distance=not wm, parallel_edges=reduction)
+
+        def run_degree():
+            scores = {'Degree': calculate_degree(arrays)}
+            if wd:
+                scores['Weighted Degree'] = calculate_weighted_degree(arrays)
+            return scores, {}
+
+        def run_betweenness():
+            between, error = calculate_betweenness(directed, sample_size=sample_size, seed=seed, processes=processes)
+            scores = {'Betweenness': between}
+            info = {'sampled': error is not None}
+            if error is not None:
+                info['max_error'] = float(error.max(initial=0.0))
+            if wd:
+                scores['Weighted Betweenness'], weight_error = calculate_betweenness(
+                    directed_weighted, weighted=True, sample_size=sample_size, seed=seed, processes=processes
+                )
+                if weight_error is not None:
+                    info['max_weighted_error'] = float(weight_error.max(initial=0.0))
+            return scores, info
+
+        def run_eigenvector():
+            eigenvector, steps, converged = calculate_eigenvector(undirected, tolerance=tolerance, max_iterations=iterations)
+            scores = {'Eigenvector': eigenvector}
+            info = {'iterations': steps, 'converged': converged}
+            if wd:
+                scores['Weighted Eigenvector'], info['weighted_iterations'], info['weighted_converged'] = calculate_eigenvector(
+                    undirected_weighted, tolerance=tolerance, max_iterations=iterations
+                )
+            return scores, info
+
+        def run_closeness():
+            name = 'Harmonic Closeness' if harmonic else 'Closeness'
+            scores = {name: calculate_closeness(directed, harmonic=harmonic, sample_size=sample_size, seed=seed, processes=processes)}
+            if wd:
+                scores[f'Weighted {name}'] = calculate_closeness(
+                    directed_weighted, weighted=True, harmonic=harmonic, sample_size=sample_size, seed=seed, processes=processes
+                )
+            return scores, {'harmonic': harmonic}
+
+        tasks = {
+            'degree': run_degree,
+            'betweenness': run_betweenness,
+            'eigenvector': run_eigenvector,
+            'closeness': run_closeness,
+        }
+
+        # degree and eigenvector release the GIL (numpy/scipy), so they run in threads; the measures that start their own
+        # pool of worker processes already use all cores, so they run one after the other, and only once the threads
+        # are done (forking while other threads run numpy/scipy code can deadlock on locks the children inherit)
+        threaded = [measure for measure in measures if measure not in POOL_MEASURES]
+        results = {}
+        if threaded:
+            with ThreadPoolExecutor(max_workers=len(threaded)) as executor:
+                futures = {measure: executor.submit(tasks[measure]) for measure in threaded}
+                results.update({measure: future.result() for measure, future in futures.items()})
+        for measure in measures:
+            if measure in POOL_MEASURES:
+                results[measure] = tasks[measure]()
+
+        result = {}
+        node_columns = {}
+        info = {}
+        for measure in measures:
+            scores, measure_info = results[measure]
+            for name, values in scores.items():
+                result[name] = values
+                result[f'{name} Rank'] = rank_nodes(values, method=rank_method)
+                node_columns[f'{name} Score'] = pa.array(values)
+            info[measure] = measure_info
+        info['sample_size'] = sample_size
+        info['seed'] = seed
+
+        # the first column determines the order, its rank is already in the 'Rank' column
+        first_name = next(iter(result))
+        result.pop(f'{first_name} Rank')
+        df = create_ranking_table(arrays.node_ids, result, method=rank_method, top_k=top_k, labels=arrays.labels)
+        attribute_network = augment_network_data(network_data, node_columns=node_columns)
+
+        outputs.set_values(network_result=df, centrality_network=attribute_network, centrality_info=info)
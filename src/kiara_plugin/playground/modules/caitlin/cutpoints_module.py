@@ -1,6 +1,11 @@
 from kiara.api import KiaraModule
-import networkx as nx
+import pyarrow as pa
+import pyarrow.compute as pc
+from kiara_plugin.network_analysis.defaults import NODE_ID_COLUMN_NAME
 from kiara_plugin.network_analysis.models import NetworkData
+from kiara_plugin.playground.utils.cache import cached_process
+from kiara_plugin.playground.utils.components import calculate_biconnected_components
+from kiara_plugin.playground.utils.networks import NetworkArrays, augment_network_data
 
 KIARA_METADATA = {
     "authors": [
@@ -13,7 +18,9 @@ class CutPointsList(KiaraModule):
     """Create a list of nodes that are cut-points.
     Cut-points are any node in a network whose removal disconnects members of the network, creating one or more new distinct components.
     
-    Uses networkx.articulation_points()
+    Uses an iterative version of Tarjan's algorithm on the edge list of the (undirected) network, which runs in linear time. The same pass can also
+    mark bridges (edges whose removal disconnects the network) and assign every edge to its biconnected component, these are added as edge attributes
+    if requested. Results are the same as with networkx.articulation_points(), networkx.bridges() and networkx.biconnected_component_edges():
     https://networkx.org/documentation/stable/reference/algorithms/generated/networkx.algorithms.components.articulation_points.html"""
     
     _module_type_name = 'create.cut_point_list'
@@ -23,7 +30,17 @@ class CutPointsList(KiaraModule):
             "network_data": {
                 "type": "network_data",
                 "doc": "The network graph being queried."
-            }
+            },
+            "include_bridges": {
+                "type": "boolean",
+                "doc": "Whether to add a 'Bridge' edge attribute, with 'Yes' assigned to edges whose removal disconnects the network.",
+                "default": False,
+            },
+            "include_biconnected_components": {
+                "type": "boolean",
+                "doc": "Whether to add a 'Biconnected Component' edge attribute with the id of the biconnected component an edge belongs to (self-loops don't belong to any).",
+                "default": False,
+            },
         }
 
     def create_outputs_schema(self):
@@ -38,6 +55,7 @@ class CutPointsList(KiaraModule):
             }
         }
 
+    @cached_process()
     def process(self, inputs, outputs):
         edges = inputs.get_value_obj('network_data')
 
@@ -45,22 +63,20 @@ class CutPointsList(KiaraModule):
                                                 # convenience methods it can give you:
                                                 # https://github.com/DHARPA-Project/kiara_plugin.network_analysis/blob/develop/src/kiara_plugin/network_analysis/models.py#L52
 
-        G = network_data.as_networkx_graph(nx.Graph)  # you can also use nx.DiGraph or other types
+        arrays = NetworkArrays.from_network_data(network_data, weighted=False)
+        is_cut_point, is_bridge, edge_components = calculate_biconnected_components(arrays)
 
-        cutpoints = list(nx.articulation_points(G))
-        
-        cut_dict = {}
-        for node in G:
-            if node in cutpoints:
-                cut_dict[node] = 'Yes'
-            else:
-                cut_dict[node] = 'No'
-                
-        nx.set_node_attributes(G, cut_dict, 'Cut Point')
+        # only the new columns are added, the rest of the network data is re-used as is
+        node_ids = network_data.nodes.arrow_table.column(NODE_ID_COLUMN_NAME)
+        cutpoints = pc.filter(node_ids, pa.array(is_cut_point)).to_pylist()
+        cut_column = pc.if_else(pa.array(is_cut_point), 'Yes', 'No')
 
-        attribute_network = NetworkData.create_from_networkx_graph(G)
+        edge_columns = {}
+        if inputs.get_value_data('include_bridges'):
+            edge_columns['Bridge'] = pc.if_else(pa.array(is_bridge), 'Yes', 'No')
+        if inputs.get_value_data('include_biconnected_components'):
+            edge_columns['Biconnected Component'] = pa.array(edge_components, mask=edge_components < 0)
+
+        attribute_network = augment_network_data(network_data, node_columns={'Cut Point': cut_column}, edge_columns=edge_columns)
         
         outputs.set_values(network_result=cutpoints, cut_network=attribute_network)
-
-
-
@@ -1,17 +1,24 @@
 # -*- coding: utf-8 -*-
-import typing
-
-import networkx as nx
-from kiara.api import KiaraModule, ValueSchema, KiaraModuleConfig, ValueMap
-from networkx import Graph
+import numpy as np
+import pyarrow as pa
+from kiara.api import KiaraModule, KiaraModuleConfig, ValueMap, ValueMapSchema
 from pydantic import Field
 
+from kiara_plugin.network_analysis.models import NetworkData
+from kiara_plugin.playground.utils.cache import cached_process
+from kiara_plugin.playground.utils.components import (
+    calculate_connected_components,
+    filter_component,
+)
+from kiara_plugin.playground.utils.networks import (
+    augment_network_data,
+    iter_edge_batches,
+)
+
 KIARA_METADATA = {
     "authors": [{"name": "Lena Jaskov", "email": "helena.jaskov@uni.lu"}],
 }
 
-# Here comes my attempt at building a find largest component module. Maybe need to add config for setting graph type as in CreateGraphFromEdgesTableModule
-
 
 class FindLargestComponentsModuleConfig(KiaraModuleConfig):
 
@@ -25,29 +32,47 @@ class FindLargestComponentsModuleConfig(KiaraModuleConfig):
 
 
 class GraphComponentsModule(KiaraModule):
-    """Counts all graph components and creates new graph from largest component."""
+    """Counts all graph components and creates new graph from largest component.
+
+    Components are found with a union-find over the integer node ids, streaming through the edges table once (edge direction is ignored). The component id of
+    every node is attached to the node list as 'component' attribute: components are numbered by size, so the largest component has id 0.
+
+    The largest component is filtered out of the node and edge tables directly. Its nodes get new, consecutive ids, the original ids are kept in the 'old_node_id'
+    (and 'old_source_id'/'old_target_id') columns.
+    """
 
     _config_cls = FindLargestComponentsModuleConfig
     _module_type_name = "graph_components"
 
-    def create_input_schema(
+    def create_inputs_schema(
         self,
-    ) -> typing.Mapping[
-        str, typing.Union[ValueSchema, typing.Mapping[str, typing.Any]]
-    ]:
+    ) -> ValueMapSchema:
 
-        return {"graph": {"type": "network_graph", "doc": "The network graph."}}
+        return {
+            "network_data": {
+                "type": "network_data",
+                "doc": "The network data to analyze.",
+                "optional": False,
+            }
+        }
 
-    def create_output_schema(
+    def create_outputs_schema(
         self,
-    ) -> typing.Mapping[
-        str, typing.Union[ValueSchema, typing.Mapping[str, typing.Any]]
-    ]:
-
-        result = {}
+    ) -> ValueMapSchema:
+
+        result = {
+            "components_network": {
+                "type": "network_data",
+                "doc": "Updated network data with the component id assigned as a node attribute.",
+            },
+            "component_sizes": {
+                "type": "table",
+                "doc": "The number of nodes in each component, largest first.",
+            },
+        }
         if self.get_config_value("find_largest_component"):
             result["largest_component"] = {
-                "type": "network_graph",
+                "type": "network_data",
                 "doc": "A sub-graph of the largest component of the graph.",
             }
 
@@ -59,25 +84,31 @@ class GraphComponentsModule(KiaraModule):
 
         return result
 
+    @cached_process()
     def process(self, inputs: ValueMap, outputs: ValueMap) -> None:
 
-        if self.get_config_value("find_largest_component"):
-            input_graph: Graph = inputs.get_value_data("graph")
-            print(f"INPUT: {input_graph}")
-            undir_graph = nx.to_undirected(input_graph)
-            undir_components = nx.connected_components(undir_graph)
-            lg_component = max(undir_components, key=len)
-            subgraph = input_graph.subgraph(lg_component)
-            print(f"subgraph: {subgraph}")
-
-            outputs.set_values(largest_component=subgraph)
+        network_data: NetworkData = inputs.get_value_data("network_data")
 
-        if self.get_config_value("number_of_components"):
-            input_graph = inputs.get_value_data("graph")
-            undir_graph = nx.to_undirected(input_graph)
-            number_of_components = nx.number_connected_components(undir_graph)
+        components, sizes = calculate_connected_components(
+            network_data.num_nodes, iter_edge_batches(network_data)
+        )
 
-            outputs.set_values(number_of_components=number_of_components)
+        outputs.set_values(
+            components_network=augment_network_data(
+                network_data, node_columns={"component": components}
+            ),
+            component_sizes=pa.table(
+                {"Component": np.arange(len(sizes)), "Size": sizes}
+            ),
+        )
 
+        if self.get_config_value("find_largest_component"):
+            nodes_table, edges_table = filter_component(network_data, components, 0)
+            outputs.set_values(
+                largest_component=NetworkData.create_network_data(
+                    nodes_table=nodes_table, edges_table=edges_table
+                )
+            )
 
-# hmm.. how do I run this? kiara run playground.playground.find_largest_component
+        if self.get_config_value("number_of_components"):
+            outputs.set_values(number_of_components=len(sizes))
@@ -1,9 +1,19 @@
+from typing import Any, Dict
+
 from kiara.api import KiaraModule, ValueMapSchema
-import networkx as nx
-from networkx.algorithms import community
-from operator import itemgetter
+from kiara.exceptions import KiaraProcessingException
+import numpy as np
+import pyarrow as pa
 
 from kiara_plugin.network_analysis.models import NetworkData
+from kiara_plugin.playground.utils.cache import cached_process, memoised_call
+from kiara_plugin.playground.utils.centrality import resolve_processes
+from kiara_plugin.playground.utils.communities import (
+    calculate_cnm_dendrogram,
+    calculate_louvain_runs,
+    modularity_adjacency,
+)
+from kiara_plugin.playground.utils.networks import NetworkArrays, augment_network_data
 
 KIARA_METADATA = {
     "authors": [
@@ -15,7 +25,11 @@ KIARA_METADATA = {
 class ModularityCommunity(KiaraModule):
     """Calculate modularity for each node and attach modularity group number to node list as attribute.
 
-    This networkX based function uses Clauset-Newman-Moore greedy modularity maximization to find the community partition with the largest modularity.
+    This uses Clauset-Newman-Moore greedy modularity maximization to find the community partition with the largest modularity. The results are the same as
+    with networkX 'greedy_modularity_communities': https://networkx.org/documentation/stable/reference/algorithms/generated/networkx.algorithms.community.modularity_max.greedy_modularity_communities.html
+
+    The algorithm runs only once per network: the whole sequence of community merges is recorded (and kept in memory per network), and the partition for any number of communities
+    is cut from that. So trying out different values for 'number_of_communities' on the same network is cheap.
 
     Modularity community is a density-based community detection method that investigates the structural composition of a network.
     """
@@ -49,33 +63,186 @@ class ModularityCommunity(KiaraModule):
             "maximum_modularity":{
                 "type": "integer",
                 "doc": "The number of communities at which maximum modularity is reached for this network. If the 'number_of_communities' is manually set, this number might deviate from the manually computed number.",
+            },
+            "modularity_curve": {
+                "type": "table",
+                "doc": "The modularity of the network for each number of communities the greedy algorithm passed through, from every node in its own community to the fewest possible communities.",
             }
         }
     
+    @cached_process()
     def process(self, inputs, outputs):
         edges = inputs.get_value_obj('network_data')
 
         network_data: NetworkData = edges.data
 
-        G = network_data.as_networkx_graph(nx.Graph) #Other graph types will work as well and modularity group distribution can be different with different graph types. Maximum modularity can also be affected by edge weight, but this parameter is currently not set. If the graph consists on many unconnected components, then the modularity groups will mostly coincide with the components. It would then make sense to extract the largest connected component first and to run the modularity module on the largest component.
-
-        number_of_communities = inputs.get_value_data("number_of_communities") #TODO: This integer must be in range [1, G.number_of_nodes()]; otherwise it will throw a networkX error.
+        # Modularity groups are computed on the undirected, unweighted simple graph. If the graph consists on many unconnected components, then the modularity groups will mostly coincide with the components. It would then make sense to extract the largest connected component first and to run the modularity module on the largest component.
+        dendrogram = memoised_call(
+            "cnm_dendrogram",
+            [edges.value_hash],
+            lambda: calculate_cnm_dendrogram(NetworkArrays.from_network_data(network_data, weighted=False)),
+        )
 
-        if number_of_communities is None:
-            communities = community.greedy_modularity_communities(G)
-            maximum_modularity = len(communities)
-        else:
-            communities = community.greedy_modularity_communities(G, cutoff=number_of_communities, best_n=number_of_communities)
-            max_communities = community.greedy_modularity_communities(G)
-            maximum_modularity = len(max_communities)
+        number_of_communities = inputs.get_value_data("number_of_communities")
+        if number_of_communities is not None and not 1 <= number_of_communities <= dendrogram.num_nodes:
+            raise KiaraProcessingException(f"Invalid number of communities '{number_of_communities}': must be between 1 and the number of nodes ({dendrogram.num_nodes}).")
 
-        modularity_dict = {} 
-        for i,c in enumerate(communities): # Loop through the list of communities, keeping track of the number for the community
-            for name in c: # Loop through each node in a community
-                modularity_dict[name] = i # Create an entry in the dictionary for the node, where the value is which group it belongs to.
+        # group numbers are already aligned with the nodes table, so they can be added as a column directly
+        modularity_groups = dendrogram.partition(number_of_communities)
+        maximum_modularity = len(set(dendrogram.partition().tolist()))
 
-        nx.set_node_attributes(G, modularity_dict, 'modularity_group')
+        num_communities, modularity = dendrogram.modularity_curve()
+        modularity_curve = pa.table({"Communities": num_communities, "Modularity": modularity})
 
-        attribute_network = NetworkData.create_from_networkx_graph(G)
+        attribute_network = augment_network_data(network_data, node_columns={'modularity_group': modularity_groups})
         
-        outputs.set_values(modularity_network=attribute_network, maximum_modularity=maximum_modularity)
\ No newline at end of file
+        outputs.set_values(modularity_network=attribute_network, maximum_modularity=maximum_modularity, modularity_curve=modularity_curve)
+
+
+class LouvainCommunity(KiaraModule):
+    """Detect communities with the Louvain method and attach the community number to the node list as 'modularity_group' attribute.
+
+    The Louvain method maximises modularity by moving single nodes to neighbouring communities, and then merging every community into a single node, over and over again.
+    It is much faster than the greedy modularity ('compute.modularity_group') on big networks, and takes edge weights into account. Nodes are visited via a queue, like in the
+    'fast local moving' step of the Leiden algorithm, and (unless 'connected_communities' is disabled) communities that fall apart are split, so that every community is connected.
+    https://networkx.org/documentation/stable/reference/algorithms/generated/networkx.algorithms.community.louvain.louvain_communities.html
+
+    The result depends on the order nodes are visited in, which is random. The algorithm can be run several times (with different seeds, and/or resolutions), in a pool of worker
+    processes, and the partition with the highest modularity is kept.
+    """
+
+    _module_type_name = 'compute.louvain_group'
+
+    def create_inputs_schema(
+        self,
+    ) -> ValueMapSchema:
+
+        result: Dict[str, Dict[str, Any]] = {
+            "network_data": {
+                "type": "network_data",
+                "doc": "The network data to analyze.",
+                "optional": False,
+            },
+            "weighted": {
+                "type": "boolean",
+                "doc": "Whether to take edge weights into account. Parallel edges are always added up.",
+                "default": True,
+            },
+            "weight_column_name": {
+                "type": "string",
+                "doc": "The name of the column in the edge table containing data for the 'weight' of an edge. If there is a column already named 'weight', this will be automatically selected. If otherwise left empty, every edge is assigned a weight of 1.",
+                "default": "",
+            },
+            "resolution": {
+                "type": "float",
+                "doc": "The resolution parameter: values above 1 lead to more and smaller communities, values below 1 to fewer and bigger ones.",
+                "default": 1.0,
+            },
+            "resolutions": {
+                "type": "list",
+                "doc": "A list of resolution values to try out (instead of 'resolution'). The partition with the highest (standard) modularity is kept, details of all runs are in the 'community_runs' output.",
+                "optional": True,
+            },
+            "restarts": {
+                "type": "integer",
+                "doc": "The number of runs (with different seeds) per resolution, the partition with the highest modularity is kept.",
+                "default": 1,
+            },
+            "seed": {
+                "type": "integer",
+                "doc": "The seed for the first run, further runs use the following numbers. Set this to get reproducible results.",
+                "optional": True,
+            },
+            "connected_communities": {
+                "type": "boolean",
+                "doc": "Whether to split communities that are not connected, so that every community is connected (like with the Leiden algorithm).",
+                "default": True,
+            },
+            "processes": {
+                "type": "integer",
+                "doc": "The number of worker processes the runs are split across. If not set, all available cores are used.",
+                "optional": True,
+            },
+        }
+        return result
+
+    def create_outputs_schema(self):
+        return {
+            "louvain_network": {
+                "type": "network_data",
+                "doc": "Updated network data with the community number assigned as 'modularity_group' node attribute (the largest community is number 0)."
+            },
+            "number_of_communities": {
+                "type": "integer",
+                "doc": "The number of communities that were found.",
+            },
+            "modularity": {
+                "type": "float",
+                "doc": "The (standard) modularity of the partition.",
+            },
+            "community_runs": {
+                "type": "table",
+                "doc": "The resolution, seed, number of communities and modularity of every run. 'Quality' is the modularity for the resolution of the run.",
+            },
+        }
+
+    @cached_process("processes", seed_input="seed")
+    def process(self, inputs, outputs):
+        edges = inputs.get_value_obj('network_data')
+
+        network_data: NetworkData = edges.data
+
+        arrays = NetworkArrays.from_network_data(
+            network_data,
+            weight_column_name=inputs.get_value_data('weight_column_name'),
+            weighted=inputs.get_value_data('weighted'),
+        )
+        adjacency = modularity_adjacency(arrays)
+
+        resolutions = inputs.get_value_data('resolutions')
+        if not resolutions:
+            resolutions = [inputs.get_value_data('resolution')]
+        try:
+            resolutions = [float(resolution) for resolution in resolutions]
+        except (TypeError, ValueError):
+            raise KiaraProcessingException(f"Invalid resolutions '{resolutions}': must be a list of numbers.")
+        if any(resolution <= 0 for resolution in resolutions):
+            raise KiaraProcessingException("Invalid resolution: must be greater than 0.")
+
+        restarts = inputs.get_value_data('restarts')
+        if restarts < 1:
+            raise KiaraProcessingException(f"Invalid number of restarts '{restarts}': must be at least 1.")
+        seed = inputs.get_value_data('seed')
+        if seed is None:
+            seed = int(np.random.SeedSequence().entropy % 2**31)
+        seeds = [seed + i for i in range(restarts)]
+
+        runs = calculate_louvain_runs(
+            adjacency,
+            resolutions,
+            seeds,
+            connected=inputs.get_value_data('connected_communities'),
+            processes=resolve_processes(inputs.get_value_data('processes')),
+        )
+
+        # ties go to the first run, so results don't depend on the number of processes
+        best = max(range(len(runs)), key=lambda i: (runs[i][3], -i))
+        _, _, groups, modularity, _ = runs[best]
+
+        community_runs = pa.table({
+            "Resolution": [run[0] for run in runs],
+            "Seed": [run[1] for run in runs],
+            "Communities": [int(run[2].max()) + 1 if len(run[2]) else 0 for run in runs],
+            "Modularity": [run[3] for run in runs],
+            "Quality": [run[4] for run in runs],
+            "Selected": [i == best for i in range(len(runs))],
+        })
+
+        attribute_network = augment_network_data(network_data, node_columns={'modularity_group': groups})
+
+        outputs.set_values(
+            louvain_network=attribute_network,
+            number_of_communities=int(groups.max()) + 1 if len(groups) else 0,
+            modularity=modularity,
+            community_runs=community_runs,
+        )
@@ -1,7 +1,22 @@
+from typing import Any, Dict
+
 from kiara.api import KiaraModule, ValueMapSchema
-import networkx as nx
+from kiara.exceptions import KiaraProcessingException
 
 from kiara_plugin.network_analysis.models import NetworkData
+from kiara_plugin.network_analysis.utils import (
+    guess_node_id_column_name,
+    guess_node_label_column_name,
+    guess_source_column_name,
+    guess_target_column_name,
+)
+from kiara_plugin.playground.utils.cache import cached_process
+from kiara_plugin.playground.utils.gml import read_gml_tables
+from kiara_plugin.playground.utils.network_files import (
+    create_network_tables,
+    get_file_format,
+    read_table_file,
+)
 
 KIARA_METADATA = {
     "authors": [
@@ -13,6 +28,9 @@ KIARA_METADATA = {
 class GmlOnboarding(KiaraModule):
     """This is a preliminary module for onboarding network data from gml files. It will likely be replaced by more generic onboarding modules when those are ready.
     Based on networkX deserialise GML file method: https://networkx.org/documentation/stable/reference/readwrite/generated/networkx.readwrite.gml.read_gml.html#networkx.readwrite.gml.read_gml
+
+    The file is parsed with the same rules as networkX uses, but it is read in a streaming fashion (from a memory-mapped file), and nodes and edges are written to the
+    node and edge tables directly, in batches, without building a networkX graph. So also very big GML files can be onboarded. Edges are kept in the order they appear in the file.
     """
     
     _module_type_name = 'onboard.gml_file'
@@ -52,19 +70,123 @@ class GmlOnboarding(KiaraModule):
     def process(self, inputs, outputs):
 
         input_file = inputs.get_value_data('file') # input file is a 'FileModel' object
-        gml_file= input_file
-
-        #print(gml_file)
         label = inputs.get_value_data('label')
-        #print(label)
 
-        if label is None:
-            G = nx.read_gml(input_file.path) # 'file' has several convenience attributes of which here we need the 'path' one, which is the path to where it is stored in the kiara data store.. If you wanted only the text content, you could for example use the 'read_text utility' function.
-            #print("no label")
-        else:
-            G = nx.read_gml(input_file.path, label=label)
-            #print("with label")
+        # 'file' has several convenience attributes of which here we need the 'path' one, which is the path to where it is stored in the kiara data store.
+        # Without a 'label' input, nodes are labelled by their 'label' attribute (the default of networkX 'read_gml').
+        nodes_table, edges_table = read_gml_tables(input_file.path, label=label if label is not None else "label")
 
-        network_data = NetworkData.create_from_networkx_graph(G)
+        network_data = NetworkData.create_network_data(nodes_table=nodes_table, edges_table=edges_table)
         
-        outputs.set_values(network_data=network_data)
\ No newline at end of file
+        outputs.set_values(network_data=network_data)
+
+
+class NetworkFilesOnboarding(KiaraModule):
+    """Onboard network data from an edge list file, and (optionally) a node list file, in CSV, TSV or Parquet format.
+
+    Files are read with the multithreaded, block-wise parsers of pyarrow, and node identifiers are dictionary-encoded into compact (int32) node ids, without building a networkX graph.
+    Nodes keep the order of the node list, nodes that only appear in the edge list are added at the end (with their identifier as label). Without a node list, nodes are created from the
+    source and target columns, in the order they first appear.
+
+    If no source/target or id/label column names are provided, the most likely columns are auto-detected (for example 'Source', 'Target', 'Id' and 'Label').
+    All other columns are kept as node and edge attributes.
+    """
+
+    _module_type_name = 'onboard.network_files'
+
+    def create_inputs_schema(
+        self,
+    ) -> ValueMapSchema:
+
+        result: Dict[str, Dict[str, Any]] = {
+            "edges_file": {
+                "type": "file",
+                "doc": "The edge list file (with the extension '.csv', '.tsv' or '.parquet').",
+                "optional": False,
+            },
+            "nodes_file": {
+                "type": "file",
+                "doc": "The node list file (with the extension '.csv', '.tsv' or '.parquet').",
+                "optional": True,
+            },
+            "source_column": {
+                "type": "string",
+                "doc": "The name of the source column in the edge list. Auto-detected if not provided.",
+                "optional": True,
+            },
+            "target_column": {
+                "type": "string",
+                "doc": "The name of the target column in the edge list. Auto-detected if not provided.",
+                "optional": True,
+            },
+            "id_column": {
+                "type": "string",
+                "doc": "The name of the node list column that contains the node identifiers used in the edge list. Auto-detected if not provided.",
+                "optional": True,
+            },
+            "label_column": {
+                "type": "string",
+                "doc": "The name of the node list column that contains the node labels. Auto-detected if not provided, if there is no such column, the node identifiers are used as labels.",
+                "optional": True,
+            },
+            "aggregate_duplicate_edges": {
+                "type": "boolean",
+                "doc": "Whether to merge edges with the same source and target into a single edge, with the sum of their weights (or, if there is no weight column, the number of merged edges) as 'weight'.",
+                "default": False,
+            },
+            "weight_column_name": {
+                "type": "string",
+                "doc": "The name of the column in the edge list containing data for the 'weight' of an edge, used when aggregating duplicate edges. If there is a column already named 'weight', this will be automatically selected.",
+                "default": "",
+            },
+        }
+        return result
+
+    def create_outputs_schema(self):
+        return {
+            "network_data": {
+                "type": "network_data",
+                "doc": "The network/graph data."
+            }
+        }
+
+    @cached_process()
+    def process(self, inputs, outputs):
+
+        edges_file = inputs.get_value_data('edges_file')
+        edges_table = read_table_file(edges_file.path, get_file_format(edges_file.file_name))
+
+        source_column = inputs.get_value_data('source_column') or guess_source_column_name(edges_table)
+        target_column = inputs.get_value_data('target_column') or guess_target_column_name(edges_table)
+        if not source_column or not target_column:
+            if len(edges_table.column_names) < 2:
+                raise KiaraProcessingException(f"Can't create network: the edge list needs at least a source and a target column, found: {', '.join(edges_table.column_names)}")
+            # like 'assemble.network_data': without recognisable names, the first two columns are used
+            source_column = source_column or edges_table.column_names[0]
+            target_column = target_column or edges_table.column_names[1]
+
+        nodes_table = None
+        id_column = None
+        label_column = None
+        if inputs.get_value_obj('nodes_file').is_set:
+            nodes_file = inputs.get_value_data('nodes_file')
+            nodes_table = read_table_file(nodes_file.path, get_file_format(nodes_file.file_name))
+            id_column = inputs.get_value_data('id_column') or guess_node_id_column_name(nodes_table)
+            if not id_column:
+                raise KiaraProcessingException(f"Could not auto-detect the node id column. Please specify it manually using one of: {', '.join(nodes_table.column_names)}")
+            label_column = inputs.get_value_data('label_column') or guess_node_label_column_name(nodes_table)
+
+        nodes_table, edges_table = create_network_tables(
+            edges_table,
+            source_column_name=source_column,
+            target_column_name=target_column,
+            nodes_table=nodes_table,
+            id_column_name=id_column,
+            label_column_name=label_column,
+            aggregate_duplicate_edges=inputs.get_value_data('aggregate_duplicate_edges'),
+            weight_column_name=inputs.get_value_data('weight_column_name') or None,
+        )
+
+        network_data = NetworkData.create_network_data(nodes_table=nodes_table, edges_table=edges_table)
+
+        outputs.set_values(network_data=network_data)
@@ -0,0 +1,200 @@
+import tempfile
+
+from kiara.api import KiaraModule, ValueMapSchema
+from kiara.exceptions import KiaraProcessingException
+
+from kiara_plugin.playground.utils.corpus import (
+    DEFAULT_CORPUS_BATCH_SIZE,
+    DEFAULT_READ_WORKERS,
+    ENCODING_ERROR_POLICIES,
+    NORMALIZATION_FORMS,
+    merge_processed_rows,
+    read_text_corpus,
+    update_text_corpus,
+)
+
+
+class TextCorpusOnboarding(KiaraModule):
+    """Onboard a folder of text files as a corpus table, with the same columns as 'create.table.from.text_file_bundle' ('id', 'rel_path', 'mime_type', 'size', 'content', 'file_name').
+
+    Files are read, decoded and normalised in parallel (by a pool of worker threads, in chunks of 'batch_size' files), and the table is assembled from the resulting record batches without copying them. By default, batches are written to a temporary Arrow file as soon as they are read, and the table is memory-mapped from it, so also corpora that don't fit into memory can be onboarded.
+
+    Corpora can be updated incrementally: along with the corpus table, a manifest with the size, modification time and content hash of every file is created. If the corpus table and manifest of a previous run are provided, only new and changed files are read, and appended to the previous corpus table. The rows of new and changed files are also returned on their own ('new_rows'), so that subsequent steps only need to process those.
+    """
+
+    _module_type_name = "onboard.text_corpus"
+
+    def create_inputs_schema(
+        self,
+    ) -> ValueMapSchema:
+
+        return {
+            "path": {
+                "type": "string",
+                "doc": "The path to the folder that contains the text files (sub-folders are included).",
+            },
+            "include_files": {
+                "type": "list",
+                "doc": "If provided, only files that end with one of the items in this list (for example: '.txt') are onboarded.",
+                "optional": True,
+            },
+            "exclude_dirs": {
+                "type": "list",
+                "doc": "The names of sub-folders to ignore.",
+                "optional": True,
+            },
+            "encoding": {
+                "type": "string",
+                "doc": "The encoding of the text files.",
+                "default": "utf-8",
+            },
+            "encoding_errors": {
+                "type": "string",
+                "doc": f"What to do with files that can't be decoded, one of: {', '.join(ENCODING_ERROR_POLICIES)}.",
+                "default": "error",
+            },
+            "normalization": {
+                "type": "string",
+                "doc": f"The unicode normalization form to normalise the texts to, one of: {', '.join(NORMALIZATION_FORMS)}. If not set, texts are kept as they are (like with 'create.table.from.text_file_bundle'). Line endings ('\\r\\n' and '\\r') are always normalised to '\\n'.",
+                "optional": True,
+            },
+            "batch_size": {
+                "type": "integer",
+                "doc": "The (maximum) number of files that are read at once, and stored in one record batch of the table.",
+                "default": DEFAULT_CORPUS_BATCH_SIZE,
+            },
+            "max_workers": {
+                "type": "integer",
+                "doc": f"The number of threads to read files with (default: the number of cores, {DEFAULT_READ_WORKERS} on this machine).",
+                "optional": True,
+            },
+            "previous_corpus": {
+                "type": "table",
+                "doc": "The corpus table of a previous run (for the same folder), to update incrementally.",
+                "optional": True,
+            },
+            "previous_manifest": {
+                "type": "table",
+                "doc": "The manifest of the previous run, required if 'previous_corpus' is provided.",
+                "optional": True,
+            },
+            "spill_to_disk": {
+                "type": "boolean",
+                "doc": "Whether to write the record batches to a temporary file as soon as they are read, instead of keeping them in memory.",
+                "default": True,
+            },
+        }
+
+    def create_outputs_schema(self):
+        return {
+            "corpus_table": {
+                "type": "table",
+                "doc": "The corpus table, with one row per text file, sorted by relative path (when updated incrementally, new and changed files are appended at the end).",
+            },
+            "manifest": {
+                "type": "table",
+                "doc": "The relative path, size, modification time and content hash of every onboarded file, to update the corpus incrementally in a later run.",
+            },
+            "new_rows": {
+                "type": "table",
+                "doc": "The rows of the files that were read in this run (all rows, if the corpus wasn't updated incrementally).",
+            },
+        }
+
+    def process(self, inputs, outputs) -> None:
+
+        include_files = inputs.get_value_data("include_files")
+        exclude_dirs = inputs.get_value_data("exclude_dirs")
+        max_workers = inputs.get_value_data("max_workers")
+        previous_corpus = inputs.get_value_data("previous_corpus")
+        previous_manifest = inputs.get_value_data("previous_manifest")
+
+        path = inputs.get_value_data("path")
+        list_config = {
+            "include_files": getattr(include_files, "list_data", include_files),
+            "exclude_dirs": getattr(exclude_dirs, "list_data", exclude_dirs),
+        }
+        read_config = {
+            "batch_size": inputs.get_value_data("batch_size"),
+            "max_workers": max_workers if max_workers else DEFAULT_READ_WORKERS,
+            "encoding": inputs.get_value_data("encoding"),
+            "errors": inputs.get_value_data("encoding_errors"),
+            "normalization": inputs.get_value_data("normalization"),
+            "spill_dir": (
+                tempfile.gettempdir()
+                if inputs.get_value_data("spill_to_disk")
+                else None
+            ),
+        }
+
+        if previous_corpus is None:
+            table, manifest = read_text_corpus(path, **list_config, **read_config)
+            new_rows = table
+        else:
+            if previous_manifest is None:
+                raise KiaraProcessingException(
+                    "Can't update corpus: no manifest of the previous run provided."
+                )
+            # only new and changed files are read, the rows of all other files are taken from the previous corpus
+            table, manifest, new_rows = update_text_corpus(
+                path,
+                previous_corpus.arrow_table,
+                previous_manifest.arrow_table,
+                **list_config,
+                **read_config,
+            )
+
+        outputs.set_values(corpus_table=table, manifest=manifest, new_rows=new_rows)
+
+
+class MergeProcessedRows(KiaraModule):
+    """Merge the processed new rows of an incrementally updated corpus into the processed table of the previous run.
+
+    Steps that follow 'onboard.text_corpus' (like date parsing or tokenisation) only need to process its 'new_rows' output. This module combines their result with the result of the previous run: rows of files that were removed or changed since are dropped, and the new rows are appended, so the merged table has the same rows as the updated corpus table. If no previous table is provided, the new rows are returned as they are.
+    """
+
+    _module_type_name = "playground.corpus.merge_processed_rows"
+
+    def create_inputs_schema(
+        self,
+    ) -> ValueMapSchema:
+
+        return {
+            "corpus_table": {
+                "type": "table",
+                "doc": "The (updated) corpus table, as created by 'onboard.text_corpus'.",
+            },
+            "new_rows": {
+                "type": "table",
+                "doc": "The processed 'new_rows' of 'onboard.text_corpus'.",
+            },
+            "previous_table": {
+                "type": "table",
+                "doc": "The merged table of the previous run, if the corpus was updated incrementally.",
+                "optional": True,
+            },
+            "id_column_name": {
+                "type": "string",
+                "doc": "The name of the column with the row ids.",
+                "default": "id",
+            },
+        }
+
+    def create_outputs_schema(self):
+        return {
+            "table": {"type": "table", "doc": "The processed rows of the whole corpus."}
+        }
+
+    def process(self, inputs, outputs) -> None:
+
+        previous_table = inputs.get_value_data("previous_table")
+
+        table = merge_processed_rows(
+            inputs.get_value_data("corpus_table").arrow_table,
+            inputs.get_value_data("new_rows").arrow_table,
+            previous_table=(
+                None if previous_table is None else previous_table.arrow_table
+            ),
+            id_column_name=inputs.get_value_data("id_column_name"),
+        )
+        outputs.set_value("table", table)
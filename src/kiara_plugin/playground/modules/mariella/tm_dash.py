@@ -1,8 +1,95 @@
 from kiara.api import KiaraModule
 from kiara.exceptions import KiaraProcessingException
-import pandas as pd
-import re
-import pyarrow as pa
+import pyarrow.compute as pc
+
+from kiara_plugin.playground.utils.cache import cached_process, memoised_call
+from kiara_plugin.playground.utils.tables import (
+    DEFAULT_DATE_FORMATS,
+    TIME_GRANULARITIES,
+    count_by_day,
+    extract_dates,
+    extract_file_name_metadata,
+    get_column,
+    map_values,
+    rollup_counts,
+    sample_table,
+    set_column,
+    validate_column_identifier,
+)
+
+
+class ExtractDates(KiaraModule):
+    """Extract dates from an array of strings (like file names), with vectorised Arrow compute functions.
+
+    Unlike 'parse.date_array', which calls a date parser for every item, the date strings are extracted for the whole array at once, either with regular expressions (that contain a group named 'date', for example '_(?P<date>\\d{4}-\\d{2}-\\d{2})_'; if several patterns are provided, the first one that results in a valid date is used), or by cutting the strings at 'min_index' and 'max_index'. They are then parsed with the first matching of the provided date formats. Items without a valid date are null in the resulting array, and marked in the 'null_mask' output.
+    """
+
+    _module_type_name = "playground.parse.date_array"
+
+    def create_inputs_schema(self):
+
+        return {
+            "array": {
+                "type": "array",
+                "doc": "The strings to extract the dates from."
+            },
+            "patterns": {
+                "type": "list",
+                "doc": "Regular expressions with a group named 'date', to extract the date strings with. If not provided, 'min_index' and 'max_index' are used.",
+                "optional": True
+            },
+            "formats": {
+                "type": "list",
+                "doc": "The formats to parse the date strings with ('strptime' syntax), tried in order.",
+                "default": list(DEFAULT_DATE_FORMATS)
+            },
+            "min_index": {
+                "type": "integer",
+                "doc": "The start of the date string, if no patterns are provided.",
+                "optional": True
+            },
+            "max_index": {
+                "type": "integer",
+                "doc": "The end of the date string, if no patterns are provided.",
+                "optional": True
+            },
+            "force_non_null": {
+                "type": "boolean",
+                "doc": "Whether to raise an error if no date can be extracted from an item, instead of setting it to null.",
+                "default": False
+            }
+        }
+
+    def create_outputs_schema(self):
+        return {
+            "date_array": {
+                "type": "array",
+                "doc": "The extracted dates (as timestamps)."
+            },
+            "null_mask": {
+                "type": "array",
+                "doc": "Whether no date could be extracted from an item, for every item."
+            }
+        }
+
+    def process(self, inputs, outputs) -> None:
+
+        array = inputs.get_value_data("array").arrow_array
+        patterns = inputs.get_value_data("patterns")
+        formats = inputs.get_value_data("formats")
+
+        # 'list' values are wrapped in a model, the actual list is its 'list_data'
+        dates, missing = extract_dates(
+            array,
+            patterns=getattr(patterns, "list_data", patterns),
+            formats=getattr(formats, "list_data", formats),
+            min_index=inputs.get_value_data("min_index"),
+            max_index=inputs.get_value_data("max_index"),
+            force_non_null=inputs.get_value_data("force_non_null"),
+        )
+
+        outputs.set_values(date_array=dates, null_mask=missing)
+
 
 class FileNameMetadata(KiaraModule):
 
@@ -18,6 +105,11 @@ class FileNameMetadata(KiaraModule):
             "column_name": {
                 "type": "string",
                 "doc": "The column containing metadata. In order to work, file names need to comply with LCCN pattern '/sn86069873/1900-01-05/' containing publication reference and date."
+            },
+            "date_array": {
+                "type": "array",
+                "doc": "The dates of the file names, if they were already extracted (for example with 'playground.parse.date_array'), so they are not parsed again.",
+                "optional": True
             }
         }
 
@@ -39,36 +131,26 @@ class FileNameMetadata(KiaraModule):
 
     def process(self, inputs, outputs) -> None:
 
-        table_obj = inputs.get_value_obj("table_input")
+        table = inputs.get_value_data("table_input").arrow_table
         column_name = inputs.get_value_obj("column_name").data
 
-        df = table_obj.data.to_pandas()
-
-         # get publication ref from file name
-        def get_ref(file):
-            ref_match = re.findall(r'(\w+\d+)_\d{4}-\d{2}-\d{2}_',file)
-            if not ref_match:
-                raise KiaraProcessingException(f"Can't process corpus, invalid format for file name: {file}")
-            return ref_match[0]
-
-        # get date from file name
-        def get_date(file):
-            date_match = re.findall(r'_(\d{4}-\d{2}-\d{2})_',file)
-            if not date_match:
-                raise KiaraProcessingException(f"Can't process corpus, invalid format for file name: {file}")
-            return date_match[0]
-        
-        df['date'] = df['file_name'].apply(lambda x: get_date(x))
+        date_array = inputs.get_value_data("date_array")
 
-        df['publication'] = df[column_name].apply(lambda x: get_ref(x))
-        
-        df['date'] = pd.to_datetime(df['date'])
-        df = df.sort_values(by='date')
+        # publication ref and date are extracted from the file names together, with a single (vectorised) regex
+        # dates that were already extracted are re-used as they are
+        publications, dates = extract_file_name_metadata(
+            get_column(table, column_name),
+            dates=date_array.arrow_array if date_array is not None else None,
+        )
+
+        table = set_column(table, 'date', dates)
+        table = set_column(table, 'publication', publications)
+        table = table.sort_by([('date', 'ascending')])
 
-        publications = df['publication'].unique().tolist()
+        publications = pc.unique(table.column('publication')).to_pylist()
         # counts = [df['publication'].value_counts().index.to_list(),df['publication'].value_counts().to_list()]
 
-        outputs.set_value("table_output", df)
+        outputs.set_value("table_output", table)
         # unique publications references useful at the next step to map publications references with publications names
         outputs.set_value("publications_ref", publications)
         # outputs.set_value("publications_count", counts)
@@ -97,6 +179,11 @@ class MapColumn(KiaraModule):
             "output_col_name": {
                 "type": "string",
                 "doc": "name of the newly created column"
+            },
+            "unmapped_values": {
+                "type": "string",
+                "doc": "What to do with values that are not in the mapping: 'keep' them as they are, set them to 'null', or raise an 'error'.",
+                "default": "keep"
             }
         }
 
@@ -114,13 +201,19 @@ class MapColumn(KiaraModule):
         column_name = inputs.get_value_obj("column_name").data
         mapping_keys = inputs.get_value_obj("mapping_keys").data
         output_col_name = inputs.get_value_obj("output_col_name").data
+        unmapped_values = inputs.get_value_obj("unmapped_values").data
 
-        df = table_obj.data.to_pandas()
+        # 'list' values are wrapped in a model, the actual list is its 'list_data'
+        mapping_keys = getattr(mapping_keys, "list_data", mapping_keys)
+        if not isinstance(mapping_keys, list) or len(mapping_keys) != 2:
+            raise KiaraProcessingException("Invalid mapping keys: must be a list containing 2 lists, the values to replace and the values to replace them with.")
 
-        df[output_col_name] = df[column_name].replace(to_replace=mapping_keys[0], value=mapping_keys[1])
+        table = table_obj.data.arrow_table
 
+        # only the mapped column is read and created, all other columns (like the text content) are re-used as they are
+        mapped = map_values(get_column(table, column_name), mapping_keys[0], mapping_keys[1], unmapped=unmapped_values)
 
-        outputs.set_value("table_output", df)
+        outputs.set_value("table_output", set_column(table, output_col_name, mapped))
 
 
 class TableSample(KiaraModule):
@@ -133,6 +226,21 @@ class TableSample(KiaraModule):
             "table_input": {
                 "type": "table",
                 "doc": "The table for which we need to create a sample, in order to test the results on a small portion of a table."
+            },
+            "n": {
+                "type": "integer",
+                "doc": "The number of rows to sample (per group, if 'stratify_by' is set).",
+                "default": 15
+            },
+            "seed": {
+                "type": "integer",
+                "doc": "The random seed, set it to get the same sample every time.",
+                "optional": True
+            },
+            "stratify_by": {
+                "type": "string",
+                "doc": "The name of a column (for example 'publication') to sample 'n' rows for each of its distinct values. Date columns are grouped by year.",
+                "optional": True
             }
         }
 
@@ -140,19 +248,23 @@ class TableSample(KiaraModule):
         return {
             "table_sample": {
                 "type": "table",
-                "doc": "Random sample of 15 rows for the input table."
+                "doc": "Random sample of rows of the input table, in their original order."
             }
         }
 
     def process(self, inputs, outputs) -> None:
 
         table_obj = inputs.get_value_obj("table_input")
-        
-        df = table_obj.data.to_pandas() 
-        df_sample = df.sample(n=15,axis=0)
-        if '__index_level_0__' in df_sample.columns:
-            df_sample = df_sample.drop(['__index_level_0__'],axis=1)
-        table_pa = pa.Table.from_pandas(df_sample)
+        n = inputs.get_value_obj("n").data
+        seed = inputs.get_value_obj("seed").data
+        stratify_by = inputs.get_value_obj("stratify_by").data
+
+        table = table_obj.data.arrow_table
+        if '__index_level_0__' in table.column_names:
+            table = table.drop_columns(['__index_level_0__'])
+
+        # rows are sampled with a reservoir over record batches, only the sampled rows are copied
+        table_pa = sample_table(table, n, seed=seed, stratify_by=stratify_by)
         outputs.set_value("table_sample", table_pa)
 
 
@@ -169,7 +281,12 @@ class AddColumn(KiaraModule):
             },
             "array_input": {
                 "type": "array",
-                "doc": "The array that needs to be appended as a column."
+                "doc": "The array that needs to be appended as a column. It needs to have as many items as the table has rows."
+            },
+            "column_name": {
+                "type": "string",
+                "doc": "The name of the new column. An existing column with the same name is replaced.",
+                "default": "preprocessed_tokens"
             }
         }
 
@@ -185,13 +302,12 @@ class AddColumn(KiaraModule):
 
         table_obj = inputs.get_value_obj("table_input")
         array_obj = inputs.get_value_obj("array_input")
-        
-        df = table_obj.data.to_pandas()
-        col = array_obj.data.to_pylist()
+        column_name = inputs.get_value_obj("column_name").data
 
-        df['preprocessed_tokens'] = col
+        # the Arrow array (for example list<string> tokens) is added as it is, neither the table nor the array is copied
+        table = set_column(table_obj.data.arrow_table, column_name, array_obj.data.arrow_array)
         
-        outputs.set_value("preprocessed_tokens", df)
+        outputs.set_value("preprocessed_tokens", table)
 
 
 class VizDataQuery(KiaraModule):
@@ -222,18 +338,81 @@ class VizDataQuery(KiaraModule):
     def process(self, inputs, outputs) -> None:
 
         agg = inputs.get_value_obj("query_type").data
-        col = inputs.get_value_obj("column").data
+        # the column name is part of the query, so it must be a plain identifier
+        col = validate_column_identifier(inputs.get_value_obj("column").data)
 
         if agg == 'month':
-            query = f"SELECT strptime(concat(month, '/', year), '%m/%Y') as date, {col} as publication_name, count FROM (SELECT YEAR(date) as year, MONTH(date) as month, {col}, count(*) as count FROM data GROUP BY {col}, YEAR(date), MONTH(date))"
+            query = f"SELECT strptime(concat(month, '/', year), '%m/%Y') as date, \"{col}\" as publication_name, count FROM (SELECT YEAR(date) as year, MONTH(date) as month, \"{col}\", count(*) as count FROM data GROUP BY \"{col}\", YEAR(date), MONTH(date))"
     
         elif agg == 'year':
-            query = f"SELECT strptime(year, '%Y') as date, {col} as publication_name, count FROM (SELECT YEAR(date) as year, {col}, count(*) as count FROM data GROUP BY {col}, YEAR(date))"
+            query = f"SELECT strptime(CAST(year AS VARCHAR), '%Y') as date, \"{col}\" as publication_name, count FROM (SELECT YEAR(date) as year, \"{col}\", count(*) as count FROM data GROUP BY \"{col}\", YEAR(date))"
         
         elif agg == 'day':
-            query = f"SELECT strptime(concat('01/', month, '/', year), '%d/%m/%Y') as date, {col} as publication_name, count FROM (SELECT YEAR(date) as year, MONTH(date) as month, {col}, count(*) as count FROM data GROUP BY {col}, YEAR(date), MONTH(date), DAY(date))"
+            query = f"SELECT strptime(concat(day, '/', month, '/', year), '%d/%m/%Y') as date, \"{col}\" as publication_name, count FROM (SELECT YEAR(date) as year, MONTH(date) as month, DAY(date) as day, \"{col}\", count(*) as count FROM data GROUP BY \"{col}\", YEAR(date), MONTH(date), DAY(date))"
+
+        else:
+            raise KiaraProcessingException(f"Invalid query type '{agg}', must be one of: {', '.join(TIME_GRANULARITIES)}")
         
         outputs.set_value("query", query)
 
 
+class VizData(KiaraModule):
+    """Count the documents of a timestamped corpus per day, month or year, and publication, for the dashboard visualizations.
+
+    The corpus is only processed once, into per-day counts, the month and year counts are computed from those. Results are cached, so switching between granularities does not go through the whole corpus again.
+    """
+
+    _module_type_name = "playground.tm_dash.viz_data"
+
+    def create_inputs_schema(self):
+        
+        return {
+            "table_input": {
+                "type": "table",
+                "doc": "The corpus, with a date and a publication column (as created by 'playground.tm_dash.file_name_metadata')."
+            },
+            "query_type": {
+                "type": "string",
+                "doc": f"The wished data periodicity to display on visualization, one of: {', '.join(TIME_GRANULARITIES)}.",
+                "default": "month"
+            },
+            "column": {
+                "type": "string",
+                "doc": "The column that contains publication names or ref/id.",
+                "default": "publication"
+            },
+            "date_column": {
+                "type": "string",
+                "doc": "The column that contains the document dates.",
+                "default": "date"
+            }
+        }
+
+    def create_outputs_schema(self):
+        return {
+            "viz_data": {
+                "type": "table",
+                "doc": "The number of documents per date and publication, with the columns 'date', 'publication_name' and 'count'. The date of a month or year is its first day."
+            }
+        }
+
+    @cached_process()
+    def process(self, inputs, outputs) -> None:
+
+        table_obj = inputs.get_value_obj("table_input")
+        agg = inputs.get_value_obj("query_type").data
+        col = inputs.get_value_obj("column").data
+        date_col = inputs.get_value_obj("date_column").data
+
+        if agg not in TIME_GRANULARITIES:
+            raise KiaraProcessingException(f"Invalid query type '{agg}', must be one of: {', '.join(TIME_GRANULARITIES)}")
+
+        # the per-day counts only depend on the corpus and the columns, so they are shared by all granularities (and kept
+        # in memory, so switching between them never re-scans the corpus)
+        day_counts = memoised_call(
+            "tm_dash_day_counts",
+            [table_obj.value_hash, date_col, col],
+            lambda: count_by_day(table_obj.data.arrow_table, date_col, col),
+        )
 
+        outputs.set_value("viz_data", rollup_counts(day_counts, agg))
@@ -1,8 +1,12 @@
+from typing import Any, Dict
+
 from kiara.api import KiaraModule, KiaraModuleConfig, ValueMap, ValueMapSchema, KiaraAPI
 from pydantic import Field
 import pyarrow as pa
 from networkx.readwrite import json_graph
 
+from kiara_plugin.playground.utils.lineage import DEFAULT_LINEAGE_PAGE_SIZE, DEFAULT_PREVIEW_ROWS, VALUE_NODE_PREFIX, LineageInfo, create_lineage_data, create_lineage_page
+
 
 
 class GetLineageData(KiaraModule):
@@ -16,8 +20,13 @@ class GetLineageData(KiaraModule):
     ) -> ValueMapSchema:
 
 
-        inputs = {
-            "table": {"type": "table", "doc": "The table for which we need lineage data."}
+        inputs: Dict[str, Dict[str, Any]] = {
+            "table": {"type": "table", "doc": "The table for which we need lineage data."},
+            "preview_rows": {
+                "type": "integer",
+                "doc": "The number of rows to render in the preview of a value. If '0', no previews are rendered, and only the value id ('preview_id') of a value is returned, so the preview can be retrieved later, on demand.",
+                "default": DEFAULT_PREVIEW_ROWS,
+            },
         }
 
         return inputs
@@ -40,34 +49,77 @@ class GetLineageData(KiaraModule):
 
         kiara = KiaraAPI.instance()
 
-        graph = table_obj.lineage.module_graph
-        nodes = graph.nodes.data()
-        augmented_nodes = dict()
+        # module type infos are retrieved once per type, values with a single lookup, and only the first rows of a value are rendered
+        lineage_info = LineageInfo(kiara, preview_rows=inputs.get_value_data("preview_rows"))
+        augmented_nodes = create_lineage_data(table_obj.lineage.module_graph, lineage_info)
+        
+        outputs.set_value("lineage_dict", augmented_nodes)
+
+
+class GetLineagePage(KiaraModule):
+    """Get a page of the lineage data of a table, for visualizations of long lineages that load the lineage step by step.
+
+    Nodes are ordered breadth-first, starting from the table, so the first pages contain the most recent steps of the lineage. Module type infos and value previews are only retrieved for the nodes of the requested page.
+    """
 
+    _module_type_name = "playground.get_lineage_page"
 
-        def get_info(node):
-            # all this is terribly inefficient
-            if node[1]["node_type"] == "operation":
-                result = kiara.retrieve_module_type_info(node[1]["module_type"]).dict()
-            elif node[1]["node_type"] == "value":
-                value_id = node[0][6:]
-                v = kiara.get_value(value_id)
+    def create_inputs_schema(
+        self,
+    ) -> ValueMapSchema:
 
-                render_result = kiara.render_value(value=v, target_format="string").rendered
+        inputs: Dict[str, Dict[str, Any]] = {
+            "table": {"type": "table", "doc": "The table for which we need lineage data."},
+            "max_depth": {
+                "type": "integer",
+                "doc": "The maximum number of steps (module and value nodes) between a node and the table. If not set, the whole lineage is used.",
+                "optional": True,
+            },
+            "offset": {
+                "type": "integer",
+                "doc": "The number of nodes to skip, in breadth-first order (the 'next_offset' of the previous page).",
+                "default": 0,
+            },
+            "page_size": {
+                "type": "integer",
+                "doc": "The (maximum) number of nodes in the page.",
+                "default": DEFAULT_LINEAGE_PAGE_SIZE,
+            },
+            "preview_rows": {
+                "type": "integer",
+                "doc": "The number of rows to render in the preview of a value. If '0', no previews are rendered, and only the value id ('preview_id') of a value is returned, so the preview can be retrieved later, on demand.",
+                "default": DEFAULT_PREVIEW_ROWS,
+            },
+        }
 
-                result = {
-                    "preview": render_result
-                }
-            return result
+        return inputs
 
-        for idx, node in enumerate(nodes):
-            node_dict = {
-                "id": node[0],
-                "desc": node[1],
-                "parentIds": [pred for pred in graph.predecessors(node[0])],
-                "info": get_info(node)
+    def create_outputs_schema(
+        self,
+    ) -> ValueMapSchema:
+
+        outputs = {
+            "lineage_page": {
+                "type": "dict",
+                "doc": "The nodes of the page (with their depth and parent ids), the total number of nodes, and the offset of the next page ('None' for the last page).",
             }
-            augmented_nodes[idx] = node_dict
-        
-        outputs.set_value("lineage_dict", augmented_nodes)
+        }
+        return outputs
+
+    def process(self, inputs: ValueMap, outputs: ValueMap) -> None:
+
+        table_obj = inputs.get_value_obj("table")
 
+        lineage_info = LineageInfo(KiaraAPI.instance(), preview_rows=inputs.get_value_data("preview_rows"))
+        lineage_page = create_lineage_page(
+            table_obj.lineage.module_graph,
+            f"{VALUE_NODE_PREFIX}{table_obj.value_id}",
+            lineage_info,
+            max_depth=inputs.get_value_data("max_depth"),
+            offset=inputs.get_value_data("offset"),
+            page_size=inputs.get_value_data("page_size"),
+            # values are immutable, so the node order of the lineage is memoised, and only created once for all pages
+            lineage_id=str(table_obj.value_id),
+        )
+
+        outputs.set_value("lineage_page", lineage_page)
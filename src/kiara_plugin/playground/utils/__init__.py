@@ -0,0 +1,3 @@
+# -*- coding: utf-8 -*-
+
+"""Shared helper functions for the modules in the ``kiara_plugin.playground`` package."""
@@ -0,0 +1,385 @@
+# -*- coding: utf-8 -*-
+
+"""A content-addressed, on-disk cache for the outputs of (expensive) playground modules.
+
+Results are keyed on the module type and configuration, the hashes of all input values, and a hash of the source code
+of this package (so results computed by an older version of the code are never re-used, even in editable installs).
+Since kiara values are immutable, the same key always maps to the same result, and a cached result can be returned as
+is. The cache is limited in size, the least recently used entries are removed once it grows bigger than that.
+
+Caching is disabled by default, it can be enabled and configured via environment variables:
+
+- ``KIARA_PLAYGROUND_CACHE_MAX_SIZE``: the maximum size of the cache, in MB; caching is only enabled if this is set
+  to a value bigger than '0'
+- ``KIARA_PLAYGROUND_CACHE_DIR``: the directory to store cached results in (default: a 'playground_results' folder
+  in the kiara cache directory)
+
+Cached results are pickled, and unpickling a file can run arbitrary code, so everyone who can write to the cache
+directory can run code in the kiara process. The directory is therefore created private (mode 0700), and a directory
+that is not owned by the current user, or is writable by others, is refused. Don't point the cache to a shared
+directory.
+
+The hit/miss counters are kept per process, ``get_result_cache().stats()`` returns them (for example in a notebook,
+or a Dash callback).
+
+Intermediate results that interactive use depends on (like the per-day counts of a corpus, which are shared by all
+time granularities of the dashboard) are memoised in memory with 'memoised_call', whether the result cache is enabled
+or not.
+"""
+
+import functools
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Tuple, Union
+
+from kiara.exceptions import KiaraProcessingException
+
+if TYPE_CHECKING:
+    from kiara.models.values.value import ValueMap
+    from kiara.modules import KiaraModule
+
+CACHE_DIR_ENV_NAME = "KIARA_PLAYGROUND_CACHE_DIR"
+CACHE_MAX_SIZE_ENV_NAME = "KIARA_PLAYGROUND_CACHE_MAX_SIZE"
+
+# increase this if the format of cached results changes, or old results must not be re-used for any other reason
+CACHE_FORMAT_VERSION = 1
+CACHE_FILE_EXTENSION = ".pickle"
+# the number of intermediate results that are kept in memory (per process) by 'memoised_call'
+MEMORY_CACHE_MAX_ENTRIES = 8
+
+
+class ResultCache(object):
+    """A directory of pickled module results, with a size limit and least-recently-used eviction.
+
+    The modification time of an entry is used as its 'last used' time, so the usage order survives between processes.
+    The directory is created if it doesn't exist, and it must be private to the current user (see the module docs).
+
+    Arguments:
+        base_path: the directory to store the results in
+        max_size: the maximum size of all stored results, in bytes
+    """
+
+    def __init__(self, base_path: str, max_size: int):
+
+        self.base_path: str = base_path
+        self.max_size: int = max_size
+        check_private_directory(base_path)
+
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self._lock = threading.Lock()
+
+    def create_key(self, *parts: Any) -> str:
+        """Create a cache key from a list of (string-able) parts."""
+
+        digest = hashlib.sha256()
+        for part in (CACHE_FORMAT_VERSION,) + parts:
+            digest.update(str(part).encode("utf-8"))
+            digest.update(b"\x00")
+        return digest.hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.base_path, key[:2], f"{key}{CACHE_FILE_EXTENSION}")
+
+    def get(self, key: str) -> Union[Any, None]:
+        """Return the result stored under this key, or 'None' if there is none."""
+
+        path = self._entry_path(key)
+        try:
+            with open(path, "rb") as f:
+                # only the current user can write to the (private) cache directory
+                result = pickle.load(f)  # noqa: S301
+            os.utime(path)
+        except FileNotFoundError:
+            result = None
+        except Exception:
+            # a broken (for example: partially written by an older version) entry is just a cache miss
+            self._remove(path)
+            result = None
+
+        with self._lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return result
+
+    def put(self, key: str, result: Any) -> bool:
+        """Store a result, and evict the least recently used entries if the cache grew too big.
+
+        Returns:
+            whether the result was stored (it isn't if it is bigger than the whole cache)
+        """
+
+        path = self._entry_path(key)
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        # write to a temporary file first, so other processes never see partially written entries; the result is
+        # pickled straight into the file, so it is never held in memory twice
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+                size = f.tell()
+            if size > self.max_size:
+                self._remove(temp_path)
+                return False
+            os.replace(temp_path, path)
+        except Exception:
+            self._remove(temp_path)
+            raise
+
+        self.evict()
+        return True
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+
+        entries = []
+        for root, _, file_names in os.walk(self.base_path):
+            for file_name in file_names:
+                if not file_name.endswith(CACHE_FILE_EXTENSION):
+                    continue
+                path = os.path.join(root, file_name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _remove(self, path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def evict(self) -> int:
+        """Remove the least recently used entries until the cache fits into its maximum size.
+
+        Returns:
+            the number of removed entries
+        """
+
+        entries = sorted(self._entries())
+        size = sum(entry[1] for entry in entries)
+        removed = 0
+        for _, entry_size, path in entries:
+            if size <= self.max_size:
+                break
+            self._remove(path)
+            size -= entry_size
+            removed += 1
+
+        with self._lock:
+            self.evictions += removed
+        return removed
+
+    def clear(self) -> None:
+        """Remove all entries, and reset the counters."""
+
+        for _, _, path in self._entries():
+            self._remove(path)
+        with self._lock:
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the hit/miss counters (for this process) and the current size of the cache."""
+
+        entries = self._entries()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(entries),
+            "size": sum(entry[1] for entry in entries),
+            "max_size": self.max_size,
+            "base_path": self.base_path,
+        }
+
+
+def check_private_directory(path: str) -> None:
+    """Create a directory that only the current user can access, or check that an existing one is.
+
+    Raises:
+        KiaraProcessingException: if the directory is owned by someone else, or others can write to it
+    """
+
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    stat = os.stat(path)
+    if hasattr(os, "getuid") and stat.st_uid != os.getuid():
+        raise KiaraProcessingException(
+            f"Can't use result cache directory '{path}': it is not owned by the current user."
+        )
+    if stat.st_mode & 0o022:
+        raise KiaraProcessingException(
+            f"Can't use result cache directory '{path}': it is writable by other users (mode {oct(stat.st_mode & 0o777)})."
+        )
+
+
+_RESULT_CACHES: Dict[Tuple[str, int], ResultCache] = {}
+
+
+def get_result_cache() -> Union[ResultCache, None]:
+    """Return the result cache, as configured via environment variables, or 'None' if caching is disabled."""
+
+    max_size_mb = float(os.environ.get(CACHE_MAX_SIZE_ENV_NAME, None) or 0)
+    if max_size_mb <= 0:
+        return None
+
+    base_path = os.environ.get(CACHE_DIR_ENV_NAME, None)
+    if not base_path:
+        from kiara.defaults import kiara_app_dirs
+
+        base_path = os.path.join(kiara_app_dirs.user_cache_dir, "playground_results")
+
+    config = (os.path.abspath(base_path), int(max_size_mb * 1024 * 1024))
+    if config not in _RESULT_CACHES:
+        _RESULT_CACHES[config] = ResultCache(*config)
+    return _RESULT_CACHES[config]
+
+
+def cached_call(name: str, key_parts: Iterable[Any], compute: Callable[[], Any]) -> Any:
+    """Return the cached result for 'name' and the key parts, or compute (and cache) it.
+
+    This can be used for intermediate results that are shared between module runs with different inputs (for example,
+    everything that only depends on the network data, but not on the other parameters of a module).
+    """
+
+    cache = get_result_cache()
+    if cache is None:
+        return compute()
+
+    key = cache.create_key(get_source_hash(), name, *key_parts)
+    result = cache.get(key)
+    if result is None:
+        result = compute()
+        cache.put(key, result)
+    return result
+
+
+_MEMORY_CACHE: "OrderedDict[Tuple[Any, ...], Any]" = OrderedDict()
+_MEMORY_CACHE_LOCK = threading.Lock()
+
+
+def memoised_call(
+    name: str, key_parts: Iterable[Any], compute: Callable[[], Any]
+) -> Any:
+    """Like 'cached_call', but also keep the result in memory, even if the result cache is disabled.
+
+    This is meant for intermediate results that a module re-uses for many runs in a row (for example when a user
+    moves a slider), the least recently used of those are evicted once there are more than
+    'MEMORY_CACHE_MAX_ENTRIES'.
+    """
+
+    key = (name, *key_parts)
+    with _MEMORY_CACHE_LOCK:
+        if key in _MEMORY_CACHE:
+            _MEMORY_CACHE.move_to_end(key)
+            return _MEMORY_CACHE[key]
+
+    result = cached_call(name, key_parts, compute)
+    with _MEMORY_CACHE_LOCK:
+        _MEMORY_CACHE[key] = result
+        _MEMORY_CACHE.move_to_end(key)
+        while len(_MEMORY_CACHE) > MEMORY_CACHE_MAX_ENTRIES:
+            _MEMORY_CACHE.popitem(last=False)
+    return result
+
+
+class _RecordedOutputs(object):
+    """Stands in for the outputs of a module, and keeps the values that are set on it."""
+
+    def __init__(self):
+        self.values: Dict[str, Any] = {}
+
+    def set_value(self, field_name: str, data: Any) -> None:
+        self.values[field_name] = data
+
+    def set_values(self, **data: Any) -> None:
+        self.values.update(data)
+
+
+def cached_process(
+    *ignore_inputs: str,
+    seed_input: Union[str, None] = None,
+    random_inputs: Iterable[str] = (),
+) -> Callable:
+    """Decorator for the 'process' method of a module, to re-use results from the result cache.
+
+    The cache key consists of the module type and configuration, and the hashes of all input values, except for the
+    ones listed in 'ignore_inputs' (inputs that don't influence the result, like the number of processes to use).
+
+    Modules with random results must not be cached if no seed is set, otherwise the first random result would be
+    returned forever. If 'seed_input' is set, and that input has no value, the cache is skipped: always, or (if
+    'random_inputs' are given) only if one of those inputs has a value (for example a sample size, without which the
+    result is exact).
+
+    All output values must be picklable.
+    """
+
+    random_inputs = tuple(random_inputs)
+
+    def decorator(process: Callable) -> Callable:
+        @functools.wraps(process)
+        def wrapper(
+            self: "KiaraModule", inputs: "ValueMap", outputs: "ValueMap"
+        ) -> None:
+            if seed_input is not None and inputs.get_value_data(seed_input) is None:
+                if not random_inputs or any(
+                    inputs.get_value_data(field_name) is not None
+                    for field_name in random_inputs
+                ):
+                    process(self, inputs, outputs)
+                    return
+
+            def compute() -> Dict[str, Any]:
+                recorded = _RecordedOutputs()
+                process(self, inputs, recorded)
+                return recorded.values
+
+            result = cached_call(
+                self.module_type_name,
+                [self.module_instance_cid, *_input_hashes(inputs, ignore_inputs)],
+                compute,
+            )
+            outputs.set_values(**result)
+
+        return wrapper
+
+    return decorator
+
+
+def _input_hashes(inputs: "ValueMap", ignore_inputs: Iterable[str]) -> List[str]:
+
+    return [
+        f"{field_name}={inputs.get_value_obj(field_name).value_hash}"
+        for field_name in sorted(inputs.field_names)
+        if field_name not in ignore_inputs
+    ]
+
+
+@functools.lru_cache(maxsize=1)
+def get_source_hash() -> str:
+    """Return a hash of all Python source files of this package.
+
+    The package version doesn't change in editable/development installs, this does whenever the code changes.
+    """
+
+    import kiara_plugin.playground
+
+    package_dir = os.path.dirname(os.path.abspath(kiara_plugin.playground.__file__))
+    digest = hashlib.sha256()
+    for root, dir_names, file_names in os.walk(package_dir):
+        dir_names.sort()
+        for file_name in sorted(file_names):
+            if not file_name.endswith(".py"):
+                continue
+            path = os.path.join(root, file_name)
+            digest.update(os.path.relpath(path, package_dir).encode("utf-8"))
+            with open(path, "rb") as f:
+                digest.update(f.read())
+    return digest.hexdigest()
@@ -0,0 +1,452 @@
+# -*- coding: utf-8 -*-
+
+"""Shortest-path based centrality measures, computed on CSR adjacency arrays.
+
+The heavy lifting for betweenness (Brandes' algorithm) and closeness centrality is done per source node, which means it
+can be split into chunks of sources that are processed independently in a pool of worker processes. The partial results
+are simply added up (or concatenated) afterwards.
+"""
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from heapq import heappop, heappush
+from itertools import count
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Tuple,
+    Union,
+)
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from scipy.sparse import csr_matrix
+
+# graphs with fewer nodes than this are always processed in the current process
+MIN_NODES_FOR_PROCESS_POOL = 1000
+# number of chunks per worker process, more chunks give a better balance if some sources are more expensive
+CHUNKS_PER_PROCESS = 4
+
+# the maximum number of entries of the distance matrix a worker computes at once (8 bytes each)
+MAX_DISTANCE_BATCH_ENTRIES = 2**22
+
+# the data a worker process operates on: the 'graph' (indptr, indices and distances lists, set via
+# '_set_worker_graph'), or the adjacency 'matrix' (and whether it is weighted, set via '_set_worker_matrix')
+_WORKER_STATE: Dict[str, Any] = {}
+
+
+def _set_worker_graph(
+    indptr: np.ndarray, indices: np.ndarray, distances: Union[None, np.ndarray]
+) -> None:
+
+    _WORKER_STATE["graph"] = (
+        indptr.tolist(),
+        indices.tolist(),
+        None if distances is None else distances.tolist(),
+    )
+
+
+def _set_worker_matrix(adjacency: "csr_matrix", weighted: bool) -> None:
+
+    _WORKER_STATE["matrix"] = (adjacency, weighted)
+
+
+def _shortest_paths_unweighted(
+    indptr: List[int], indices: List[int], source: int
+) -> Tuple[List[int], Dict[int, List[int]], Dict[int, float]]:
+
+    sigma: Dict[int, float] = {source: 1.0}
+    dist: Dict[int, int] = {source: 0}
+    preds: Dict[int, List[int]] = {source: []}
+    order: List[int] = []
+
+    queue = deque([source])
+    while queue:
+        v = queue.popleft()
+        order.append(v)
+        next_dist = dist[v] + 1
+        sigma_v = sigma[v]
+        for w in indices[indptr[v] : indptr[v + 1]]:
+            if w not in dist:
+                dist[w] = next_dist
+                sigma[w] = 0.0
+                preds[w] = []
+                queue.append(w)
+            if dist[w] == next_dist:
+                sigma[w] += sigma_v
+                preds[w].append(v)
+
+    return order, preds, sigma
+
+
+def _shortest_paths_weighted(
+    indptr: List[int], indices: List[int], distances: List[float], source: int
+) -> Tuple[List[int], Dict[int, List[int]], Dict[int, float]]:
+
+    sigma: Dict[int, float] = {source: 1.0}
+    dist: Dict[int, float] = {}
+    seen: Dict[int, float] = {source: 0.0}
+    preds: Dict[int, List[int]] = {source: []}
+    order: List[int] = []
+
+    counter = count()
+    heap = [(0.0, next(counter), source, source)]
+    while heap:
+        d, _, pred, v = heappop(heap)
+        if v in dist:
+            continue
+        if pred != v:
+            sigma[v] += sigma[pred]
+        order.append(v)
+        dist[v] = d
+        for idx in range(indptr[v], indptr[v + 1]):
+            w = indices[idx]
+            vw_dist = d + distances[idx]
+            if w not in dist and (w not in seen or vw_dist < seen[w]):
+                seen[w] = vw_dist
+                heappush(heap, (vw_dist, next(counter), v, w))
+                sigma[w] = 0.0
+                preds[w] = [v]
+            elif vw_dist == seen[w]:
+                sigma[w] += sigma[v]
+                preds[w].append(v)
+
+    return order, preds, sigma
+
+
+def _accumulate_dependencies(sources: Iterable[int]) -> Tuple[np.ndarray, np.ndarray]:
+    """Sum up the dependency scores of all nodes for the provided source nodes.
+
+    Returns:
+        a tuple with the summed dependencies, and the summed squared dependencies of every node
+    """
+
+    indptr, indices, distances = _WORKER_STATE["graph"]
+    num_nodes = len(indptr) - 1
+
+    total = np.zeros(num_nodes, dtype=np.float64)
+    squares = np.zeros(num_nodes, dtype=np.float64)
+
+    for source in sources:
+        if distances is None:
+            order, preds, sigma = _shortest_paths_unweighted(indptr, indices, source)
+        else:
+            order, preds, sigma = _shortest_paths_weighted(
+                indptr, indices, distances, source
+            )
+
+        delta: Dict[int, float] = dict.fromkeys(order, 0.0)
+        for w in reversed(order):
+            coeff = (1.0 + delta[w]) / sigma[w]
+            for v in preds[w]:
+                delta[v] += sigma[v] * coeff
+        delta[source] = 0.0
+
+        nodes = np.fromiter(delta.keys(), dtype=np.int64, count=len(delta))
+        values = np.fromiter(delta.values(), dtype=np.float64, count=len(delta))
+        total[nodes] += values
+        squares[nodes] += values * values
+
+    return total, squares
+
+
+def resolve_processes(processes: Union[int, None]) -> int:
+    """Return the number of worker processes to use, defaulting to the number of available cores."""
+
+    if processes is None:
+        processes = os.cpu_count() or 1
+    return max(1, processes)
+
+
+def map_chunks(
+    function: Callable[[Any], Any],
+    chunks: Iterable[Any],
+    initializer: Callable[..., None],
+    initargs: Tuple[Any, ...],
+    processes: int,
+) -> Iterator[Any]:
+    """Apply a function to chunks of work, in a pool of worker processes that are set up via 'initializer'.
+
+    If only one process is requested, or there is only one chunk, everything runs in the current process.
+    """
+
+    chunks = list(chunks)
+    if processes == 1 or len(chunks) <= 1:
+        initializer(*initargs)
+        yield from map(function, chunks)
+        return
+
+    with ProcessPoolExecutor(
+        max_workers=processes, initializer=initializer, initargs=initargs
+    ) as executor:
+        yield from executor.map(function, chunks)
+
+
+def split_nodes(nodes: np.ndarray, processes: int) -> List[List[int]]:
+    """Split a list of nodes into (non-empty) chunks of work for the provided number of processes."""
+
+    chunks = np.array_split(nodes, processes * CHUNKS_PER_PROCESS)
+    return [chunk.tolist() for chunk in chunks if len(chunk)]
+
+
+def calculate_dependencies(
+    adjacency: "csr_matrix",
+    weighted: bool = False,
+    sources: Union[None, np.ndarray] = None,
+    processes: Union[int, None] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Run the single-source part of Brandes' algorithm for a set of sources, and sum up the results.
+
+    Arguments:
+        adjacency: the adjacency matrix of the graph, if 'weighted', the values are used as edge distances
+        weighted: whether to use the adjacency values as distances (Dijkstra), or treat every edge as length 1 (BFS)
+        sources: the source nodes to use, defaults to all nodes
+        processes: the number of worker processes, defaults to the number of cores
+
+    Returns:
+        a tuple with the summed (unnormalized) dependencies, and the summed squared dependencies of every node
+    """
+
+    num_nodes = adjacency.shape[0]
+    if sources is None:
+        sources = np.arange(num_nodes)
+
+    processes = resolve_processes(processes)
+    if num_nodes < MIN_NODES_FOR_PROCESS_POOL:
+        processes = 1
+
+    total = np.zeros(num_nodes, dtype=np.float64)
+    squares = np.zeros(num_nodes, dtype=np.float64)
+
+    distances = adjacency.data if weighted else None
+    for chunk_total, chunk_squares in map_chunks(
+        _accumulate_dependencies,
+        split_nodes(sources, processes),
+        initializer=_set_worker_graph,
+        initargs=(adjacency.indptr, adjacency.indices, distances),
+        processes=processes,
+    ):
+        total += chunk_total
+        squares += chunk_squares
+
+    return total, squares
+
+
+def calculate_betweenness(
+    adjacency: "csr_matrix",
+    weighted: bool = False,
+    sample_size: Union[int, None] = None,
+    seed: Union[int, None] = None,
+    processes: Union[int, None] = None,
+) -> Tuple[np.ndarray, Union[None, np.ndarray]]:
+    """Calculate the normalized betweenness centrality of every node of a directed graph.
+
+    If a sample size is provided, only that many randomly selected source nodes ('pivots') are used, and the result
+    is extrapolated to all nodes. The standard error of that estimate is returned alongside the scores in this case.
+    Scores are normalized the same way as 'networkx.betweenness_centrality' does for directed graphs.
+
+    Returns:
+        a tuple with the betweenness scores, and their standard errors (or 'None' if no sampling was used)
+    """
+
+    num_nodes = adjacency.shape[0]
+    if num_nodes > 2:
+        scale = 1.0 / ((num_nodes - 1) * (num_nodes - 2))
+    else:
+        scale = 1.0
+
+    if sample_size is None or sample_size >= num_nodes:
+        total, _ = calculate_dependencies(
+            adjacency, weighted=weighted, processes=processes
+        )
+        return total * scale, None
+
+    rng = np.random.default_rng(seed)
+    sources = np.sort(rng.choice(num_nodes, size=sample_size, replace=False))
+    total, squares = calculate_dependencies(
+        adjacency, weighted=weighted, sources=sources, processes=processes
+    )
+
+    # the estimate is num_nodes times the mean dependency over the sampled sources
+    mean = total / sample_size
+    variance = np.maximum(squares / sample_size - mean * mean, 0.0)
+    if sample_size > 1:
+        variance = variance * sample_size / (sample_size - 1)
+    finite_population = (num_nodes - sample_size) / max(num_nodes - 1, 1)
+    std_error = num_nodes * np.sqrt(variance / sample_size * finite_population)
+
+    return mean * num_nodes * scale, std_error * scale
+
+
+def calculate_eigenvector(
+    adjacency: "csr_matrix",
+    tolerance: float = 1.0e-6,
+    max_iterations: int = 1000,
+    start: Union[None, np.ndarray] = None,
+) -> Tuple[np.ndarray, int, bool]:
+    """Calculate the eigenvector centrality of every node via power iteration on a sparse adjacency matrix.
+
+    This follows 'networkx.eigenvector_centrality': the iteration runs on 'A + I' (to avoid oscillation on bipartite
+    graphs), and stops once the summed absolute change of the L2-normalized vector drops below 'num_nodes * tolerance'.
+
+    Arguments:
+        adjacency: the (symmetric) adjacency matrix, values are used as edge weights
+        tolerance: the error tolerance used to check convergence
+        max_iterations: the maximum number of iterations
+        start: a starting vector, for example the result of an earlier run on the same network
+
+    Returns:
+        a tuple with the scores, the number of iterations that were run, and whether the iteration converged
+    """
+
+    num_nodes = adjacency.shape[0]
+    if num_nodes == 0:
+        return np.zeros(0, dtype=np.float64), 0, True
+
+    if start is None or len(start) != num_nodes or not np.any(start):
+        x = np.ones(num_nodes, dtype=np.float64)
+    else:
+        x = np.abs(np.asarray(start, dtype=np.float64))
+    x = x / x.sum()
+
+    threshold = num_nodes * tolerance
+    for iteration in range(1, max_iterations + 1):
+        last = x
+        x = adjacency @ last + last
+        norm = np.linalg.norm(x)
+        if norm > 0:
+            x = x / norm
+        if np.abs(x - last).sum() < threshold:
+            return x, iteration, True
+
+    return x, max_iterations, False
+
+
+def _sum_distances(task: Tuple[List[int], bool]) -> Tuple[np.ndarray, ...]:
+    """Calculate shortest path distances from a chunk of sources, and sum them up.
+
+    If the second item of the task is 'True', the sums are calculated per node the paths lead to (over all sources
+    of this chunk), otherwise per source.
+
+    Returns:
+        a tuple with the number of reachable nodes, the summed distances, and the summed inverse distances
+    """
+
+    from scipy.sparse.csgraph import shortest_path
+
+    adjacency, weighted = _WORKER_STATE["matrix"]
+    sources, per_target = task
+    num_nodes = adjacency.shape[0]
+
+    size = num_nodes if per_target else len(sources)
+    reached = np.zeros(size, dtype=np.int64)
+    total = np.zeros(size, dtype=np.float64)
+    harmonic = np.zeros(size, dtype=np.float64)
+
+    batch_size = max(1, MAX_DISTANCE_BATCH_ENTRIES // max(num_nodes, 1))
+    for start in range(0, len(sources), batch_size):
+        batch = np.asarray(sources[start : start + batch_size])
+        dist = shortest_path(
+            adjacency, method="D", directed=True, unweighted=not weighted, indices=batch
+        )
+        # paths from a node to itself don't count
+        dist[np.arange(len(batch)), batch] = np.inf
+        finite = np.isfinite(dist)
+        inverse = np.zeros_like(dist)
+        np.divide(1.0, dist, out=inverse, where=finite & (dist > 0))
+        dist[~finite] = 0.0
+
+        axis = 0 if per_target else 1
+        batch_slice = slice(None) if per_target else slice(start, start + len(batch))
+        reached[batch_slice] += finite.sum(axis=axis)
+        total[batch_slice] += dist.sum(axis=axis)
+        harmonic[batch_slice] += inverse.sum(axis=axis)
+
+    return reached, total, harmonic
+
+
+def calculate_closeness(
+    adjacency: "csr_matrix",
+    weighted: bool = False,
+    harmonic: bool = False,
+    sample_size: Union[int, None] = None,
+    seed: Union[int, None] = None,
+    processes: Union[int, None] = None,
+) -> np.ndarray:
+    """Calculate the closeness (or harmonic) centrality of every node of a directed graph.
+
+    Like 'networkx.closeness_centrality' (with 'wf_improved'), and 'networkx.harmonic_centrality', the distances of
+    paths leading *to* a node are used.
+
+    If a sample size is provided, only the distances from that many randomly selected source nodes are calculated,
+    and extrapolated to all nodes.
+
+    Arguments:
+        adjacency: the adjacency matrix of the graph, if 'weighted', the values are used as edge distances
+        weighted: whether to use the adjacency values as distances (Dijkstra), or treat every edge as length 1 (BFS)
+        harmonic: whether to calculate harmonic centrality (sum of inverse distances) instead of closeness
+        sample_size: the number of sampled source nodes, or 'None' to use all nodes
+        seed: the seed for the random source selection
+        processes: the number of worker processes, defaults to the number of cores
+    """
+
+    num_nodes = adjacency.shape[0]
+    if num_nodes < 2:
+        return np.zeros(num_nodes, dtype=np.float64)
+
+    processes = resolve_processes(processes)
+    if num_nodes < MIN_NODES_FOR_PROCESS_POOL:
+        processes = 1
+
+    if sample_size is None or sample_size >= num_nodes:
+        # distances *to* every node are the distances *from* every node in the reversed graph
+        matrix = adjacency.transpose().tocsr()
+        results = map_chunks(
+            _sum_distances,
+            [(chunk, False) for chunk in split_nodes(np.arange(num_nodes), processes)],
+            initializer=_set_worker_matrix,
+            initargs=(matrix, weighted),
+            processes=processes,
+        )
+        parts = list(zip(*results))
+        reached = np.concatenate(parts[0])
+        total = np.concatenate(parts[1])
+        inverse_total = np.concatenate(parts[2])
+        num_sources = np.full(num_nodes, num_nodes - 1, dtype=np.float64)
+    else:
+        rng = np.random.default_rng(seed)
+        sources = np.sort(rng.choice(num_nodes, size=sample_size, replace=False))
+
+        reached = np.zeros(num_nodes, dtype=np.int64)
+        total = np.zeros(num_nodes, dtype=np.float64)
+        inverse_total = np.zeros(num_nodes, dtype=np.float64)
+        for chunk_reached, chunk_total, chunk_inverse in map_chunks(
+            _sum_distances,
+            [(chunk, True) for chunk in split_nodes(sources, processes)],
+            initializer=_set_worker_matrix,
+            initargs=(adjacency, weighted),
+            processes=processes,
+        ):
+            reached += chunk_reached
+            total += chunk_total
+            inverse_total += chunk_inverse
+
+        # a sampled node is not a source for itself
+        num_sources = np.full(num_nodes, sample_size, dtype=np.float64)
+        num_sources[sources] -= 1
+        num_sources = np.maximum(num_sources, 1)
+
+    if harmonic:
+        return inverse_total * (num_nodes - 1) / num_sources
+
+    closeness = np.zeros(num_nodes, dtype=np.float64)
+    np.divide(reached, total, out=closeness, where=total > 0)
+    # Wasserman and Faust scaling, by the share of nodes that can reach this node
+    return closeness * reached / num_sources
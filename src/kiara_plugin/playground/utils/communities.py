@@ -0,0 +1,467 @@
+# -*- coding: utf-8 -*-
+
+"""Community detection helpers, computed on integer edge arrays.
+
+The Clauset-Newman-Moore (CNM) greedy modularity maximisation in here records the full sequence of merges (the
+dendrogram) in a single run. Partitions for any number of communities, and the modularity for each of them, can then be
+read from the dendrogram without running the algorithm again.
+
+The Louvain method scales to much bigger networks, and takes edge weights into account. Independent runs (with
+different seeds or resolutions) can be spread across a pool of worker processes.
+"""
+
+from collections import deque
+from heapq import heappop, heappush
+from typing import TYPE_CHECKING, Dict, Iterable, List, Tuple, Union
+
+import numpy as np
+
+from kiara.exceptions import KiaraProcessingException
+from kiara_plugin.playground.utils.centrality import map_chunks
+from kiara_plugin.playground.utils.networks import NetworkArrays
+
+if TYPE_CHECKING:
+    from scipy.sparse import csr_matrix
+
+# the minimum (relative) modularity gain for a node to move to another community, protects against rounding noise
+MIN_GAIN = 1e-10
+
+# the adjacency matrix a worker process operates on, set via '_set_worker_adjacency'
+_WORKER_ADJACENCY: Union[None, "csr_matrix"] = None
+
+
+class MergeDendrogram(object):
+    """The sequence of community merges of a greedy modularity maximisation.
+
+    Initially, every node is its own community. Merge 'i' merges the community with the representative node
+    'merged[i]' into the one with the representative 'merged_into[i]', which changes the modularity by
+    'delta_modularity[i]'.
+
+    Arguments:
+        num_nodes: the number of nodes in the network
+        num_edges: the number of edges of the (simple) network
+        merged: the representative node index of the community that is merged (and goes away), per merge
+        merged_into: the representative node index of the community that is merged into, per merge
+        delta_modularity: the change in modularity, per merge
+        initial_modularity: the modularity of the partition where every node is its own community
+    """
+
+    def __init__(
+        self,
+        num_nodes: int,
+        num_edges: int,
+        merged: np.ndarray,
+        merged_into: np.ndarray,
+        delta_modularity: np.ndarray,
+        initial_modularity: float,
+    ):
+
+        self.num_nodes: int = num_nodes
+        self.num_edges: int = num_edges
+        self.merged: np.ndarray = merged
+        self.merged_into: np.ndarray = merged_into
+        self.delta_modularity: np.ndarray = delta_modularity
+        self.initial_modularity: float = initial_modularity
+
+    @property
+    def num_merges(self) -> int:
+        return len(self.merged)
+
+    def modularity_curve(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the number of communities, and the modularity, after each step (including the initial one)."""
+
+        num_communities = self.num_nodes - np.arange(self.num_merges + 1)
+        modularity = self.initial_modularity + np.concatenate(
+            [[0.0], np.cumsum(self.delta_modularity)]
+        )
+        return num_communities, modularity
+
+    def best_num_merges(self) -> int:
+        """Return the number of merges after which modularity is maximal (the greedy way: merging stops as soon as a
+        merge would decrease modularity)."""
+
+        decreasing = np.flatnonzero(self.delta_modularity < 0)
+        return int(decreasing[0]) if len(decreasing) else self.num_merges
+
+    def partition(self, num_communities: Union[int, None] = None) -> np.ndarray:
+        """Return the community (group) of every node, either for the partition with the (greedily) maximal modularity,
+        or for the one with the given number of communities.
+
+        Communities are numbered by size, largest first, like 'networkx.greedy_modularity_communities' does. If the
+        network falls apart into more pieces than 'num_communities', the biggest communities are merged until the
+        number matches.
+        """
+
+        n = self.num_nodes
+        if num_communities is not None and not 1 <= num_communities <= n:
+            raise ValueError(
+                f"Number of communities must be between 1 and {n}, not: {num_communities}."
+            )
+
+        if self.num_edges == 0:
+            return np.arange(n, dtype=np.int64)
+        if num_communities == 1:
+            return np.zeros(n, dtype=np.int64)
+
+        if num_communities is None:
+            num_merges = self.best_num_merges()
+        else:
+            num_merges = min(n - num_communities, self.num_merges)
+
+        # replay the merges: every node points to the representative it was merged into
+        parent = np.arange(n, dtype=np.int64)
+        parent[self.merged[:num_merges]] = self.merged_into[:num_merges]
+        while True:
+            grand_parent = parent[parent]
+            if np.array_equal(grand_parent, parent):
+                break
+            parent = grand_parent
+
+        representatives, inverse, sizes = np.unique(
+            parent, return_inverse=True, return_counts=True
+        )
+        # largest communities first, ties in node order of their representative
+        order = np.lexsort((representatives, -sizes))
+        groups = np.empty(len(representatives), dtype=np.int64)
+        groups[order] = np.arange(len(representatives))
+
+        if num_communities is not None and len(representatives) > num_communities:
+            # not connected enough, merge the biggest ones into the first community
+            surplus = len(representatives) - num_communities
+            groups = np.maximum(groups - surplus, 0)
+
+        return groups[inverse.reshape(-1)]
+
+
+def calculate_cnm_dendrogram(
+    arrays: NetworkArrays, resolution: float = 1.0
+) -> MergeDendrogram:
+    """Run Clauset-Newman-Moore greedy modularity maximisation on the undirected, simple (unweighted) network, and record
+    every merge until only disconnected communities are left.
+
+    This follows 'networkx.community.greedy_modularity_communities', including the way ties are broken (lowest node
+    index first), so the partitions are the same. A lazy max-heap with every (community, neighbour) pair is used,
+    instead of one heap per community.
+    """
+
+    n = arrays.num_nodes
+    lows = np.minimum(arrays.sources, arrays.targets)
+    highs = np.maximum(arrays.sources, arrays.targets)
+    pairs = (
+        np.unique(np.stack([lows, highs], axis=1), axis=0)
+        if len(lows)
+        else np.empty((0, 2), dtype=np.int64)
+    )
+
+    m = len(pairs)
+    if m == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return MergeDendrogram(n, 0, empty, empty, np.empty(0), 0.0)
+
+    q0 = 1 / m
+    degrees = np.bincount(pairs[:, 0], minlength=n) + np.bincount(
+        pairs[:, 1], minlength=n
+    )
+    a: List[float] = (degrees * q0 * 0.5).tolist()
+
+    self_loops = pairs[:, 0] == pairs[:, 1]
+    initial_modularity = float(
+        self_loops.sum() * q0 - resolution * np.sum(np.square(a))
+    )
+
+    dq: List[dict] = [{} for _ in range(n)]
+    heap: List[Tuple[float, int, int]] = []
+    for u, v in pairs[~self_loops].tolist():
+        dq_uv = q0 - resolution * (a[u] * a[v] + a[u] * a[v])
+        dq[u][v] = dq_uv
+        dq[v][u] = dq_uv
+        heap.append((-dq_uv, u, v))
+        heap.append((-dq_uv, v, u))
+    heap.sort()
+
+    merged = []
+    merged_into = []
+    delta_modularity = []
+    while heap:
+        neg_dq, u, v = heappop(heap)
+        # skip outdated entries (one of the communities is gone, or their dq changed since)
+        if dq[u].get(v, None) != -neg_dq:
+            continue
+
+        merged.append(u)
+        merged_into.append(v)
+        delta_modularity.append(-neg_dq)
+
+        # merge community u into v, and update the dq values of all neighbours
+        u_neighbours = dq[u]
+        v_neighbours = dq[v]
+        del u_neighbours[v]
+        del v_neighbours[u]
+        v_only = list(v_neighbours.keys() - u_neighbours.keys())
+        for w, dq_uw in u_neighbours.items():
+            if w in v_neighbours:
+                dq_vw = v_neighbours[w] + dq_uw
+            else:
+                dq_vw = dq_uw - resolution * (a[v] * a[w] + a[w] * a[v])
+            v_neighbours[w] = dq_vw
+            dq[w][v] = dq_vw
+            del dq[w][u]
+            heappush(heap, (-dq_vw, v, w))
+            heappush(heap, (-dq_vw, w, v))
+        for w in v_only:
+            dq_vw = v_neighbours[w] - resolution * (a[u] * a[w] + a[w] * a[u])
+            v_neighbours[w] = dq_vw
+            dq[w][v] = dq_vw
+            heappush(heap, (-dq_vw, v, w))
+            heappush(heap, (-dq_vw, w, v))
+        dq[u] = {}
+        a[v] += a[u]
+        a[u] = 0
+
+    return MergeDendrogram(
+        num_nodes=n,
+        num_edges=m,
+        merged=np.array(merged, dtype=np.int64),
+        merged_into=np.array(merged_into, dtype=np.int64),
+        delta_modularity=np.array(delta_modularity, dtype=np.float64),
+        initial_modularity=initial_modularity,
+    )
+
+
+def modularity_adjacency(arrays: NetworkArrays, weighted: bool = True) -> "csr_matrix":
+    """Create the symmetric adjacency matrix that modularity is calculated on.
+
+    Parallel edges are summed up, a self-loop counts twice for the degree of its node (like in networkx).
+    """
+
+    from scipy.sparse import coo_matrix
+
+    n = arrays.num_nodes
+    values = arrays.edge_weights() if weighted else np.ones(arrays.num_edges)
+    if np.any(values < 0):
+        raise KiaraProcessingException(
+            "Can't detect communities: edge weights must not be negative."
+        )
+
+    matrix = coo_matrix((values, (arrays.sources, arrays.targets)), shape=(n, n))
+    adjacency = (matrix + matrix.T).tocsr()
+    adjacency.sum_duplicates()
+    adjacency.sort_indices()
+    return adjacency
+
+
+def calculate_modularity(
+    adjacency: "csr_matrix", groups: np.ndarray, resolution: float = 1.0
+) -> float:
+    """Calculate the modularity of a partition (the same as 'networkx.community.modularity' does)."""
+
+    degrees = np.asarray(adjacency.sum(axis=1)).ravel()
+    total = degrees.sum()
+    if total == 0:
+        return 0.0
+
+    coo = adjacency.tocoo()
+    internal = coo.data[groups[coo.row] == groups[coo.col]].sum()
+    group_degrees = np.bincount(groups, weights=degrees)
+    return float(
+        internal / total - resolution * np.sum(np.square(group_degrees / total))
+    )
+
+
+def _local_moving(
+    adjacency: "csr_matrix", resolution: float, rng: np.random.Generator
+) -> Tuple[np.ndarray, bool]:
+    """Move single nodes to the neighbouring community with the highest modularity gain, until no move improves it.
+
+    This is the queue based 'fast local moving' of the Leiden algorithm (Traag et al., 2019): instead of passing over
+    all nodes again and again, only the neighbours of moved nodes are visited again.
+
+    Returns:
+        the community of every node (not numbered consecutively), and whether any node was moved
+    """
+
+    n = adjacency.shape[0]
+    indptr = adjacency.indptr.tolist()
+    indices = adjacency.indices.tolist()
+    weights = adjacency.data.tolist()
+    degree_array = np.asarray(adjacency.sum(axis=1)).ravel()
+    scale = resolution / degree_array.sum()
+    degrees: List[float] = degree_array.tolist()
+
+    communities = list(range(n))
+    totals = list(degrees)
+    queue = deque(rng.permutation(n).tolist())
+    queued = [True] * n
+
+    moved = False
+    while queue:
+        node = queue.popleft()
+        queued[node] = False
+        current = communities[node]
+        degree = degrees[node]
+
+        neighbour_weights: Dict[int, float] = {}
+        for entry in range(indptr[node], indptr[node + 1]):
+            neighbour = indices[entry]
+            if neighbour != node:
+                community = communities[neighbour]
+                neighbour_weights[community] = (
+                    neighbour_weights.get(community, 0.0) + weights[entry]
+                )
+
+        totals[current] -= degree
+        best = current
+        best_gain = (
+            neighbour_weights.get(current, 0.0) - totals[current] * degree * scale
+        )
+        min_gain = best_gain + MIN_GAIN * max(1.0, abs(best_gain))
+        for community, weight in neighbour_weights.items():
+            gain = weight - totals[community] * degree * scale
+            if gain > best_gain and gain > min_gain:
+                best = community
+                best_gain = gain
+        totals[best] += degree
+
+        if best != current:
+            communities[node] = best
+            moved = True
+            # neighbours outside of the new community might want to follow
+            for entry in range(indptr[node], indptr[node + 1]):
+                neighbour = indices[entry]
+                if not queued[neighbour] and communities[neighbour] != best:
+                    queued[neighbour] = True
+                    queue.append(neighbour)
+
+    return np.array(communities, dtype=np.int64), moved
+
+
+def _split_disconnected(adjacency: "csr_matrix", communities: np.ndarray) -> np.ndarray:
+    """Split every community into its connected parts, and number all communities consecutively."""
+
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import connected_components
+
+    coo = adjacency.tocoo()
+    internal = communities[coo.row] == communities[coo.col]
+    internal_graph = csr_matrix(
+        (coo.data[internal], (coo.row[internal], coo.col[internal])),
+        shape=adjacency.shape,
+    )
+    _, components = connected_components(internal_graph, directed=False)
+    return components.astype(np.int64)
+
+
+def calculate_louvain(
+    adjacency: "csr_matrix",
+    resolution: float = 1.0,
+    seed: Union[int, None] = None,
+    connected: bool = True,
+) -> np.ndarray:
+    """Detect communities with the Louvain method (Blondel et al., 2008).
+
+    Alternates between moving single nodes to neighbouring communities (in random order) and aggregating every community
+    into a single node, until no node moves anymore.
+
+    Arguments:
+        adjacency: the symmetric adjacency matrix, as returned by 'modularity_adjacency'
+        resolution: the resolution parameter, higher values lead to more (and smaller) communities
+        seed: the seed for the order nodes are visited in
+        connected: whether to split communities that are not connected before aggregating them, which guarantees that
+            all communities are connected (like the Leiden algorithm does)
+
+    Returns:
+        the community of every node, numbered by size (largest first)
+    """
+
+    from scipy.sparse import coo_matrix
+
+    rng = np.random.default_rng(seed)
+    n = adjacency.shape[0]
+    groups = np.arange(n, dtype=np.int64)
+    if adjacency.nnz == 0:
+        return groups
+
+    level = adjacency
+    while True:
+        communities, moved = _local_moving(level, resolution, rng)
+        if connected:
+            communities = _split_disconnected(level, communities)
+        else:
+            communities = np.unique(communities, return_inverse=True)[1].reshape(-1)
+
+        num_communities = int(communities.max()) + 1
+        groups = communities[groups]
+        if not moved or num_communities == level.shape[0]:
+            break
+
+        # aggregate: every community becomes a node, internal edges become a self-loop
+        coo = level.tocoo()
+        level = coo_matrix(
+            (coo.data, (communities[coo.row], communities[coo.col])),
+            shape=(num_communities, num_communities),
+        ).tocsr()
+        level.sum_duplicates()
+        level.sort_indices()
+
+    return number_by_size(groups)
+
+
+def number_by_size(groups: np.ndarray) -> np.ndarray:
+    """Re-number communities by size, largest first (ties in order of their first node)."""
+
+    _, first, inverse, sizes = np.unique(
+        groups, return_index=True, return_inverse=True, return_counts=True
+    )
+    order = np.lexsort((first, -sizes))
+    numbers = np.empty(len(order), dtype=np.int64)
+    numbers[order] = np.arange(len(order))
+    return numbers[inverse.reshape(-1)]
+
+
+def _set_worker_adjacency(adjacency: "csr_matrix") -> None:
+
+    global _WORKER_ADJACENCY  # noqa: PLW0603
+    _WORKER_ADJACENCY = adjacency
+
+
+def _run_louvain(task: Tuple[float, int, bool]) -> Tuple[np.ndarray, float, float]:
+
+    resolution, seed, connected = task
+    groups = calculate_louvain(_WORKER_ADJACENCY, resolution, seed, connected)
+    return (
+        groups,
+        calculate_modularity(_WORKER_ADJACENCY, groups),
+        calculate_modularity(_WORKER_ADJACENCY, groups, resolution),
+    )
+
+
+def calculate_louvain_runs(
+    adjacency: "csr_matrix",
+    resolutions: Iterable[float],
+    seeds: Iterable[int],
+    connected: bool = True,
+    processes: int = 1,
+) -> List[Tuple[float, int, np.ndarray, float, float]]:
+    """Run the Louvain method for every combination of resolution and seed, in a pool of worker processes.
+
+    Returns:
+        a list of '(resolution, seed, groups, modularity, quality)' tuples, where 'modularity' is the standard modularity
+        (resolution 1) and 'quality' the modularity for the resolution of the run
+    """
+
+    tasks = [
+        (float(resolution), int(seed), connected)
+        for resolution in resolutions
+        for seed in seeds
+    ]
+    results = map_chunks(
+        _run_louvain,
+        tasks,
+        initializer=_set_worker_adjacency,
+        initargs=(adjacency,),
+        processes=min(processes, len(tasks)),
+    )
+    return [
+        (resolution, seed, groups, modularity, quality)
+        for (resolution, seed, _), (groups, modularity, quality) in zip(tasks, results)
+    ]
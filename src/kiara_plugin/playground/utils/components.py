@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+
+"""Connectivity helpers (connected components, cut-points, bridges, biconnected components), computed on integer edge arrays.
+
+All traversals are iterative (explicit stacks instead of recursion), so they work for graphs of any depth, and run in
+O(V + E) time.
+"""
+
+from typing import TYPE_CHECKING, Iterable, Tuple
+
+import numpy as np
+import pyarrow as pa
+
+from kiara_plugin.network_analysis.defaults import (
+    LABEL_COLUMN_NAME,
+    NODE_ID_COLUMN_NAME,
+    SOURCE_COLUMN_NAME,
+    TARGET_COLUMN_NAME,
+)
+from kiara_plugin.playground.utils.communities import number_by_size
+from kiara_plugin.playground.utils.networks import NetworkArrays, node_indexes
+
+if TYPE_CHECKING:
+    from kiara_plugin.network_analysis.models import NetworkData
+
+
+def _find_roots(parent: np.ndarray) -> np.ndarray:
+    """Compress all paths of a union-find forest in place (pointer jumping), so every node points to its root."""
+
+    while True:
+        grandparent = parent[parent]
+        if np.array_equal(grandparent, parent):
+            return parent
+        parent[:] = grandparent
+
+
+def union_edges(parent: np.ndarray, sources: np.ndarray, targets: np.ndarray) -> None:
+    """Merge the sets of the end points of a batch of edges, in a (fully compressed) union-find forest.
+
+    This is a vectorised union-find: in every round, the root of the bigger index of each edge is linked to the root
+    with the smaller index (so the root of a set is always its smallest node index), then all paths are compressed
+    again. Edges that already connect the same set are dropped after each round, so this usually takes only a few
+    rounds per batch.
+    """
+
+    while len(sources):
+        source_roots = parent[sources]
+        target_roots = parent[targets]
+        unmerged = source_roots != target_roots
+        if not unmerged.any():
+            return
+
+        sources = sources[unmerged]
+        targets = targets[unmerged]
+        low = np.minimum(source_roots[unmerged], target_roots[unmerged])
+        high = np.maximum(source_roots[unmerged], target_roots[unmerged])
+        # if a root gets linked by several edges at once, the smallest target wins, the others are merged next round
+        np.minimum.at(parent, high, low)
+        _find_roots(parent)
+
+
+def calculate_connected_components(
+    num_nodes: int, edge_batches: Iterable[Tuple[np.ndarray, np.ndarray]]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Find the connected components of an (undirected) network, streaming through its edges once.
+
+    Arguments:
+        num_nodes: the number of nodes in the network
+        edge_batches: batches of '(sources, targets)' node index arrays, for example from
+            'kiara_plugin.playground.utils.networks.iter_edge_batches'
+
+    Returns:
+        a tuple '(components, sizes)': the component id of every node, and the number of nodes in each component;
+        components are numbered by size, largest first (ties in order of their smallest node index)
+    """
+
+    parent = np.arange(num_nodes, dtype=np.int64)
+    for sources, targets in edge_batches:
+        union_edges(parent, sources, targets)
+
+    components = number_by_size(parent)
+    return components, np.bincount(components)
+
+
+def filter_component(
+    network_data: "NetworkData", components: np.ndarray, component: int = 0
+) -> Tuple[pa.Table, pa.Table]:
+    """Filter the nodes and edges tables of a network down to one of its connected components.
+
+    Nodes get new, consecutive ids (in the order of their old ids), the old ids are kept in the 'old_node_id',
+    'old_source_id' and 'old_target_id' columns. Pre-computed columns (starting with '_') are left out, they need to be
+    re-computed for the sub-network.
+
+    Returns:
+        a tuple '(nodes_table, edges_table)'
+    """
+
+    nodes_table: pa.Table = network_data.nodes.arrow_table
+    edges_table: pa.Table = network_data.edges.arrow_table
+
+    in_component = components == component
+    new_ids = np.cumsum(in_component) - 1
+
+    nodes = nodes_table.filter(pa.array(in_component))
+    node_columns = {
+        NODE_ID_COLUMN_NAME: pa.array(np.arange(nodes.num_rows, dtype=np.int64)),
+        "old_node_id": nodes.column(NODE_ID_COLUMN_NAME),
+    }
+    for column_name in nodes.column_names:
+        if column_name == NODE_ID_COLUMN_NAME or (
+            column_name.startswith("_") and column_name != LABEL_COLUMN_NAME
+        ):
+            continue
+        node_columns[column_name] = nodes.column(column_name)
+
+    # both end points of an edge are always in the same component, so checking the sources is enough
+    sources = node_indexes(
+        nodes_table, edges_table.column(SOURCE_COLUMN_NAME).to_numpy()
+    )
+    edge_mask = in_component[sources]
+    edges = edges_table.filter(pa.array(edge_mask))
+    targets = node_indexes(nodes_table, edges.column(TARGET_COLUMN_NAME).to_numpy())
+    edge_columns = {
+        SOURCE_COLUMN_NAME: pa.array(new_ids[sources[edge_mask]]),
+        TARGET_COLUMN_NAME: pa.array(new_ids[targets]),
+        "old_source_id": edges.column(SOURCE_COLUMN_NAME),
+        "old_target_id": edges.column(TARGET_COLUMN_NAME),
+    }
+    for column_name in edges.column_names:
+        if not column_name.startswith("_"):
+            edge_columns[column_name] = edges.column(column_name)
+
+    return pa.table(node_columns), pa.table(edge_columns)
+
+
+def undirected_adjacency(
+    arrays: NetworkArrays,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Create an undirected CSR adjacency structure that remembers which edge each entry came from.
+
+    Self-loops are left out, parallel edges are kept (each with its own edge index).
+
+    Returns:
+        a tuple '(indptr, indices, edge_indexes)'
+    """
+
+    edge_indexes = np.flatnonzero(arrays.sources != arrays.targets)
+    sources = arrays.sources[edge_indexes]
+    targets = arrays.targets[edge_indexes]
+
+    heads = np.concatenate([sources, targets])
+    tails = np.concatenate([targets, sources])
+    entry_edges = np.concatenate([edge_indexes, edge_indexes])
+
+    order = np.argsort(heads, kind="stable")
+    indptr = np.zeros(arrays.num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(heads, minlength=arrays.num_nodes), out=indptr[1:])
+    return indptr, tails[order], entry_edges[order]
+
+
+def calculate_biconnected_components(
+    arrays: NetworkArrays,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Find cut-points, bridges and biconnected components of the (undirected) network in a single DFS pass.
+
+    This is Tarjan's algorithm (Hopcroft & Tarjan, 1973), with an explicit stack. Parallel edges are handled properly:
+    a pair of nodes that is connected by more than one edge is never a bridge.
+
+    Returns:
+        a tuple '(is_cut_point, is_bridge, edge_components)', the first one aligned with the nodes, the other two
+        with the edges; self-loops don't belong to any biconnected component, their component id is -1
+    """
+
+    num_nodes = arrays.num_nodes
+    indptr_array, indices_array, entry_edges_array = undirected_adjacency(arrays)
+    # plain Python lists are a lot faster than numpy arrays for single item access in the loop below
+    indptr = indptr_array.tolist()
+    indices = indices_array.tolist()
+    entry_edges = entry_edges_array.tolist()
+
+    discovery = [-1] * num_nodes
+    low = [0] * num_nodes
+    parent_edge = [-1] * num_nodes
+    next_entry = indptr[:-1]
+
+    is_cut_point = np.zeros(num_nodes, dtype=bool)
+    is_bridge = np.zeros(arrays.num_edges, dtype=bool)
+    edge_components = np.full(arrays.num_edges, -1, dtype=np.int64)
+
+    time = 0
+    component = 0
+    for root in range(num_nodes):
+        if discovery[root] != -1:
+            continue
+
+        discovery[root] = low[root] = time
+        time += 1
+        root_children = 0
+        stack = [root]
+        edge_stack = []
+
+        while stack:
+            node = stack[-1]
+            entry = next_entry[node]
+            if entry < indptr[node + 1]:
+                next_entry[node] = entry + 1
+                edge = entry_edges[entry]
+                if edge == parent_edge[node]:
+                    continue
+                other = indices[entry]
+                if discovery[other] == -1:
+                    parent_edge[other] = edge
+                    discovery[other] = low[other] = time
+                    time += 1
+                    edge_stack.append(edge)
+                    stack.append(other)
+                elif discovery[other] < discovery[node]:
+                    # back edge to an ancestor
+                    if discovery[other] < low[node]:
+                        low[node] = discovery[other]
+                    edge_stack.append(edge)
+                continue
+
+            # all neighbours done, hand the result up to the parent
+            stack.pop()
+            if not stack:
+                continue
+            parent = stack[-1]
+            if low[node] < low[parent]:
+                low[parent] = low[node]
+
+            if low[node] >= discovery[parent]:
+                if parent == root:
+                    root_children += 1
+                else:
+                    is_cut_point[parent] = True
+
+                tree_edge = parent_edge[node]
+                while True:
+                    edge = edge_stack.pop()
+                    edge_components[edge] = component
+                    if edge == tree_edge:
+                        break
+                component += 1
+
+                if low[node] > discovery[parent]:
+                    is_bridge[tree_edge] = True
+
+        if root_children > 1:
+            is_cut_point[root] = True
+
+    return is_cut_point, is_bridge, edge_components
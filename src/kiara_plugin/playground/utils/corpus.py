@@ -0,0 +1,540 @@
+# -*- coding: utf-8 -*-
+
+"""Read a folder of text files into a corpus table, in parallel and in bounded-size record batches.
+
+Files are split into chunks, and every chunk is read, decoded and normalised by a worker thread: the files are read as
+bytes (file IO releases the GIL), and decoded (UTF-8 validation) and normalised with Arrow compute functions (which
+release the GIL as well), so all cores are busy. Only a limited number of chunks is in flight at any time, and the
+finished record batches can be written to a (memory-mapped) Arrow file, so the memory usage doesn't grow with the size
+of the corpus.
+
+The corpus table has the same columns as the one created by 'create.table.from.text_file_bundle': 'id', 'rel_path',
+'mime_type', 'size', 'content' and 'file_name', with files sorted by their relative path.
+
+Along with the corpus table, a manifest table is created, with the size, modification time and content hash of every
+onboarded file. With the manifest of a previous run, a corpus can be updated incrementally: only files that are new, or
+whose size or modification time changed, are read, and only if their content changed, too, they replace the previous
+version. Rows of unchanged files are re-used without copying them.
+"""
+
+import hashlib
+
+import mimetypes
+import os
+import tempfile
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Deque, Iterable, Iterator, List, Tuple, Union
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from kiara.exceptions import KiaraProcessingException
+
+# the (maximum) number of files in a record batch of the corpus table
+DEFAULT_CORPUS_BATCH_SIZE = 1000
+# the number of threads to read files with
+DEFAULT_READ_WORKERS = os.cpu_count() or 4
+# the unicode normalization forms text can be normalised to
+NORMALIZATION_FORMS = ("NFC", "NFKC", "NFD", "NFKD")
+# what to do with files that can't be decoded: raise an 'error', 'replace' invalid bytes, or 'skip' the file
+ENCODING_ERROR_POLICIES = ("error", "replace", "skip")
+
+MANIFEST_SCHEMA = pa.schema(
+    [
+        ("rel_path", pa.string()),
+        ("size", pa.int64()),
+        ("mtime_ns", pa.int64()),
+        ("content_hash", pa.string()),
+    ]
+)
+
+CORPUS_SCHEMA = pa.schema(
+    [
+        ("id", pa.int64()),
+        ("rel_path", pa.string()),
+        ("mime_type", pa.string()),
+        ("size", pa.int64()),
+        ("content", pa.string()),
+        ("file_name", pa.string()),
+    ]
+)
+
+
+def list_text_files(
+    folder: str,
+    include_files: Union[Iterable[str], None] = None,
+    exclude_dirs: Union[Iterable[str], None] = None,
+) -> List[Tuple[str, str]]:
+    """List the files in a folder (recursively), sorted by their path relative to the folder.
+
+    Arguments:
+        folder: the folder to list the files of
+        include_files: if provided, only files that end with one of these strings (for example: '.txt') are included
+        exclude_dirs: the names of sub-folders to ignore
+
+    Returns:
+        a list of tuples '(rel_path, full_path)'
+    """
+
+    if not os.path.isdir(folder):
+        raise KiaraProcessingException(
+            f"Can't onboard corpus: '{folder}' is not a folder."
+        )
+
+    include = tuple(include_files) if include_files else None
+    exclude = set(exclude_dirs) if exclude_dirs else set()
+
+    files = []
+    for root, dir_names, file_names in os.walk(folder, topdown=True):
+        dir_names[:] = [d for d in dir_names if d not in exclude]
+        for file_name in file_names:
+            if include and not file_name.endswith(include):
+                continue
+            full_path = os.path.join(root, file_name)
+            files.append((os.path.relpath(full_path, folder), full_path))
+
+    files.sort()
+    return files
+
+
+def decode_texts(
+    contents: pa.Array,
+    encoding: str = "utf-8",
+    errors: str = "error",
+    rel_paths: Union[List[str], None] = None,
+) -> pa.Array:
+    """Decode an array of file contents (bytes) into strings.
+
+    UTF-8 contents are validated with a single Arrow cast, only if that fails (or for other encodings) are files decoded
+    one by one. Files that can't be decoded are null if 'errors' is 'skip'.
+    """
+
+    if errors not in ENCODING_ERROR_POLICIES:
+        raise KiaraProcessingException(
+            f"Invalid policy for encoding errors '{errors}', must be one of: {', '.join(ENCODING_ERROR_POLICIES)}"
+        )
+
+    if encoding.lower().replace("_", "-") in ("utf-8", "utf8"):
+        try:
+            return contents.cast(pa.string())
+        except pa.ArrowInvalid:
+            pass
+
+    texts: List[Union[str, None]] = []
+    for i, content in enumerate(contents.to_pylist()):
+        try:
+            texts.append(
+                content.decode(
+                    encoding, errors="replace" if errors == "replace" else "strict"
+                )
+            )
+        except UnicodeDecodeError as e:
+            if errors == "skip":
+                texts.append(None)
+                continue
+            path = rel_paths[i] if rel_paths else i
+            raise KiaraProcessingException(
+                f"Can't decode file '{path}' as '{encoding}': {e}"
+            )
+        except LookupError:
+            raise KiaraProcessingException(f"Unknown encoding '{encoding}'.")
+    return pa.array(texts, type=pa.string())
+
+
+def normalize_texts(
+    texts: pa.Array, normalization: Union[str, None] = None
+) -> pa.Array:
+    """Normalise line endings ('\\r\\n' and '\\r') to '\\n', and (optionally) the unicode representation of texts.
+
+    Line endings are normalised the same way Python does when reading files in text mode, so the texts are the same as
+    the ones 'create.table.from.text_file_bundle' creates, as long as no 'normalization' form is given.
+    """
+
+    texts = pc.replace_substring_regex(texts, pattern="\r\n?", replacement="\n")
+    if normalization:
+        if normalization not in NORMALIZATION_FORMS:
+            raise KiaraProcessingException(
+                f"Invalid unicode normalization form '{normalization}', must be one of: {', '.join(NORMALIZATION_FORMS)}"
+            )
+        texts = pc.utf8_normalize(texts, form=normalization)
+    return texts
+
+
+def read_text_batch(
+    files: List[Tuple[str, str]],
+    start_id: int,
+    encoding: str = "utf-8",
+    errors: str = "error",
+    normalization: Union[str, None] = None,
+) -> Tuple[pa.RecordBatch, pa.RecordBatch]:
+    """Read, decode and normalise a list of text files into a record batch of the corpus table.
+
+    Files are numbered consecutively, starting with 'start_id'. Skipped files (see 'decode_texts') are not included,
+    their ids are not re-used.
+
+    Returns:
+        a tuple '(corpus_batch, manifest_batch)'
+    """
+
+    rel_paths = [rel_path for rel_path, _ in files]
+    contents = []
+    mtimes = []
+    hashes = []
+    for _, full_path in files:
+        with open(full_path, "rb") as f:
+            content = f.read()
+            mtimes.append(os.fstat(f.fileno()).st_mtime_ns)
+        contents.append(content)
+        hashes.append(hashlib.sha256(content).hexdigest())
+
+    raw = pa.array(contents, type=pa.binary())
+    del contents
+    texts = normalize_texts(
+        decode_texts(raw, encoding, errors, rel_paths), normalization
+    )
+
+    batch = pa.record_batch(
+        [
+            pa.array(range(start_id, start_id + len(files)), type=pa.int64()),
+            pa.array(rel_paths, type=pa.string()),
+            pa.array(
+                [
+                    mimetypes.guess_type(rel_path)[0] or "application/octet-stream"
+                    for rel_path in rel_paths
+                ],
+                type=pa.string(),
+            ),
+            pc.binary_length(raw).cast(pa.int64()),
+            texts,
+            pa.array(
+                [os.path.basename(rel_path) for rel_path in rel_paths], type=pa.string()
+            ),
+        ],
+        schema=CORPUS_SCHEMA,
+    )
+    manifest = pa.record_batch(
+        [
+            batch.column(1),
+            batch.column(3),
+            pa.array(mtimes, type=pa.int64()),
+            pa.array(hashes, type=pa.string()),
+        ],
+        schema=MANIFEST_SCHEMA,
+    )
+    if texts.null_count:
+        batch = batch.filter(pc.is_valid(texts))
+        manifest = manifest.filter(pc.is_valid(texts))
+    return batch, manifest
+
+
+def iter_corpus_batches(
+    files: List[Tuple[str, str]],
+    batch_size: int = DEFAULT_CORPUS_BATCH_SIZE,
+    max_workers: int = DEFAULT_READ_WORKERS,
+    encoding: str = "utf-8",
+    errors: str = "error",
+    normalization: Union[str, None] = None,
+    start_id: int = 0,
+) -> Iterator[Tuple[pa.RecordBatch, pa.RecordBatch]]:
+    """Read a list of text files in chunks of 'batch_size' files, with a pool of worker threads.
+
+    Batches (tuples of corpus and manifest batch, see 'read_text_batch') are yielded in the order of the files, and at
+    most two chunks per worker are in flight at any time, so the memory usage only depends on the batch size and the
+    number of workers, not on the number of files.
+    """
+
+    if batch_size < 1:
+        raise KiaraProcessingException(
+            f"Invalid batch size '{batch_size}': must be a positive number."
+        )
+
+    starts = iter(range(0, len(files), batch_size))
+    max_workers = max(1, max_workers)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending: Deque[Future] = deque()
+
+        def submit_next() -> None:
+            start = next(starts, None)
+            if start is not None:
+                pending.append(
+                    executor.submit(
+                        read_text_batch,
+                        files[start : start + batch_size],
+                        start_id + start,
+                        encoding,
+                        errors,
+                        normalization,
+                    )
+                )
+
+        for _ in range(2 * max_workers):
+            submit_next()
+        while pending:
+            batches = pending.popleft().result()
+            submit_next()
+            yield batches
+
+
+def write_corpus_file(batches: Iterable[pa.RecordBatch], path: str) -> pa.Table:
+    """Write record batches to an Arrow file, and return them as (memory-mapped) table that is backed by that file."""
+
+    with pa.OSFile(path, "wb") as sink:
+        with pa.ipc.new_file(sink, CORPUS_SCHEMA) as writer:
+            for batch in batches:
+                writer.write_batch(batch)
+
+    with pa.memory_map(path, "r") as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def read_corpus_files(
+    files: List[Tuple[str, str]],
+    batch_size: int = DEFAULT_CORPUS_BATCH_SIZE,
+    max_workers: int = DEFAULT_READ_WORKERS,
+    encoding: str = "utf-8",
+    errors: str = "error",
+    normalization: Union[str, None] = None,
+    spill_dir: Union[str, None] = None,
+    start_id: int = 0,
+) -> Tuple[pa.Table, pa.Table]:
+    """Read a list of text files into a corpus table, made up of record batches of (at most) 'batch_size' files.
+
+    If 'spill_dir' is provided, the record batches are written to an Arrow file in that folder as soon as they are
+    read, and the returned table is memory-mapped from that file, so the corpus never needs to fit into memory. The
+    file is removed again once the table isn't used anymore (on systems that support removing memory-mapped files).
+
+    Returns:
+        a tuple '(corpus_table, manifest_table)'
+    """
+
+    manifest_batches: List[pa.RecordBatch] = []
+
+    def corpus_batches() -> Iterator[pa.RecordBatch]:
+        for batch, manifest_batch in iter_corpus_batches(
+            files,
+            batch_size=batch_size,
+            max_workers=max_workers,
+            encoding=encoding,
+            errors=errors,
+            normalization=normalization,
+            start_id=start_id,
+        ):
+            manifest_batches.append(manifest_batch)
+            yield batch
+
+    if spill_dir is None:
+        table = pa.Table.from_batches(list(corpus_batches()), schema=CORPUS_SCHEMA)
+    else:
+        fd, path = tempfile.mkstemp(dir=spill_dir, suffix=".arrow")
+        os.close(fd)
+        try:
+            table = write_corpus_file(corpus_batches(), path)
+        except Exception:
+            os.remove(path)
+            raise
+        try:
+            # the memory map stays valid after the file is removed
+            os.remove(path)
+        except OSError:
+            pass
+
+    return table, pa.Table.from_batches(manifest_batches, schema=MANIFEST_SCHEMA)
+
+
+def read_text_corpus(
+    folder: str,
+    include_files: Union[Iterable[str], None] = None,
+    exclude_dirs: Union[Iterable[str], None] = None,
+    **read_config: Any,
+) -> Tuple[pa.Table, pa.Table]:
+    """Read a folder of text files into a corpus table (see 'read_corpus_files' for the other arguments).
+
+    Returns:
+        a tuple '(corpus_table, manifest_table)'
+    """
+
+    files = list_text_files(
+        folder, include_files=include_files, exclude_dirs=exclude_dirs
+    )
+    return read_corpus_files(files, **read_config)
+
+
+def stat_files(files: List[Tuple[str, str]]) -> Tuple[pa.Array, pa.Array]:
+    """Return the sizes and modification times (in ns) of a list of files."""
+
+    sizes = []
+    mtimes = []
+    for _, full_path in files:
+        stat = os.stat(full_path)
+        sizes.append(stat.st_size)
+        mtimes.append(stat.st_mtime_ns)
+    return pa.array(sizes, type=pa.int64()), pa.array(mtimes, type=pa.int64())
+
+
+def update_text_corpus(
+    folder: str,
+    previous_table: pa.Table,
+    previous_manifest: pa.Table,
+    include_files: Union[Iterable[str], None] = None,
+    exclude_dirs: Union[Iterable[str], None] = None,
+    **read_config: Any,
+) -> Tuple[pa.Table, pa.Table, pa.Table]:
+    """Update a corpus table (created by 'read_text_corpus') with the current content of its folder.
+
+    Only files that are not in the previous manifest, or whose size or modification time differ from it, are read (a
+    file that changed without changing its size and modification time is not detected). Read files whose content hash
+    is still the same as before are not considered changed. The rows of changed and removed files are removed from
+    the corpus, and the new and changed files are appended, with ids that continue after the highest previous id.
+
+    If no file was changed or removed, the previous table is re-used as it is, without copying it.
+
+    Returns:
+        a tuple '(corpus_table, manifest_table, new_rows)', where 'new_rows' contains only the rows of the new and
+        changed files (to process them in subsequent steps)
+    """
+
+    for table, schema, name in (
+        (previous_table, CORPUS_SCHEMA, "corpus table"),
+        (previous_manifest, MANIFEST_SCHEMA, "manifest"),
+    ):
+        missing = [n for n in schema.names if n not in table.column_names]
+        if missing:
+            raise KiaraProcessingException(
+                f"Can't update corpus: previous {name} is missing column(s): {', '.join(missing)}"
+            )
+
+    # the manifest has no text content, so its columns can be combined into single arrays cheaply
+    previous_manifest = previous_manifest.select(MANIFEST_SCHEMA.names).cast(
+        MANIFEST_SCHEMA
+    )
+    previous_paths = previous_manifest.column("rel_path").combine_chunks()
+
+    files = list_text_files(
+        folder, include_files=include_files, exclude_dirs=exclude_dirs
+    )
+    rel_paths = pa.array([rel_path for rel_path, _ in files], type=pa.string())
+    sizes, mtimes = stat_files(files)
+
+    # the position of every current file in the previous manifest
+    positions = pc.index_in(rel_paths, value_set=previous_paths)
+    unchanged = pc.fill_null(
+        pc.and_(
+            pc.equal(
+                sizes, previous_manifest.column("size").combine_chunks().take(positions)
+            ),
+            pc.equal(
+                mtimes,
+                previous_manifest.column("mtime_ns").combine_chunks().take(positions),
+            ),
+        ),
+        False,
+    )
+    unchanged_paths = rel_paths.filter(unchanged)
+    candidates = [
+        files[i] for i in pc.indices_nonzero(pc.invert(unchanged)).to_pylist()
+    ]
+
+    next_id = (
+        pc.max(previous_table.column("id")).as_py() + 1
+        if previous_table.num_rows
+        else 0
+    )
+    read_table, read_manifest = read_corpus_files(candidates, **read_config)
+    read_paths = read_manifest.column("rel_path").combine_chunks()
+
+    # files that were touched, but whose content didn't change, keep their previous row
+    same_content = pc.fill_null(
+        pc.equal(
+            read_manifest.column("content_hash").combine_chunks(),
+            previous_manifest.column("content_hash")
+            .combine_chunks()
+            .take(pc.index_in(read_paths, value_set=previous_paths)),
+        ),
+        False,
+    )
+    new_rows = read_table.filter(pc.invert(same_content))
+    new_rows = new_rows.set_column(
+        0,
+        "id",
+        pa.array(range(next_id, next_id + new_rows.num_rows), type=pa.int64()),
+    )
+
+    kept_paths = pa.concat_arrays([unchanged_paths, read_paths.filter(same_content)])
+    keep = pc.is_in(previous_table.column("rel_path"), value_set=kept_paths)
+    if not pc.all(keep).as_py():
+        previous_table = previous_table.filter(keep)
+
+    table = pa.concat_tables(
+        [previous_table.select(CORPUS_SCHEMA.names).cast(CORPUS_SCHEMA), new_rows]
+    )
+    manifest = pa.concat_tables(
+        [
+            previous_manifest.filter(
+                pc.is_in(previous_paths, value_set=unchanged_paths)
+            ),
+            read_manifest,
+        ]
+    )
+    return table, manifest, new_rows
+
+
+def merge_processed_rows(
+    corpus_table: pa.Table,
+    new_rows: pa.Table,
+    previous_table: Union[pa.Table, None] = None,
+    id_column_name: str = "id",
+) -> pa.Table:
+    """Merge the processed 'new_rows' of an incremental corpus update into the processed table of the previous run.
+
+    'new_rows' and 'previous_table' are derived from the 'new_rows' and 'corpus_table' outputs of 'update_text_corpus'
+    (for example, with a column of parsed dates or tokens added). Rows of the previous table whose id is no longer in
+    the (updated) corpus table belong to removed or changed files, and are dropped, the new rows are appended. So the
+    result has the same rows, in the same order, as the corpus table, without processing the unchanged rows again.
+
+    If there is no previous table, 'new_rows' contains all rows of the corpus, and is returned as it is.
+    """
+
+    if previous_table is None:
+        return new_rows
+
+    for table, name in (
+        (corpus_table, "corpus table"),
+        (new_rows, "new rows"),
+        (previous_table, "previous table"),
+    ):
+        if id_column_name not in table.column_names:
+            raise KiaraProcessingException(
+                f"Can't merge rows: no id column '{id_column_name}' in {name}. Available columns: {', '.join(table.column_names)}"
+            )
+    missing = [n for n in new_rows.column_names if n not in previous_table.column_names]
+    if missing:
+        raise KiaraProcessingException(
+            f"Can't merge rows: previous table is missing column(s): {', '.join(missing)}"
+        )
+
+    # the ids of the new rows are never in the previous table, but are excluded anyway, so rows can't be duplicated
+    kept_ids = pc.filter(
+        corpus_table.column(id_column_name),
+        pc.invert(
+            pc.is_in(
+                corpus_table.column(id_column_name),
+                value_set=new_rows.column(id_column_name).combine_chunks(),
+            )
+        ),
+    )
+    keep = pc.is_in(
+        previous_table.column(id_column_name), value_set=kept_ids.combine_chunks()
+    )
+    if not pc.all(keep).as_py():
+        previous_table = previous_table.filter(keep)
+
+    result = pa.concat_tables(
+        [previous_table.select(new_rows.column_names), new_rows],
+        promote_options="permissive",
+    )
+    if result.num_rows != corpus_table.num_rows:
+        raise KiaraProcessingException(
+            f"Can't merge rows: the result has {result.num_rows} rows, the corpus table has {corpus_table.num_rows}. Is the previous table from the previous run of the same corpus?"
+        )
+    return result
@@ -0,0 +1,529 @@
+# -*- coding: utf-8 -*-
+
+"""A streaming GML reader, that creates the nodes and edges tables of a network without building a networkx graph.
+
+The file is memory-mapped and tokenised in place, and only a single node or edge record is parsed into Python objects
+at a time. Records are collected column-wise, and converted into Arrow tables every 'batch_size' records, so the
+memory use is dominated by the (compact) Arrow tables, not by Python objects.
+
+The parsing rules follow ``networkx.read_gml``, so the result is the same as reading a file with networkx, and then
+converting it via ``NetworkData.create_from_networkx_graph`` (except for the order of the edges, which is the order
+they appear in the file here).
+"""
+
+import html
+import mmap
+import os
+import re
+from typing import Any, Dict, Iterator, List, Tuple, Union
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from kiara.exceptions import KiaraProcessingException
+from kiara_plugin.network_analysis.defaults import (
+    LABEL_COLUMN_NAME,
+    NODE_ID_COLUMN_NAME,
+    SOURCE_COLUMN_NAME,
+    TARGET_COLUMN_NAME,
+)
+
+# the number of node or edge records to collect before they are converted into an Arrow table
+DEFAULT_GML_BATCH_SIZE = 65536
+
+# token kinds, the numbers are the group indexes in the token pattern
+KEY, REAL, INT, STRING, DICT_START, DICT_END, WHITESPACE = range(1, 8)
+
+# the same token definitions as in 'networkx.read_gml', but for bytes, and strings may span several lines
+_TOKEN_PATTERN = re.compile(
+    rb"([A-Za-z][0-9A-Za-z_]*\b)"
+    rb"|([+-]?(?:[0-9]*\.[0-9]+|[0-9]+\.[0-9]*|INF)(?:[Ee][+-]?[0-9]+)?)"
+    rb"|([+-]?[0-9]+)"
+    rb'|("[^"]*")'
+    rb"|(\[)"
+    rb"|(\])"
+    rb"|(#[^\n]*|\s+)"
+)
+_MULTILINE_PATTERN = re.compile(r"\s*\n\s*")
+
+# unquoted values that are allowed for these keys (as strings)
+_STRING_CONVERTIBLE_KEYS = ("id", "label", "source", "target")
+
+# internal column names for the GML ids, they can't clash with attributes, since those must not start with '_'
+_GML_ID_COLUMN_NAME = "_gml_id"
+_GML_SOURCE_COLUMN_NAME = "_gml_source"
+_GML_TARGET_COLUMN_NAME = "_gml_target"
+
+
+def tokenize_gml(data: Union[bytes, mmap.mmap]) -> Iterator[Tuple[int, Any]]:
+    """Split GML data into '(kind, value)' tokens, skipping whitespace and comments.
+
+    Keys are returned as strings, numbers as int or float, and (quoted) strings without their quotes, and with HTML
+    entities replaced.
+    """
+
+    match = _TOKEN_PATTERN.match
+    pos = 0
+    end = len(data)
+    while pos < end:
+        m = match(data, pos)
+        if m is None:
+            raise KiaraProcessingException(
+                f"Can't parse GML: invalid token at byte {pos}: {bytes(data[pos:pos + 20])!r}"
+            )
+        pos = m.end()
+        kind = m.lastindex
+        # every alternative of the pattern is a group, so a match always has a 'lastindex'
+        assert kind is not None
+        if kind == WHITESPACE:
+            continue
+
+        text = m.group(kind)
+        if kind == KEY:
+            yield KEY, text.decode("ascii")
+        elif kind == REAL:
+            yield REAL, float(text)
+        elif kind == INT:
+            yield INT, int(text)
+        elif kind == STRING:
+            value = text[1:-1].decode("utf-8")
+            if "\n" in value:
+                # like networkx: lines of multi-line strings are joined by a single space
+                value = _MULTILINE_PATTERN.sub(" ", value)
+            yield STRING, html.unescape(value)
+        else:
+            yield kind, None
+
+
+def _next_token(tokens: Iterator[Tuple[int, Any]], expected: str) -> Tuple[int, Any]:
+
+    token = next(tokens, None)
+    if token is None:
+        raise KiaraProcessingException(
+            f"Can't parse GML: expected {expected}, found end of file."
+        )
+    return token
+
+
+def _parse_value(
+    key: str, token: Tuple[int, Any], tokens: Iterator[Tuple[int, Any]]
+) -> Any:
+
+    kind, value = token
+    if kind in (INT, REAL, STRING):
+        return value
+    if kind == DICT_START:
+        return _parse_dict(tokens)
+    if kind == KEY:
+        if key in _STRING_CONVERTIBLE_KEYS:
+            return value
+        if value in ("NAN", "INF"):
+            return float(value)
+    raise KiaraProcessingException(
+        f"Can't parse GML: invalid value for key '{key}': {value!r}."
+    )
+
+
+def _parse_dict(tokens: Iterator[Tuple[int, Any]]) -> Dict[str, Any]:
+    """Parse the content of a '[ ... ]' block (after the opening bracket), keys that appear more than once become lists."""
+
+    result: Dict[str, Any] = {}
+    repeated = set()
+    while True:
+        kind, key = _next_token(tokens, "a key or ']'")
+        if kind == DICT_END:
+            return result
+        if kind != KEY:
+            raise KiaraProcessingException(
+                f"Can't parse GML: expected a key or ']', found {key!r}."
+            )
+
+        value = _parse_value(key, _next_token(tokens, "a value"), tokens)
+        if key not in result:
+            result[key] = value
+        elif key in repeated:
+            result[key].append(value)
+        else:
+            result[key] = [result[key], value]
+            repeated.add(key)
+
+
+def _to_arrow(values: List[Any]) -> pa.Array:
+
+    try:
+        return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError, OverflowError):
+        # mixed types (or integers that don't fit into 64 bit) in the same attribute, fall back to strings
+        return pa.array([None if v is None else str(v) for v in values], pa.string())
+
+
+def _unify_column_types(tables: List[pa.Table]) -> List[pa.Table]:
+    """Convert columns to strings in all tables, if their types differ between tables in a way Arrow can't promote.
+
+    This is the same fallback '_to_arrow' uses for mixed types within a single batch, so the result doesn't depend on
+    where the batch boundaries are.
+    """
+
+    types: Dict[str, List[pa.DataType]] = {}
+    for table in tables:
+        for field in table.schema:
+            if not pa.types.is_null(field.type):
+                types.setdefault(field.name, []).append(field.type)
+
+    string_columns = []
+    for column_name, column_types in types.items():
+        if len(set(column_types)) < 2:
+            continue
+        try:
+            pa.unify_schemas(
+                [pa.schema([(column_name, t)]) for t in column_types],
+                promote_options="permissive",
+            )
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            string_columns.append(column_name)
+
+    if not string_columns:
+        return tables
+
+    result = []
+    for table in tables:
+        converted = table
+        for column_name in string_columns:
+            if column_name not in converted.column_names:
+                continue
+            index = converted.column_names.index(column_name)
+            values = converted.column(index).to_pylist()
+            converted = converted.set_column(
+                index,
+                column_name,
+                pa.array([None if v is None else str(v) for v in values], pa.string()),
+            )
+        result.append(converted)
+    return result
+
+
+class RecordBatcher(object):
+    """Collects records (dicts) column-wise, and converts them into an Arrow table every 'batch_size' records.
+
+    Records don't need to have the same keys: missing values are filled with nulls.
+    """
+
+    def __init__(self, batch_size: int = DEFAULT_GML_BATCH_SIZE):
+
+        self.batch_size: int = batch_size
+        self.num_rows: int = 0
+        self._columns: Dict[str, List[Any]] = {}
+        self._batch_rows: int = 0
+        self._tables: List[pa.Table] = []
+
+    def append(self, record: Dict[str, Any]) -> None:
+
+        columns = self._columns
+        for key, value in record.items():
+            column = columns.get(key, None)
+            if column is None:
+                column = columns[key] = [None] * self._batch_rows
+            column.append(value)
+
+        self._batch_rows += 1
+        self.num_rows += 1
+        if len(record) != len(columns):
+            for column in columns.values():
+                if len(column) < self._batch_rows:
+                    column.append(None)
+
+        if self._batch_rows >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+
+        if not self._batch_rows:
+            return
+        self._tables.append(
+            pa.table({key: _to_arrow(values) for key, values in self._columns.items()})
+        )
+        self._columns = {}
+        self._batch_rows = 0
+
+    def finish(self) -> pa.Table:
+        """Return all records as a single table (with a common schema)."""
+
+        self.flush()
+        if not self._tables:
+            return pa.table({})
+        table = pa.concat_tables(
+            _unify_column_types(self._tables), promote_options="permissive"
+        )
+        self._tables = []
+        return table
+
+
+def _check_attributes(record: Dict[str, Any], category: str) -> None:
+
+    for key in record.keys():
+        if key.startswith("_"):
+            raise KiaraProcessingException(
+                f"Can't parse GML: {category} attribute '{key}' starts with '_', this is reserved for internal use."
+            )
+
+
+def _pop_attribute(record: Dict[str, Any], category: str, index: int, key: str) -> Any:
+
+    try:
+        return record.pop(key)
+    except KeyError:
+        raise KiaraProcessingException(
+            f"Can't parse GML: {category} #{index} has no '{key}' attribute."
+        )
+
+
+def _find_duplicate(values: Union[pa.Array, pa.ChunkedArray]) -> Union[Any, None]:
+
+    if pc.count_distinct(values, mode="all").as_py() == len(values):
+        return None
+    counts = pc.value_counts(values)
+    duplicates = counts.filter(pc.greater(counts.field("counts"), 1))
+    return duplicates.field("values")[0].as_py()
+
+
+class _GmlGraphReader(object):
+    """Collects the node and edge records of the 'graph' block of a GML file."""
+
+    def __init__(self, label: Union[str, None], batch_size: int):
+
+        self.label: Union[str, None] = label
+        self.directed: bool = False
+        self.multigraph: bool = False
+        self.nodes = RecordBatcher(batch_size)
+        self.edges = RecordBatcher(batch_size)
+
+    def read(self, tokens: Iterator[Tuple[int, Any]]) -> None:
+        """Read the content of the 'graph' block (after its opening bracket)."""
+
+        while True:
+            kind, key = _next_token(tokens, "a key or ']'")
+            if kind == DICT_END:
+                return
+            if kind != KEY:
+                raise KiaraProcessingException(
+                    f"Can't parse GML: expected a key or ']', found {key!r}."
+                )
+
+            token = _next_token(tokens, "a value")
+            if key in ("node", "edge"):
+                if token[0] != DICT_START:
+                    raise KiaraProcessingException(
+                        f"Can't parse GML: expected '[' after '{key}', found {token[1]!r}."
+                    )
+                record = _parse_dict(tokens)
+                if key == "node":
+                    self.add_node(record)
+                else:
+                    self.add_edge(record)
+            elif key == "directed":
+                self.directed = bool(_parse_value(key, token, tokens))
+            elif key == "multigraph":
+                self.multigraph = bool(_parse_value(key, token, tokens))
+            else:
+                # other graph attributes are not part of the network data
+                _parse_value(key, token, tokens)
+
+    def add_node(self, node: Dict[str, Any]) -> None:
+
+        index = self.nodes.num_rows
+        node_id = _pop_attribute(node, "node", index, "id")
+        if self.label is None or self.label == "id":
+            name = node_id
+        else:
+            name = _pop_attribute(node, "node", index, self.label)
+        _check_attributes(node, "node")
+
+        self.nodes.append(
+            {_GML_ID_COLUMN_NAME: node_id, LABEL_COLUMN_NAME: str(name), **node}
+        )
+
+    def add_edge(self, edge: Dict[str, Any]) -> None:
+
+        index = self.edges.num_rows
+        source = _pop_attribute(edge, "edge", index, "source")
+        target = _pop_attribute(edge, "edge", index, "target")
+        _check_attributes(edge, "edge")
+
+        self.edges.append(
+            {_GML_SOURCE_COLUMN_NAME: source, _GML_TARGET_COLUMN_NAME: target, **edge}
+        )
+
+    def create_nodes_table(self) -> Tuple[pa.Table, pa.Array]:
+        """Return the nodes table, and the GML ids of the nodes (in the same order)."""
+
+        nodes = self.nodes.finish()
+        if not nodes.num_rows:
+            raise KiaraProcessingException("Can't parse GML: the graph has no nodes.")
+
+        gml_ids = nodes.column(_GML_ID_COLUMN_NAME).combine_chunks()
+        duplicate = _find_duplicate(gml_ids)
+        if duplicate is not None:
+            raise KiaraProcessingException(
+                f"Can't parse GML: node id {duplicate!r} is duplicated."
+            )
+        if self.label is not None and self.label != "id":
+            duplicate = _find_duplicate(nodes.column(LABEL_COLUMN_NAME))
+            if duplicate is not None:
+                raise KiaraProcessingException(
+                    f"Can't parse GML: node label {duplicate!r} is duplicated."
+                )
+
+        nodes = nodes.drop_columns([_GML_ID_COLUMN_NAME]).add_column(
+            0, NODE_ID_COLUMN_NAME, pa.array(np.arange(nodes.num_rows, dtype=np.int64))
+        )
+        return nodes, gml_ids
+
+    def create_edges_table(self, gml_ids: pa.Array) -> pa.Table:
+
+        edges = self.edges.finish()
+        if not edges.num_rows:
+            return pa.table(
+                {
+                    SOURCE_COLUMN_NAME: pa.array([], pa.int64()),
+                    TARGET_COLUMN_NAME: pa.array([], pa.int64()),
+                }
+            )
+
+        endpoints = {}
+        for column_name, category in (
+            (_GML_SOURCE_COLUMN_NAME, "source"),
+            (_GML_TARGET_COLUMN_NAME, "target"),
+        ):
+            gml_endpoints = edges.column(column_name)
+            value_set = gml_ids
+            if gml_endpoints.type != value_set.type:
+                gml_endpoints = gml_endpoints.cast(pa.string())
+                value_set = value_set.cast(pa.string())
+            indexes = pc.index_in(gml_endpoints, value_set=value_set)
+            if indexes.null_count:
+                index = pc.index(pc.is_null(indexes), True).as_py()
+                raise KiaraProcessingException(
+                    f"Can't parse GML: edge #{index} has undefined {category} {gml_endpoints[index].as_py()!r}."
+                )
+            endpoints[category] = indexes.to_numpy().astype(np.int64)
+
+        sources, targets = endpoints["source"], endpoints["target"]
+        keys = None
+        if self.multigraph and "key" in edges.column_names:
+            keys = edges.column("key")
+            edges = edges.drop_columns(["key"])
+        self._check_duplicate_edges(sources, targets, keys, gml_ids)
+
+        attribute_columns = [
+            column_name
+            for column_name in edges.column_names
+            if column_name not in (_GML_SOURCE_COLUMN_NAME, _GML_TARGET_COLUMN_NAME)
+        ]
+        return pa.table(
+            {
+                SOURCE_COLUMN_NAME: pa.array(sources),
+                TARGET_COLUMN_NAME: pa.array(targets),
+                **{
+                    column_name: edges.column(column_name)
+                    for column_name in attribute_columns
+                },
+            }
+        )
+
+    def _check_duplicate_edges(
+        self,
+        sources: np.ndarray,
+        targets: np.ndarray,
+        keys: Union[pa.ChunkedArray, None],
+        gml_ids: pa.Array,
+    ) -> None:
+        """Make sure there are no duplicate edges, like networkx does: in simple graphs, every pair of nodes can only be connected once, in multigraphs, edge keys must be unique."""
+
+        if self.multigraph and keys is None:
+            return
+
+        if not self.directed:
+            sources, targets = np.minimum(sources, targets), np.maximum(
+                sources, targets
+            )
+        pairs = pa.table({"source": sources, "target": targets})
+        if self.multigraph:
+            has_key = pc.is_valid(keys)
+            pairs = pairs.append_column("key", keys).filter(has_key)
+
+        counts = pairs.group_by(pairs.column_names).aggregate([([], "count_all")])
+        duplicates = counts.filter(pc.greater(counts.column("count_all"), 1))
+        if duplicates.num_rows:
+            arrow = "->" if self.directed else "--"
+            source = gml_ids[duplicates.column("source")[0].as_py()].as_py()
+            target = gml_ids[duplicates.column("target")[0].as_py()].as_py()
+            edge = f"{source!r}{arrow}{target!r}"
+            if self.multigraph:
+                edge = f"{edge}, {duplicates.column('key')[0].as_py()!r}"
+                hint = ""
+            else:
+                hint = " Hint: if this is a multigraph, add 'multigraph 1' to the file header."
+            raise KiaraProcessingException(
+                f"Can't parse GML: edge ({edge}) is duplicated.{hint}"
+            )
+
+
+def _read_gml_data(
+    data: Union[bytes, mmap.mmap], label: Union[str, None], batch_size: int
+) -> Tuple[pa.Table, pa.Table]:
+
+    tokens = tokenize_gml(data)
+    reader = None
+    for kind, key in tokens:
+        if kind != KEY:
+            raise KiaraProcessingException(
+                f"Can't parse GML: expected a key, found {key!r}."
+            )
+        token = _next_token(tokens, "a value")
+        if key != "graph":
+            # file level attributes, like 'Creator' or 'Version'
+            _parse_value(key, token, tokens)
+            continue
+
+        if reader is not None:
+            raise KiaraProcessingException(
+                "Can't parse GML: input contains more than one graph."
+            )
+        if token[0] != DICT_START:
+            raise KiaraProcessingException(
+                f"Can't parse GML: expected '[' after 'graph', found {token[1]!r}."
+            )
+        reader = _GmlGraphReader(label=label, batch_size=batch_size)
+        reader.read(tokens)
+
+    if reader is None:
+        raise KiaraProcessingException("Can't parse GML: input contains no graph.")
+
+    nodes_table, gml_ids = reader.create_nodes_table()
+    return nodes_table, reader.create_edges_table(gml_ids)
+
+
+def read_gml_tables(
+    path: str,
+    label: Union[str, None] = "label",
+    batch_size: int = DEFAULT_GML_BATCH_SIZE,
+) -> Tuple[pa.Table, pa.Table]:
+    """Read a GML file into a nodes and an edges table, that can be used to create a 'NetworkData' instance.
+
+    Arguments:
+        path: the path to the GML file
+        label: the node attribute to use as node label (like the 'label' argument of 'networkx.read_gml'); if this is
+            'id' or 'None', the GML node ids are used as labels (and a 'label' attribute is kept as a normal attribute)
+        batch_size: the number of node/edge records to collect before converting them into an Arrow table
+
+    Returns:
+        a tuple '(nodes_table, edges_table)'; nodes get consecutive ids (in the order they appear in the file), and
+        all other node and edge attributes become columns
+    """
+
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise KiaraProcessingException("Can't parse GML: input contains no graph.")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return _read_gml_data(data, label, batch_size)
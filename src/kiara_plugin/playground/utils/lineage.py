@@ -0,0 +1,342 @@
+# -*- coding: utf-8 -*-
+
+"""Collect the data for the lineage visualizations of the dashboard from the module graph of a value's lineage.
+
+Module type information is retrieved once per module type, values are retrieved from kiara with a single (batched)
+lookup, and value previews are limited to the first rows of a value (or skipped entirely, in which case only the value
+id is returned, so the preview can be rendered later, on demand).
+
+Previews are rendered one after the other: the table renderers of kiara use the default (shared) duckdb connection,
+which can't be used from several threads at once.
+
+For long lineages, the graph can also be retrieved in pages: nodes are ordered breadth-first, starting from the value
+the lineage belongs to, and the (expensive) node information is only retrieved for the nodes of the requested page.
+Since values are immutable, so are their lineages: the parent index and node order of a lineage are memoised (for a
+limited number of lineages), so paging through a lineage only orders its nodes once.
+"""
+
+from collections import OrderedDict, deque
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Set,
+    Tuple,
+    Union,
+)
+
+from kiara.exceptions import KiaraProcessingException
+
+if TYPE_CHECKING:
+    import networkx as nx
+
+    from kiara.api import KiaraAPI
+    from kiara.models.values.value import Value
+
+# the number of rows a value preview is limited to (for tables and arrays)
+DEFAULT_PREVIEW_ROWS = 10
+# the maximum length of a value preview, longer previews are truncated
+MAX_PREVIEW_LENGTH = 4000
+# the number of nodes in a page of lineage data
+DEFAULT_LINEAGE_PAGE_SIZE = 50
+# the number of lineages whose parent index and node order are kept in memory
+MAX_MEMOISED_LINEAGES = 16
+
+VALUE_NODE_PREFIX = "value:"
+
+
+def get_value_id(node_id: Hashable) -> str:
+    """Return the id of the value of a 'value' node in a module graph."""
+
+    return str(node_id)[len(VALUE_NODE_PREFIX) :]
+
+
+class LineageInfo(object):
+    """Retrieves (and memoises) the information about the nodes of lineage graphs from a kiara context.
+
+    Arguments:
+        kiara: the kiara API to retrieve the information from
+        preview_rows: the number of rows to render in a value preview, '0' to not render previews
+        renderer: the function to render value previews with (with the signature of 'KiaraAPI.render_value'),
+            by default the 'render_value' method of the kiara API
+    """
+
+    def __init__(
+        self,
+        kiara: "KiaraAPI",
+        preview_rows: int = DEFAULT_PREVIEW_ROWS,
+        renderer: Union[Callable[..., Any], None] = None,
+    ):
+
+        self.kiara: "KiaraAPI" = kiara
+        self.preview_rows: int = preview_rows
+        self.renderer: Union[Callable[..., Any], None] = renderer
+        self._module_type_names: Union[Set[str], None] = None
+        self._module_type_infos: Dict[str, Dict[str, Any]] = {}
+        self._previews: Dict[str, Union[str, None]] = {}
+
+    def module_type_info(self, module_type: str) -> Dict[str, Any]:
+        """Return the information about a module type, retrieved only once per type.
+
+        Operations without a module type (like 'EXTERNAL_DATA', for data that was registered directly) only get the
+        type name.
+        """
+
+        if module_type not in self._module_type_infos:
+            if self._module_type_names is None:
+                self._module_type_names = set(self.kiara.list_module_type_names())
+            if module_type in self._module_type_names:
+                info = self.kiara.retrieve_module_type_info(module_type).dict()
+            else:
+                info = {"type_name": module_type}
+            self._module_type_infos[module_type] = info
+        return self._module_type_infos[module_type]
+
+    def get_values(self, value_ids: Iterable[str]) -> Dict[str, "Value"]:
+        """Retrieve a list of values with a single lookup."""
+
+        value_ids = list(value_ids)
+        if not value_ids:
+            return {}
+        values = self.kiara.get_values(
+            **{f"value_{i}": value_id for i, value_id in enumerate(value_ids)}
+        )
+        return {
+            value_id: values.get_value_obj(f"value_{i}")
+            for i, value_id in enumerate(value_ids)
+        }
+
+    def render_preview(self, value: "Value") -> Union[str, None]:
+        """Render the first rows of a value as a string, or return 'None' if the value is not set."""
+
+        if not value.is_set:
+            return None
+
+        render_value = self.renderer
+        if render_value is None:
+            # looked up by name, since not all versions of the KiaraAPI (stubs) declare 'render_value'
+            render_value = getattr(self.kiara, "render_value")
+
+        render_config: Dict[str, Any] = {"number_of_rows": self.preview_rows}
+        preview = render_value(
+            value=value, target_format="string", render_config=render_config
+        ).rendered
+        if len(preview) > MAX_PREVIEW_LENGTH:
+            preview = preview[:MAX_PREVIEW_LENGTH] + "\n..."
+        return preview
+
+    def previews(self, value_ids: Iterable[str]) -> Dict[str, Union[str, None]]:
+        """Return the previews of a list of values, every value is only rendered once.
+
+        If previews are disabled ('preview_rows' is 0), all previews are 'None'.
+        """
+
+        value_ids = list(value_ids)
+        if self.preview_rows <= 0:
+            return {value_id: None for value_id in value_ids}
+
+        missing = [
+            value_id
+            for value_id in dict.fromkeys(value_ids)
+            if value_id not in self._previews
+        ]
+        if missing:
+            values = self.get_values(missing)
+            for value_id in missing:
+                self._previews[value_id] = self.render_preview(values[value_id])
+
+        return {value_id: self._previews[value_id] for value_id in value_ids}
+
+    def node_infos(
+        self, nodes: Mapping[Hashable, Mapping[str, Any]]
+    ) -> Dict[Hashable, Dict[str, Any]]:
+        """Return the information for a set of nodes (node id -> node data) of a module graph.
+
+        Operation nodes get the information about their module type, value nodes their value id (as 'preview_id') and
+        preview.
+        """
+
+        value_ids = {
+            node_id: get_value_id(node_id)
+            for node_id, data in nodes.items()
+            if data["node_type"] == "value"
+        }
+        previews = self.previews(value_ids.values())
+
+        infos: Dict[Hashable, Dict[str, Any]] = {}
+        for node_id, data in nodes.items():
+            if data["node_type"] == "operation":
+                infos[node_id] = self.module_type_info(data["module_type"])
+            elif data["node_type"] == "value":
+                value_id = value_ids[node_id]
+                infos[node_id] = {"preview_id": value_id, "preview": previews[value_id]}
+            else:
+                infos[node_id] = {}
+        return infos
+
+
+def create_lineage_data(
+    graph: "nx.DiGraph", lineage_info: LineageInfo
+) -> Dict[str, Dict[str, Any]]:
+    """Create the lineage data of a module graph, in the format expected by the lineage visualization.
+
+    Returns:
+        a dict with a (consecutive) number for every node as key (as string, since kiara 'dict' values only allow
+        string keys), and a dict with the node id, the node data, the ids of the node's parents, and the node
+        information as value
+    """
+
+    nodes: Dict[Hashable, Dict[str, Any]] = dict(graph.nodes(data=True))
+    infos = lineage_info.node_infos(nodes)
+    parent_index = create_parent_index(graph)
+
+    lineage_data: Dict[str, Dict[str, Any]] = {}
+    for idx, (node_id, data) in enumerate(nodes.items()):
+        lineage_data[str(idx)] = {
+            "id": node_id,
+            "desc": data,
+            "parentIds": parent_index[node_id],
+            "info": infos[node_id],
+        }
+    return lineage_data
+
+
+def create_parent_index(graph: "nx.DiGraph") -> Dict[Hashable, List[Hashable]]:
+    """Create an index of the parents (the nodes a node was created from) of all nodes of a module graph at once."""
+
+    return {node_id: list(parents) for node_id, parents in graph.pred.items()}
+
+
+def iter_lineage_nodes(
+    parent_index: Mapping[Hashable, List[Hashable]],
+    root: Hashable,
+    max_depth: Union[int, None] = None,
+) -> Iterator[Tuple[Hashable, int]]:
+    """Iterate over the nodes of a lineage breadth-first, starting from its root (the value the lineage belongs to).
+
+    Every node is only visited once, at its lowest depth.
+
+    Arguments:
+        parent_index: the parents of every node (as created by 'create_parent_index')
+        root: the id of the root node
+        max_depth: the maximum distance of a node to the root, 'None' for no limit
+
+    Returns:
+        tuples of node id and depth (the distance to the root)
+    """
+
+    visited = {root}
+    queue = deque([(root, 0)])
+    while queue:
+        node_id, depth = queue.popleft()
+        yield node_id, depth
+        if max_depth is not None and depth >= max_depth:
+            continue
+        for parent_id in parent_index[node_id]:
+            if parent_id not in visited:
+                visited.add(parent_id)
+                queue.append((parent_id, depth + 1))
+
+
+# the parent index of a lineage, and its nodes (with their depth) in breadth-first order
+LineageOrder = Tuple[Dict[Hashable, List[Hashable]], List[Tuple[Hashable, int]]]
+
+_LINEAGE_ORDERS: "OrderedDict[Tuple[str, Union[int, None]], LineageOrder]" = (
+    OrderedDict()
+)
+
+
+def order_lineage_nodes(
+    graph: "nx.DiGraph",
+    root: Hashable,
+    max_depth: Union[int, None] = None,
+    lineage_id: Union[str, None] = None,
+) -> LineageOrder:
+    """Create the parent index of a module graph, and the breadth-first order of its nodes (see 'iter_lineage_nodes').
+
+    Both take O(N) for a graph with N nodes. If a 'lineage_id' (the id of the value the lineage belongs to) is given,
+    the result is memoised per lineage id and maximum depth, so it is only created once for all pages of a lineage.
+    """
+
+    key = None
+    if lineage_id is not None:
+        key = (lineage_id, max_depth)
+        if key in _LINEAGE_ORDERS:
+            _LINEAGE_ORDERS.move_to_end(key)
+            return _LINEAGE_ORDERS[key]
+
+    parent_index = create_parent_index(graph)
+    ordered = list(iter_lineage_nodes(parent_index, root, max_depth=max_depth))
+
+    if key is not None:
+        _LINEAGE_ORDERS[key] = (parent_index, ordered)
+        while len(_LINEAGE_ORDERS) > MAX_MEMOISED_LINEAGES:
+            _LINEAGE_ORDERS.popitem(last=False)
+    return parent_index, ordered
+
+
+def create_lineage_page(
+    graph: "nx.DiGraph",
+    root: Hashable,
+    lineage_info: LineageInfo,
+    max_depth: Union[int, None] = None,
+    offset: int = 0,
+    page_size: int = DEFAULT_LINEAGE_PAGE_SIZE,
+    lineage_id: Union[str, None] = None,
+) -> Dict[str, Any]:
+    """Create a page of the lineage data of a module graph, with the nodes in breadth-first order from the root.
+
+    Only the nodes of the page get their node information (module type info, value previews) retrieved. Ordering
+    the nodes takes O(N) for the whole graph, unless a 'lineage_id' is given: then the order is memoised (see
+    'order_lineage_nodes'), and every further page only costs O(page_size).
+
+    Returns:
+        a dict with the nodes of the page ('nodes', each with id, node data, depth, the ids of its parents, and the
+        node information), the number of nodes (up to the maximum depth) in the whole lineage ('total_nodes'), and
+        the offset of the next page ('next_offset', 'None' if this is the last page)
+    """
+
+    if root not in graph:
+        raise KiaraProcessingException(
+            f"Can't create lineage page: no node '{root}' in graph."
+        )
+    if offset < 0 or page_size < 1:
+        raise KiaraProcessingException(
+            f"Can't create lineage page: invalid offset ({offset}) or page size ({page_size})."
+        )
+
+    # the node information is only retrieved for the current page
+    parent_index, ordered = order_lineage_nodes(
+        graph, root, max_depth=max_depth, lineage_id=lineage_id
+    )
+    page = ordered[offset : offset + page_size]
+
+    infos = lineage_info.node_infos(
+        {node_id: graph.nodes[node_id] for node_id, _ in page}
+    )
+    nodes = [
+        {
+            "id": node_id,
+            "desc": graph.nodes[node_id],
+            "depth": depth,
+            "parentIds": parent_index[node_id],
+            "info": infos[node_id],
+        }
+        for node_id, depth in page
+    ]
+
+    next_offset = offset + page_size
+    return {
+        "root": root,
+        "nodes": nodes,
+        "offset": offset,
+        "next_offset": next_offset if next_offset < len(ordered) else None,
+        "total_nodes": len(ordered),
+        "max_depth": max_depth,
+    }
@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+
+"""Create the nodes and edges tables of a network from CSV or Parquet edge (and node) list files.
+
+Files are read with the multithreaded, block-wise readers of pyarrow, and node identifiers are dictionary-encoded into
+compact int32 node ids with Arrow compute functions, so no Python objects are created per node or edge.
+"""
+
+import os
+from typing import Dict, Iterable, List, Tuple, Union
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from kiara.exceptions import KiaraProcessingException
+from kiara_plugin.network_analysis.defaults import (
+    LABEL_COLUMN_NAME,
+    NODE_ID_COLUMN_NAME,
+    SOURCE_COLUMN_NAME,
+    TARGET_COLUMN_NAME,
+)
+from kiara_plugin.playground.utils.networks import DEFAULT_WEIGHT_COLUMN_NAME
+
+# the size of the blocks a CSV file is split into, blocks are parsed in parallel
+DEFAULT_CSV_BLOCK_SIZE = 4 * 1024 * 1024
+
+FILE_FORMATS: Dict[str, str] = {
+    ".csv": "csv",
+    ".tsv": "tsv",
+    ".tab": "tsv",
+    ".txt": "csv",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+}
+
+
+def get_file_format(file_name: str) -> str:
+    """Return the format of a network file ('csv', 'tsv' or 'parquet'), based on its file extension."""
+
+    _, extension = os.path.splitext(file_name.lower())
+    if extension not in FILE_FORMATS:
+        raise KiaraProcessingException(
+            f"Can't read file '{file_name}': unsupported file extension '{extension}'. Supported extensions: {', '.join(FILE_FORMATS)}"
+        )
+    return FILE_FORMATS[extension]
+
+
+def read_table_file(
+    path: str,
+    file_format: Union[str, None] = None,
+    block_size: int = DEFAULT_CSV_BLOCK_SIZE,
+    use_threads: bool = True,
+) -> pa.Table:
+    """Read a CSV, TSV or Parquet file into an Arrow table.
+
+    CSV files are split into blocks of 'block_size' bytes, which are parsed (and their column types inferred) in
+    parallel; Parquet files are read column- and row-group-wise in parallel.
+    """
+
+    if file_format is None:
+        file_format = get_file_format(path)
+
+    try:
+        if file_format == "parquet":
+            import pyarrow.parquet as pq
+
+            return pq.read_table(path, use_threads=use_threads)
+
+        import pyarrow.csv as csv
+
+        return csv.read_csv(
+            path,
+            read_options=csv.ReadOptions(
+                use_threads=use_threads, block_size=block_size
+            ),
+            parse_options=csv.ParseOptions(
+                delimiter="\t" if file_format == "tsv" else ","
+            ),
+        )
+    except (pa.ArrowInvalid, OSError) as e:
+        raise KiaraProcessingException(f"Can't read file '{path}': {e}")
+
+
+def _common_type(arrays: Iterable[Union[pa.Array, pa.ChunkedArray]]) -> pa.DataType:
+    """The type to compare node identifiers from different columns in: their own type if they all have the same, otherwise string."""
+
+    types = {array.type for array in arrays}
+    return types.pop() if len(types) == 1 else pa.string()
+
+
+def encode_node_ids(
+    sources: pa.ChunkedArray,
+    targets: pa.ChunkedArray,
+    node_ids: Union[pa.ChunkedArray, None] = None,
+) -> Tuple[pa.Array, pa.Array, pa.Array]:
+    """Dictionary-encode node identifiers into consecutive int32 node ids.
+
+    If the node identifiers of a nodes table are provided, nodes keep the order of that table, and identifiers that only
+    appear in the edges are added at the end (in the order they first appear). Otherwise, nodes are numbered in the
+    order they first appear in the edges (sources first).
+
+    Returns:
+        a tuple '(dictionary, source_ids, target_ids)': the node identifier for each node id, and the node ids of the
+        source and target of each edge
+    """
+
+    columns = [sources, targets] if node_ids is None else [sources, targets, node_ids]
+    value_type = _common_type(columns)
+    sources, targets = sources.cast(value_type), targets.cast(value_type)
+
+    if sources.null_count or targets.null_count:
+        raise KiaraProcessingException(
+            "Can't create network: the source and/or target column contains empty values."
+        )
+
+    endpoints = pa.chunked_array(sources.chunks + targets.chunks, type=value_type)
+    if node_ids is None:
+        dictionary = endpoints.unique()
+    else:
+        node_ids = node_ids.cast(value_type)
+        if node_ids.null_count:
+            raise KiaraProcessingException(
+                "Can't create network: the node id column contains empty values."
+            )
+        if pc.count_distinct(node_ids).as_py() != len(node_ids):
+            counts = pc.value_counts(node_ids)
+            duplicate = counts.filter(pc.greater(counts.field("counts"), 1))[0]
+            raise KiaraProcessingException(
+                f"Can't create network: node id '{duplicate['values'].as_py()}' is used for more than one node."
+            )
+        dictionary = node_ids.combine_chunks()
+        missing = endpoints.filter(
+            pc.invert(pc.is_in(endpoints, value_set=dictionary))
+        ).unique()
+        if len(missing):
+            dictionary = pa.concat_arrays([dictionary, missing])
+
+    if len(dictionary) > 2**31 - 1:
+        raise KiaraProcessingException(
+            f"Can't create network: too many nodes ({len(dictionary)}) for int32 node ids."
+        )
+
+    # 'index_in' is a hash lookup, and returns int32 indexes
+    source_ids = pc.index_in(sources, value_set=dictionary).combine_chunks()
+    target_ids = pc.index_in(targets, value_set=dictionary).combine_chunks()
+    return dictionary, source_ids, target_ids
+
+
+def aggregate_edges(
+    edges_table: pa.Table, weight_column_name: Union[str, None] = None
+) -> pa.Table:
+    """Merge edges with the same source and target into a single edge.
+
+    The merged edge gets the sum of the weights of the merged edges, in the weight column (or, if there is none, the
+    number of merged edges, in a 'weight' column). If no weight column name is provided, a column named 'weight' is used
+    if it exists. For all other attributes, the value of the first merged edge is kept.
+    """
+
+    if (
+        not weight_column_name
+        and DEFAULT_WEIGHT_COLUMN_NAME in edges_table.column_names
+    ):
+        weight_column_name = DEFAULT_WEIGHT_COLUMN_NAME
+
+    keys = [SOURCE_COLUMN_NAME, TARGET_COLUMN_NAME]
+    other_columns = [
+        column_name
+        for column_name in edges_table.column_names
+        if column_name not in keys and column_name != weight_column_name
+    ]
+
+    aggregations: List[Tuple[Union[str, List[str]], str]]
+    if not weight_column_name:
+        weight_column_name = DEFAULT_WEIGHT_COLUMN_NAME
+        aggregations = [([], "count_all")]
+        aggregated_names = {"count_all": weight_column_name}
+    else:
+        if weight_column_name not in edges_table.column_names:
+            raise KiaraProcessingException(
+                f"Can't aggregate edges: no weight column '{weight_column_name}' in edges table. Available columns: {', '.join(edges_table.column_names)}"
+            )
+        aggregations = [(weight_column_name, "sum")]
+        aggregated_names = {f"{weight_column_name}_sum": weight_column_name}
+
+    aggregations.extend((column_name, "first") for column_name in other_columns)
+    aggregated_names.update(
+        {f"{column_name}_first": column_name for column_name in other_columns}
+    )
+
+    # not multithreaded, so groups (and 'first' values) stay in the order of the edges table
+    result = edges_table.group_by(keys, use_threads=False).aggregate(aggregations)
+    result = result.rename_columns(
+        [
+            aggregated_names.get(column_name, column_name)
+            for column_name in result.column_names
+        ]
+    )
+    return result.select(keys + [weight_column_name] + other_columns)
+
+
+def create_network_tables(
+    edges_table: pa.Table,
+    source_column_name: str,
+    target_column_name: str,
+    nodes_table: Union[pa.Table, None] = None,
+    id_column_name: Union[str, None] = None,
+    label_column_name: Union[str, None] = None,
+    aggregate_duplicate_edges: bool = False,
+    weight_column_name: Union[str, None] = None,
+) -> Tuple[pa.Table, pa.Table]:
+    """Create the nodes and edges tables of a network from an edge list (and, optionally, a node list) table.
+
+    All other columns are kept as node or edge attributes. Nodes that are only referenced in the edges table get their
+    identifier as label, and empty attributes.
+
+    Returns:
+        a tuple '(nodes_table, edges_table)', with int32 node ids
+    """
+
+    for table, category in ((edges_table, "edge"), (nodes_table, "node")):
+        if table is None:
+            continue
+        for column_name in table.column_names:
+            if column_name.startswith("_"):
+                raise KiaraProcessingException(
+                    f"Can't create network: {category} column '{column_name}' starts with '_', this is reserved for internal use."
+                )
+
+    if source_column_name == target_column_name:
+        raise KiaraProcessingException(
+            f"Can't create network: source and target column are the same ('{source_column_name}')."
+        )
+    for column_name in (source_column_name, target_column_name):
+        if column_name not in edges_table.column_names:
+            raise KiaraProcessingException(
+                f"Can't create network: no column '{column_name}' in edges table. Available columns: {', '.join(edges_table.column_names)}"
+            )
+
+    node_ids = None
+    if nodes_table is not None:
+        if id_column_name not in nodes_table.column_names:
+            raise KiaraProcessingException(
+                f"Can't create network: no node id column '{id_column_name}' in nodes table. Available columns: {', '.join(nodes_table.column_names)}"
+            )
+        node_ids = nodes_table.column(id_column_name)
+
+    dictionary, source_ids, target_ids = encode_node_ids(
+        edges_table.column(source_column_name),
+        edges_table.column(target_column_name),
+        node_ids,
+    )
+
+    labels = dictionary.cast(pa.string())
+    if nodes_table is None:
+        nodes = pa.table({"id": dictionary})
+    else:
+        assert node_ids is not None
+        if dictionary.type != node_ids.type:
+            # the ids in the edges table have a different type, so all ids are compared as strings
+            nodes_table = nodes_table.set_column(
+                nodes_table.schema.get_field_index(id_column_name),
+                id_column_name,
+                node_ids.cast(dictionary.type),
+            )
+        nodes = nodes_table
+        num_missing = len(dictionary) - nodes_table.num_rows
+        if num_missing:
+            # nodes that only appear in the edges table
+            missing = {
+                column_name: pa.nulls(
+                    num_missing, nodes_table.schema.field(column_name).type
+                )
+                for column_name in nodes_table.column_names
+            }
+            missing[id_column_name] = dictionary[nodes_table.num_rows :]
+            nodes = pa.concat_tables(
+                [nodes_table, pa.table(missing, schema=nodes_table.schema)]
+            )
+        if label_column_name:
+            if label_column_name not in nodes_table.column_names:
+                raise KiaraProcessingException(
+                    f"Can't create network: no label column '{label_column_name}' in nodes table. Available columns: {', '.join(nodes_table.column_names)}"
+                )
+            labels = pc.coalesce(
+                nodes.column(label_column_name).cast(pa.string()), labels
+            )
+
+    nodes = nodes.add_column(0, LABEL_COLUMN_NAME, labels).add_column(
+        0, NODE_ID_COLUMN_NAME, pa.array(np.arange(len(dictionary), dtype=np.int32))
+    )
+
+    edges = (
+        edges_table.drop_columns([source_column_name, target_column_name])
+        .add_column(0, TARGET_COLUMN_NAME, target_ids)
+        .add_column(0, SOURCE_COLUMN_NAME, source_ids)
+    )
+    if aggregate_duplicate_edges:
+        edges = aggregate_edges(edges, weight_column_name)
+
+    return nodes, edges
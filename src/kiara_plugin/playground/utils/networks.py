@@ -0,0 +1,425 @@
+# -*- coding: utf-8 -*-
+
+"""Array-based helpers for the network analysis modules in this package.
+
+The functions in here read the nodes and edges tables of a ``NetworkData`` value directly, and work on integer node
+indexes (the row position of a node in the nodes table), instead of building a networkx graph first.
+"""
+
+from typing import TYPE_CHECKING, Dict, Iterator, Tuple, Union
+
+import numpy as np
+import pyarrow as pa
+
+from kiara.exceptions import KiaraProcessingException
+from kiara_plugin.network_analysis.defaults import (
+    LABEL_COLUMN_NAME,
+    NODE_ID_COLUMN_NAME,
+    SOURCE_COLUMN_NAME,
+    TARGET_COLUMN_NAME,
+)
+
+if TYPE_CHECKING:
+    from scipy.sparse import csr_matrix
+
+    from kiara_plugin.network_analysis.models import NetworkData
+
+DEFAULT_WEIGHT_COLUMN_NAME = "weight"
+RANK_METHODS = ("competition", "dense", "ordinal")
+# how the weights of parallel edges are combined: summed up (for strengths), or the smallest one (for distances)
+PARALLEL_EDGE_REDUCTIONS = ("sum", "min")
+# the number of edges to read at once when streaming through an edges table
+DEFAULT_EDGE_BATCH_SIZE = 65536
+
+
+class NetworkArrays(object):
+    """The edge list of a network, encoded as integer node indexes that line up with the rows of its nodes table.
+
+    Arguments:
+        num_nodes: the number of nodes in the network
+        sources: the node index of the source of each edge
+        targets: the node index of the target of each edge
+        weights: the weight of each edge, or 'None' if every edge has a weight of 1
+        labels: the node labels, in node index order
+        node_ids: the node ids, in node index order, or 'None' if they are the node indexes
+    """
+
+    def __init__(
+        self,
+        num_nodes: int,
+        sources: np.ndarray,
+        targets: np.ndarray,
+        weights: Union[np.ndarray, None] = None,
+        labels: Union[pa.Array, None] = None,
+        node_ids: Union[pa.Array, None] = None,
+    ):
+
+        self.num_nodes: int = num_nodes
+        self.sources: np.ndarray = sources
+        self.targets: np.ndarray = targets
+        self.weights: Union[np.ndarray, None] = weights
+        self.labels: Union[pa.Array, None] = labels
+        self._node_ids: Union[pa.Array, None] = node_ids
+
+    @classmethod
+    def from_network_data(
+        cls,
+        network_data: "NetworkData",
+        weight_column_name: Union[str, None] = None,
+        weighted: bool = True,
+    ) -> "NetworkArrays":
+        """Read the edges table of a network into integer arrays.
+
+        If no weight column name is provided, a column named 'weight' is used if it exists, otherwise every edge
+        gets a weight of 1 (indicated by 'weights' being 'None'). If 'weighted' is 'False', no weights are read at all.
+        """
+
+        nodes_table: pa.Table = network_data.nodes.arrow_table
+        edges_table: pa.Table = network_data.edges.arrow_table
+
+        sources = node_indexes(
+            nodes_table, edges_table.column(SOURCE_COLUMN_NAME).to_numpy()
+        )
+        targets = node_indexes(
+            nodes_table, edges_table.column(TARGET_COLUMN_NAME).to_numpy()
+        )
+        num_nodes = nodes_table.num_rows
+
+        if not weighted:
+            weight_column_name = None
+        elif not weight_column_name:
+            if DEFAULT_WEIGHT_COLUMN_NAME in edges_table.column_names:
+                weight_column_name = DEFAULT_WEIGHT_COLUMN_NAME
+            else:
+                weight_column_name = None
+
+        weights = None
+        if weight_column_name is not None:
+            if weight_column_name not in edges_table.column_names:
+                raise KiaraProcessingException(
+                    f"Can't read edge weights: no column '{weight_column_name}' in edges table. Available columns: {', '.join(edges_table.column_names)}"
+                )
+            weight_column = edges_table.column(weight_column_name)
+            try:
+                weights = weight_column.cast(pa.float64()).fill_null(1.0).to_numpy()
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                raise KiaraProcessingException(
+                    f"Can't read edge weights: column '{weight_column_name}' is of type '{weight_column.type}', not numeric."
+                )
+
+        return cls(
+            num_nodes=num_nodes,
+            sources=sources.astype(np.int64, copy=False),
+            targets=targets.astype(np.int64, copy=False),
+            weights=weights,
+            labels=nodes_table.column(LABEL_COLUMN_NAME).combine_chunks(),
+            node_ids=nodes_table.column(NODE_ID_COLUMN_NAME).combine_chunks(),
+        )
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.sources)
+
+    @property
+    def node_ids(self) -> pa.Array:
+        if self._node_ids is None:
+            return pa.array(np.arange(self.num_nodes, dtype=np.int64))
+        return self._node_ids
+
+    def edge_weights(self) -> np.ndarray:
+        """Return the weight of every edge, using 1 if the network has no weights."""
+
+        if self.weights is None:
+            return np.ones(self.num_edges, dtype=np.float64)
+        return self.weights
+
+    def aggregate_parallel_edges(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Sum up the weights of parallel (directed) edges.
+
+        Returns:
+            a tuple with the group index of every edge, and the summed weight of every group
+        """
+
+        keys = self.sources * self.num_nodes + self.targets
+        _, inverse = np.unique(keys, return_inverse=True)
+        summed = np.bincount(inverse, weights=self.edge_weights())
+        return inverse, summed
+
+    def to_csr(
+        self,
+        directed: bool = True,
+        weighted: bool = True,
+        weight_as_distance: bool = False,
+        parallel_edges: str = "sum",
+    ) -> "csr_matrix":
+        """Create a sparse adjacency matrix of the simple graph for this network.
+
+        Self-loops are removed, and parallel edges are merged into one (for an undirected graph, edges in both
+        directions between two nodes count as parallel). Their weights are summed up, which is what strengths need;
+        if the weights are distances, the shortest edge must be used instead ('parallel_edges="min"'), otherwise two
+        parallel edges of length 1 would become one of length 2.
+
+        Arguments:
+            directed: whether to create the adjacency matrix of a directed or an undirected graph
+            weighted: whether to use the (combined) edge weights as values, or 1 for every edge
+            weight_as_distance: whether to invert the (combined) weights, so that strong connections become short ones
+            parallel_edges: how to combine the weights of parallel edges: 'sum' them up, or use the 'min' one
+        """
+
+        from scipy.sparse import coo_matrix
+
+        if parallel_edges not in PARALLEL_EDGE_REDUCTIONS:
+            raise KiaraProcessingException(
+                f"Invalid reduction for parallel edges '{parallel_edges}', allowed: {', '.join(PARALLEL_EDGE_REDUCTIONS)}."
+            )
+
+        n = self.num_nodes
+        mask = self.sources != self.targets
+        sources = self.sources[mask]
+        targets = self.targets[mask]
+        values = self.edge_weights()[mask] if weighted else np.ones(len(sources))
+
+        if not directed:
+            sources, targets = np.minimum(sources, targets), np.maximum(
+                sources, targets
+            )
+        if parallel_edges == "min":
+            # the coo matrix would sum up duplicates, so they are reduced beforehand
+            keys, inverse = np.unique(sources * n + targets, return_inverse=True)
+            shortest = np.full(len(keys), np.inf)
+            np.minimum.at(shortest, inverse, values)
+            sources, targets, values = keys // n, keys % n, shortest
+
+        matrix = coo_matrix((values, (sources, targets)), shape=(n, n)).tocsr()
+        matrix.sum_duplicates()
+        if not directed:
+            matrix = (matrix + matrix.T).tocsr()
+
+        if not weighted:
+            matrix.data[:] = 1.0
+        elif weight_as_distance:
+            if np.any(matrix.data <= 0):
+                raise KiaraProcessingException(
+                    "Can't use edge weights as strengths: all (summed) weights must be positive."
+                )
+            matrix.data = 1.0 / matrix.data
+
+        matrix.sort_indices()
+        return matrix
+
+
+def node_indexes(nodes_table: pa.Table, node_ids: np.ndarray) -> np.ndarray:
+    """Translate node ids into node indexes (row positions in the nodes table)."""
+
+    all_node_ids = nodes_table.column(NODE_ID_COLUMN_NAME).to_numpy()
+    if np.array_equal(all_node_ids, np.arange(len(all_node_ids))):
+        return np.asarray(node_ids)
+
+    order = np.argsort(all_node_ids, kind="stable")
+    return order[np.searchsorted(all_node_ids, node_ids, sorter=order)]
+
+
+def iter_edge_batches(
+    network_data: "NetworkData", batch_size: int = DEFAULT_EDGE_BATCH_SIZE
+) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """Stream through the edges table of a network, and yield the source and target node indexes of each batch.
+
+    Only one batch of edges is held in memory (as numpy arrays) at a time.
+    """
+
+    nodes_table: pa.Table = network_data.nodes.arrow_table
+    edges_table: pa.Table = network_data.edges.arrow_table.select(
+        [SOURCE_COLUMN_NAME, TARGET_COLUMN_NAME]
+    )
+
+    for batch in edges_table.to_batches(max_chunksize=batch_size):
+        yield (
+            node_indexes(nodes_table, batch.column(0).to_numpy()).astype(
+                np.int64, copy=False
+            ),
+            node_indexes(nodes_table, batch.column(1).to_numpy()).astype(
+                np.int64, copy=False
+            ),
+        )
+
+
+def augment_network_data(
+    network_data: "NetworkData",
+    node_columns: Union[Dict[str, Union[np.ndarray, pa.Array]], None] = None,
+    edge_columns: Union[Dict[str, Union[np.ndarray, pa.Array]], None] = None,
+) -> "NetworkData":
+    """Add attribute columns to the nodes and/or edges table of a network.
+
+    All existing columns are re-used as they are, so nothing but the new columns is copied or re-computed. Columns
+    must be aligned with the rows of their table. An existing column with the same name is replaced (for example
+    when a module is run on its own output again).
+    """
+
+    from kiara_plugin.network_analysis.models import NetworkData
+
+    def set_columns(
+        table: pa.Table, columns: Union[Dict[str, Union[np.ndarray, pa.Array]], None]
+    ) -> pa.Table:
+
+        for column_name, values in (columns or {}).items():
+            column = (
+                values
+                if isinstance(values, (pa.Array, pa.ChunkedArray))
+                else pa.array(values)
+            )
+            if len(column) != table.num_rows:
+                raise KiaraProcessingException(
+                    f"Can't add column '{column_name}': it has {len(column)} rows, the table has {table.num_rows}."
+                )
+            idx = table.schema.get_field_index(column_name)
+            if idx == -1:
+                table = table.append_column(column_name, column)
+            else:
+                table = table.set_column(idx, column_name, column)
+        return table
+
+    return NetworkData.create_network_data(
+        nodes_table=set_columns(network_data.nodes.arrow_table, node_columns),
+        edges_table=set_columns(network_data.edges.arrow_table, edge_columns),
+        augment_tables=False,
+    )
+
+
+def read_node_column(
+    network_data: Union["NetworkData", None], column_name: str, num_nodes: int
+) -> Union[np.ndarray, None]:
+    """Read a numeric node attribute column, in node index (row) order.
+
+    Returns 'None' if there is no network, no such column, or the network has a different number of nodes.
+    """
+
+    if network_data is None or network_data.num_nodes != num_nodes:
+        return None
+
+    nodes_table: pa.Table = network_data.nodes.arrow_table
+    if column_name not in nodes_table.column_names:
+        return None
+
+    return nodes_table.column(column_name).cast(pa.float64()).fill_null(0.0).to_numpy()
+
+
+def calculate_degree(arrays: NetworkArrays) -> np.ndarray:
+    """Calculate the number of distinct neighbours of each node.
+
+    Edge direction and parallel edges are ignored, as are self-loops.
+    """
+
+    n = arrays.num_nodes
+    mask = arrays.sources != arrays.targets
+    low = np.minimum(arrays.sources[mask], arrays.targets[mask])
+    high = np.maximum(arrays.sources[mask], arrays.targets[mask])
+
+    pairs = np.unique(low * n + high)
+    return np.bincount(pairs // n, minlength=n) + np.bincount(pairs % n, minlength=n)
+
+
+def calculate_weighted_degree(arrays: NetworkArrays) -> np.ndarray:
+    """Calculate the sum of the weights of all edges attached to each node.
+
+    Parallel edges add up, and a self-loop counts for both its ends.
+    """
+
+    n = arrays.num_nodes
+    if arrays.weights is None:
+        return np.bincount(arrays.sources, minlength=n) + np.bincount(
+            arrays.targets, minlength=n
+        )
+
+    return np.bincount(
+        arrays.sources, weights=arrays.weights, minlength=n
+    ) + np.bincount(arrays.targets, weights=arrays.weights, minlength=n)
+
+
+def rank_scores(
+    scores: np.ndarray, method: str = "competition", top_k: Union[int, None] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Order scores from highest to lowest, and assign a rank to each of them.
+
+    Tied scores are ordered by node index, and ranked according to 'method':
+
+    - 'competition': equal scores share a rank, and the next rank skips accordingly (1224)
+    - 'dense': equal scores share a rank, and the next rank follows directly (1223)
+    - 'ordinal': every node gets a distinct rank (1234)
+
+    If 'top_k' is set, only the k highest scores are selected (via partial selection, without sorting all scores).
+    Their ranks are the same as they would be in the full ranking.
+
+    Returns:
+        a tuple with the node indexes in descending score order, and the rank of each of those nodes
+    """
+
+    if method not in RANK_METHODS:
+        raise KiaraProcessingException(
+            f"Invalid rank method '{method}', allowed: {', '.join(RANK_METHODS)}."
+        )
+
+    negated = -np.asarray(scores)
+    if top_k is not None and top_k < len(negated):
+        if top_k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        # everything above the k-th score, and as many of the nodes tied with it as fit, in node index order
+        threshold = np.partition(negated, top_k - 1)[top_k - 1]
+        above = np.flatnonzero(negated < threshold)
+        tied = np.flatnonzero(negated == threshold)[: top_k - len(above)]
+        selected = np.concatenate([above, tied])
+        order = selected[np.argsort(negated[selected], kind="stable")]
+    else:
+        order = np.argsort(negated, kind="stable")
+
+    num_ranked = len(order)
+    if method == "ordinal" or num_ranked == 0:
+        return order, np.arange(1, num_ranked + 1)
+
+    sorted_scores = negated[order]
+    first_of_group = np.empty(num_ranked, dtype=bool)
+    first_of_group[0] = True
+    first_of_group[1:] = sorted_scores[1:] != sorted_scores[:-1]
+
+    if method == "dense":
+        return order, np.cumsum(first_of_group)
+
+    positions = np.arange(1, num_ranked + 1)
+    return order, np.maximum.accumulate(np.where(first_of_group, positions, 0))
+
+
+def rank_nodes(scores: np.ndarray, method: str = "competition") -> np.ndarray:
+    """Return the rank of every node, in node index order."""
+
+    order, ranks = rank_scores(scores, method=method)
+    node_ranks = np.empty(len(order), dtype=np.int64)
+    node_ranks[order] = ranks
+    return node_ranks
+
+
+def create_ranking_table(
+    node_ids: pa.Array,
+    columns: Dict[str, np.ndarray],
+    method: str = "competition",
+    top_k: Union[int, None] = None,
+    labels: Union[pa.Array, None] = None,
+) -> pa.Table:
+    """Create a ranking table, ordered by the first of the provided columns.
+
+    The table contains a 'Rank' and a 'Node' (id) column, so it can be joined with the nodes table, then a 'Label'
+    column (if labels are provided), followed by all the provided columns. All columns must be aligned by node
+    index, they are re-ordered with the same index array, so no join is necessary.
+    """
+
+    ranked_by = next(iter(columns.values()))
+    order, ranks = rank_scores(ranked_by, method=method, top_k=top_k)
+
+    result = {
+        "Rank": pa.array(ranks, type=pa.int64()),
+        "Node": node_ids.take(pa.array(order)),
+    }
+    if labels is not None:
+        result["Label"] = labels.take(pa.array(order))
+    for column_name, values in columns.items():
+        result[column_name] = pa.array(values[order])
+
+    return pa.Table.from_pydict(result)
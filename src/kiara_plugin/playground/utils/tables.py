@@ -0,0 +1,463 @@
+# -*- coding: utf-8 -*-
+
+"""Arrow-based helpers for the table (corpus) modules in this package.
+
+The functions in here work on the Arrow table of a 'table' value directly (with Arrow compute functions), instead of
+converting it to pandas first, so the (potentially big) text columns are never copied.
+"""
+
+import re
+from typing import Any, Dict, Iterable, List, Sequence, Tuple, Union
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from kiara.exceptions import KiaraProcessingException
+
+# the publication reference and date in LCCN style file names, like 'sn86069873_1900-01-05_ed-1_seq-1_ocr.txt'
+FILE_NAME_METADATA_PATTERN = r"(?P<publication>\w+\d+)_(?P<date>\d{4}-\d{2}-\d{2})_"
+# the name of the regex group that contains the date, in date extraction patterns
+DATE_GROUP_NAME = "date"
+# the default format(s) extracted date strings are parsed with
+DEFAULT_DATE_FORMATS = ("%Y-%m-%d",)
+# the maximum number of invalid values to list in an error message
+MAX_REPORTED_VALUES = 10
+# what to do with values that are not in a mapping: keep them as they are, set them to null, or raise an error
+UNMAPPED_VALUE_POLICIES = ("keep", "null", "error")
+# the number of rows to process at once when streaming through a table
+DEFAULT_BATCH_SIZE = 65536
+# the time granularities of the (date x publication) document counts for the dashboard visualizations
+TIME_GRANULARITIES = ("day", "month", "year")
+# what is considered a valid column name in a (generated) SQL query
+COLUMN_IDENTIFIER_PATTERN = r"^[A-Za-z_][A-Za-z0-9_]*$"
+
+
+def get_column(table: pa.Table, column_name: str) -> pa.ChunkedArray:
+    """Return a column of a table, or raise an error that lists the available columns."""
+
+    if column_name not in table.column_names:
+        raise KiaraProcessingException(
+            f"Can't process table: no column '{column_name}'. Available columns: {', '.join(table.column_names)}"
+        )
+    return table.column(column_name)
+
+
+def set_column(
+    table: pa.Table, column_name: str, values: Union[pa.Array, pa.ChunkedArray]
+) -> pa.Table:
+    """Append a column to a table, or replace the existing column with the same name.
+
+    The other columns are re-used as they are, nothing is copied.
+    """
+
+    if len(values) != table.num_rows:
+        raise KiaraProcessingException(
+            f"Can't add column '{column_name}': it has {len(values)} rows, the table has {table.num_rows}."
+        )
+    idx = table.schema.get_field_index(column_name)
+    if idx == -1:
+        return table.append_column(column_name, values)
+    return table.set_column(idx, column_name, values)
+
+
+def report_invalid_values(
+    values: Union[pa.Array, pa.ChunkedArray], invalid: Union[pa.Array, pa.ChunkedArray]
+) -> List[str]:
+    """Return (the string representations of) the first invalid values, for error messages."""
+
+    return [
+        repr(value)
+        for value in values.filter(invalid).slice(0, MAX_REPORTED_VALUES).to_pylist()
+    ]
+
+
+def ensure_string_array(
+    values: Union[pa.Array, pa.ChunkedArray],
+) -> Union[pa.Array, pa.ChunkedArray]:
+    """Cast an array to strings, unless it already contains strings."""
+
+    if pa.types.is_string(values.type) or pa.types.is_large_string(values.type):
+        return values
+    return values.cast(pa.string())
+
+
+def parse_dates(
+    date_strings: Union[pa.Array, pa.ChunkedArray],
+    formats: Sequence[str] = DEFAULT_DATE_FORMATS,
+) -> Union[pa.Array, pa.ChunkedArray]:
+    """Parse strings into timestamps, trying a list of formats in order.
+
+    Every format is only applied to the strings that none of the previous formats could parse. Strings that don't
+    match any format result in nulls.
+    """
+
+    if not formats:
+        raise KiaraProcessingException("Can't parse dates: no date format provided.")
+
+    dates = None
+    for date_format in formats:
+        parsed = pc.strptime(
+            date_strings, format=date_format, unit="ns", error_is_null=True
+        )
+        dates = parsed if dates is None else pc.coalesce(dates, parsed)
+    return dates
+
+
+def extract_dates(
+    values: Union[pa.Array, pa.ChunkedArray],
+    patterns: Union[Sequence[str], None] = None,
+    formats: Sequence[str] = DEFAULT_DATE_FORMATS,
+    min_index: Union[int, None] = None,
+    max_index: Union[int, None] = None,
+    force_non_null: bool = False,
+) -> Tuple[Union[pa.Array, pa.ChunkedArray], Union[pa.Array, pa.ChunkedArray]]:
+    """Extract dates from strings (like file names), with Arrow compute functions instead of a parser call per row.
+
+    The date string is either extracted with regular expressions, which need a group named 'date' (for example
+    '_(?P<date>\\d{4}-\\d{2}-\\d{2})_'; patterns are tried in order, the first one that results in a valid date is
+    used), or, if no patterns are provided, by cutting the strings at 'min_index' and 'max_index' (like the
+    'parse.date_array' module of the tabular plugin). The extracted strings are then parsed with the first matching
+    date format.
+
+    Arguments:
+        values: the strings to extract the dates from
+        patterns: regular expressions with a 'date' group, to extract the date strings with
+        formats: the formats to parse the date strings with, in 'strptime' syntax
+        min_index: the start of the date string, if no patterns are provided
+        max_index: the end of the date string, if no patterns are provided
+        force_non_null: whether to raise an error if a date can't be extracted from any of the strings
+
+    Returns:
+        a tuple '(dates, missing)', the dates as timestamps (null where no date could be extracted), and a boolean mask
+        of the missing dates
+    """
+
+    values = ensure_string_array(values)
+
+    if patterns:
+        dates = None
+        for pattern in patterns:
+            if f"(?P<{DATE_GROUP_NAME}>" not in pattern:
+                raise KiaraProcessingException(
+                    f"Invalid date pattern '{pattern}': must contain a group named '{DATE_GROUP_NAME}', like '(?P<{DATE_GROUP_NAME}>...)'."
+                )
+            # strings that don't match result in null structs, their fields are empty strings, which don't parse
+            matches = pc.extract_regex(values, pattern=pattern)
+            parsed = parse_dates(pc.struct_field(matches, DATE_GROUP_NAME), formats)
+            dates = parsed if dates is None else pc.coalesce(dates, parsed)
+    else:
+        date_strings = pc.utf8_slice_codeunits(
+            values, start=min_index or 0, stop=max_index
+        )
+        dates = parse_dates(date_strings, formats)
+
+    missing = pc.is_null(dates)
+    if force_non_null:
+        num_missing = pc.sum(missing).as_py() or 0
+        if num_missing:
+            examples = report_invalid_values(values, missing)
+            raise KiaraProcessingException(
+                f"Can't extract dates, no valid date in {num_missing} value(s): {', '.join(examples)}{', ...' if num_missing > len(examples) else ''}"
+            )
+
+    return dates, missing
+
+
+def extract_file_name_metadata(
+    file_names: Union[pa.Array, pa.ChunkedArray],
+    dates: Union[pa.Array, pa.ChunkedArray, None] = None,
+) -> Tuple[Union[pa.Array, pa.ChunkedArray], Union[pa.Array, pa.ChunkedArray]]:
+    """Extract the publication reference and date from LCCN style file names, in a single pass.
+
+    If the dates were already extracted (with 'extract_dates'), they are re-used instead of being parsed again.
+
+    Raises an error that reports all invalid file names (without a publication reference and a valid date) at once.
+
+    Returns:
+        a tuple '(publications, dates)', the dates as timestamps
+    """
+
+    file_names = ensure_string_array(file_names)
+
+    # invalid file names result in null structs, their fields are empty strings, which don't parse as dates either
+    metadata = pc.extract_regex(file_names, pattern=FILE_NAME_METADATA_PATTERN)
+    publications = pc.struct_field(metadata, "publication")
+    if dates is None:
+        dates = parse_dates(pc.struct_field(metadata, DATE_GROUP_NAME))
+    elif len(dates) != len(file_names):
+        raise KiaraProcessingException(
+            f"Can't process corpus: {len(dates)} dates for {len(file_names)} file names."
+        )
+
+    invalid = pc.or_(pc.is_null(dates), pc.is_null(metadata))
+    num_invalid = pc.sum(invalid).as_py() or 0
+    if num_invalid:
+        examples = report_invalid_values(file_names, invalid)
+        raise KiaraProcessingException(
+            f"Can't process corpus, {num_invalid} file name(s) with invalid format (expected: '<publication ref>_<yyyy-mm-dd>_...'): {', '.join(examples)}{', ...' if num_invalid > len(examples) else ''}"
+        )
+
+    return publications, dates
+
+
+def _mapping_array(items: Sequence[Any]) -> pa.Array:
+    """Create an array for the keys or values of a mapping, falling back to strings if they have mixed types."""
+
+    try:
+        return pa.array(items)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return pa.array(
+            [None if item is None else str(item) for item in items], pa.string()
+        )
+
+
+def map_values(
+    column: Union[pa.Array, pa.ChunkedArray],
+    keys: Sequence[Any],
+    values: Sequence[Any],
+    unmapped: str = "keep",
+) -> pa.ChunkedArray:
+    """Replace the values of a column according to a mapping (like pandas 'Series.replace' with two lists).
+
+    The column is dictionary-encoded first, so the mapping only needs to be looked up once per distinct value (with a
+    single hash lookup against the keys), the result is then expanded with the dictionary indices. If a key is
+    listed more than once, the last value is used. Keys or values of mixed types are converted to strings.
+
+    Arguments:
+        column: the column to map
+        keys: the values to replace
+        values: the values to replace them with
+        unmapped: what to do with values that are not in 'keys': 'keep' them, set them to 'null', or raise an 'error'
+    """
+
+    if unmapped not in UNMAPPED_VALUE_POLICIES:
+        raise KiaraProcessingException(
+            f"Invalid policy for unmapped values '{unmapped}', must be one of: {', '.join(UNMAPPED_VALUE_POLICIES)}"
+        )
+    if len(keys) != len(values):
+        raise KiaraProcessingException(
+            f"Can't map column: the mapping has {len(keys)} keys, but {len(values)} values."
+        )
+
+    if isinstance(column, pa.Array):
+        column = pa.chunked_array([column])
+    if not pa.types.is_dictionary(column.type):
+        column = column.dictionary_encode()
+    # all chunks share the same dictionary afterwards, so the mapping is applied only once
+    column = column.unify_dictionaries()
+    if column.num_chunks:
+        dictionary = column.chunk(0).dictionary
+    else:
+        dictionary = pa.array([], column.type.value_type)
+
+    # reversed, so the last value of a duplicate key is found first
+    key_array = _mapping_array(list(keys)[::-1])
+    value_array = _mapping_array(list(values)[::-1])
+    if key_array.type != dictionary.type:
+        try:
+            key_array = key_array.cast(dictionary.type)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            key_array = key_array.cast(pa.string())
+            dictionary = dictionary.cast(pa.string())
+
+    positions = pc.index_in(dictionary, value_set=key_array)
+    mapped = value_array.take(positions)
+
+    is_unmapped = pc.is_null(positions)
+    if unmapped == "error" and pc.any(is_unmapped).as_py():
+        num_unmapped = pc.sum(is_unmapped).as_py()
+        examples = report_invalid_values(dictionary, is_unmapped)
+        raise KiaraProcessingException(
+            f"Can't map column, {num_unmapped} value(s) not in mapping: {', '.join(examples)}{', ...' if num_unmapped > len(examples) else ''}"
+        )
+    if unmapped == "keep" and pc.any(is_unmapped).as_py():
+        if dictionary.type != mapped.type:
+            try:
+                dictionary = dictionary.cast(mapped.type)
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                mapped = mapped.cast(pa.string())
+                dictionary = dictionary.cast(pa.string())
+        mapped = pc.if_else(is_unmapped, dictionary, mapped)
+
+    return pa.chunked_array(
+        [mapped.take(chunk.indices) for chunk in column.chunks], type=mapped.type
+    )
+
+
+class ReservoirSample(object):
+    """A uniform random sample of (at most) 'n' rows of a stream of record batches, optionally per stratum.
+
+    Every row gets a random priority, and the rows with the 'n' lowest priorities (per stratum) are kept, which is a
+    uniform sample without replacement. Batches are processed vectorised, and only the row numbers (and priorities) of
+    the current sample are kept in memory, never the rows themselves.
+
+    Arguments:
+        n: the (maximum) number of rows to sample (per stratum, if strata are used)
+        seed: the random seed, the sample only depends on it, not on how the rows are split into batches
+    """
+
+    def __init__(self, n: int, seed: Union[int, None] = None):
+
+        if n < 0:
+            raise KiaraProcessingException(
+                f"Invalid sample size '{n}': must be a positive number."
+            )
+        self.n: int = n
+        self.num_rows: int = 0
+        self._rng = np.random.default_rng(seed)
+        self._rows = np.empty(0, dtype=np.int64)
+        self._priorities = np.empty(0, dtype=np.float64)
+        self._strata = np.empty(0, dtype=np.int64)
+        self._stratum_codes: Dict[Any, int] = {}
+
+    def _encode_strata(self, strata: Union[pa.Array, pa.ChunkedArray]) -> np.ndarray:
+        """Translate the stratum values of a batch into integer codes that are stable across batches."""
+
+        encoded = pa.chunked_array([strata]) if isinstance(strata, pa.Array) else strata
+        encoded = encoded.dictionary_encode().combine_chunks()
+        codes = np.empty(len(encoded.dictionary) + 1, dtype=np.int64)
+        for i, value in enumerate(encoded.dictionary.to_pylist()):
+            codes[i] = self._stratum_codes.setdefault(value, len(self._stratum_codes))
+        # nulls are a stratum of their own
+        codes[-1] = self._stratum_codes.setdefault(None, len(self._stratum_codes))
+        indices = encoded.indices.fill_null(len(encoded.dictionary))
+        return codes[indices.to_numpy()]
+
+    def add_batch(
+        self, num_rows: int, strata: Union[pa.Array, pa.ChunkedArray, None] = None
+    ) -> None:
+        """Add the next 'num_rows' rows to the stream, with their stratum values (if strata are used)."""
+
+        rows = np.arange(self.num_rows, self.num_rows + num_rows, dtype=np.int64)
+        priorities = self._rng.random(num_rows)
+        self.num_rows += num_rows
+        if strata is None:
+            stratum_codes = np.zeros(num_rows, dtype=np.int64)
+        else:
+            stratum_codes = self._encode_strata(strata)
+
+        rows = np.concatenate([self._rows, rows])
+        priorities = np.concatenate([self._priorities, priorities])
+        stratum_codes = np.concatenate([self._strata, stratum_codes])
+
+        # keep the rows with the lowest priorities in each stratum
+        order = np.lexsort((priorities, stratum_codes))
+        sorted_strata = stratum_codes[order]
+        group_starts = np.flatnonzero(
+            np.concatenate([[True], sorted_strata[1:] != sorted_strata[:-1]])
+        )
+        group_sizes = np.diff(np.append(group_starts, len(order)))
+        rank = np.arange(len(order)) - np.repeat(group_starts, group_sizes)
+        keep = order[rank < self.n]
+
+        self._rows = rows[keep]
+        self._priorities = priorities[keep]
+        self._strata = stratum_codes[keep]
+
+    @property
+    def rows(self) -> np.ndarray:
+        """The numbers of the sampled rows, in ascending order."""
+
+        return np.sort(self._rows)
+
+
+def sample_table(
+    table: pa.Table,
+    n: int,
+    seed: Union[int, None] = None,
+    stratify_by: Union[str, None] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> pa.Table:
+    """Sample (at most) 'n' random rows of a table, or 'n' rows for every distinct value of a 'stratify_by' column.
+
+    The table is streamed through in record batches, only the sampled rows are copied at the end (in their original
+    order). Date and timestamp columns are stratified by year.
+    """
+
+    strata_column = None
+    if stratify_by:
+        strata_column = get_column(table, stratify_by)
+        if pa.types.is_date(strata_column.type) or pa.types.is_timestamp(
+            strata_column.type
+        ):
+            strata_column = pc.year(strata_column)
+        # only the stratum column needs to be read
+        batches: Iterable[pa.RecordBatch] = pa.table(
+            {stratify_by: strata_column}
+        ).to_batches(max_chunksize=batch_size)
+    else:
+        batches = table.select([]).to_batches(max_chunksize=batch_size)
+
+    sample = ReservoirSample(n, seed=seed)
+    for batch in batches:
+        sample.add_batch(
+            batch.num_rows, batch.column(0) if strata_column is not None else None
+        )
+
+    return table.take(pa.array(sample.rows))
+
+
+def validate_column_identifier(column_name: str) -> str:
+    """Make sure a column name can be used as identifier in a SQL query as is, and return it."""
+
+    if not isinstance(column_name, str) or not re.match(
+        COLUMN_IDENTIFIER_PATTERN, column_name
+    ):
+        raise KiaraProcessingException(
+            f"Invalid column name '{column_name}': only letters, digits and underscores are allowed, and it must not start with a digit."
+        )
+    return column_name
+
+
+def count_by_day(
+    table: pa.Table, date_column_name: str = "date", column_name: str = "publication"
+) -> pa.Table:
+    """Count the rows of a table per day and value of a column (usually: the documents of a corpus per publication).
+
+    This is the finest granularity of the dashboard visualizations, the counts for all other granularities can be
+    computed from the result (with 'rollup_counts'), without going through the whole table again.
+
+    Returns:
+        a table with the columns 'date' (date32), 'publication_name' and 'count', sorted by date and publication
+    """
+
+    dates = get_column(table, date_column_name)
+    if pa.types.is_timestamp(dates.type):
+        dates = dates.cast(pa.date32())
+    elif not pa.types.is_date(dates.type):
+        raise KiaraProcessingException(
+            f"Can't count documents: column '{date_column_name}' has type '{dates.type}', not a date or timestamp."
+        )
+
+    counts = (
+        pa.table({"date": dates, "publication_name": get_column(table, column_name)})
+        .group_by(["date", "publication_name"])
+        .aggregate([([], "count_all")])
+        .rename_columns(["date", "publication_name", "count"])
+    )
+    return counts.sort_by([("date", "ascending"), ("publication_name", "ascending")])
+
+
+def rollup_counts(day_counts: pa.Table, granularity: str) -> pa.Table:
+    """Sum up the per-day counts (created by 'count_by_day') per month or year.
+
+    The 'date' of a month or year is its first day.
+    """
+
+    if granularity not in TIME_GRANULARITIES:
+        raise KiaraProcessingException(
+            f"Invalid time granularity '{granularity}', must be one of: {', '.join(TIME_GRANULARITIES)}"
+        )
+    if granularity == "day":
+        return day_counts
+
+    counts = (
+        day_counts.set_column(
+            0, "date", pc.floor_temporal(day_counts.column("date"), unit=granularity)
+        )
+        .group_by(["date", "publication_name"])
+        .aggregate([("count", "sum")])
+        .rename_columns(["date", "publication_name", "count"])
+    )
+    return counts.sort_by([("date", "ascending"), ("publication_name", "ascending")])
@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for the shortest-path based centrality helpers in `kiara_plugin.playground.utils.centrality`."""
+
+import networkx as nx
+import numpy as np
+import pytest
+
+from kiara_plugin.playground.utils import centrality
+from kiara_plugin.playground.utils.networks import NetworkArrays
+
+
+def create_arrays(seed: int = 3) -> NetworkArrays:
+
+    rng = np.random.default_rng(seed)
+    num_nodes = 60
+    sources = rng.integers(0, num_nodes, 240)
+    targets = rng.integers(0, num_nodes, 240)
+    weights = rng.integers(1, 6, 240).astype(np.float64)
+    return NetworkArrays(
+        num_nodes=num_nodes, sources=sources, targets=targets, weights=weights
+    )
+
+
+def create_digraph(arrays: NetworkArrays, weight_as_distance: bool) -> nx.DiGraph:
+
+    matrix = arrays.to_csr(
+        directed=True, weighted=True, weight_as_distance=weight_as_distance
+    )
+    graph = nx.DiGraph()
+    graph.add_nodes_from(range(arrays.num_nodes))
+    coo = matrix.tocoo()
+    for u, v, w in zip(coo.row, coo.col, coo.data):
+        graph.add_edge(int(u), int(v), weight=float(w))
+    return graph
+
+
+def test_betweenness_matches_networkx():
+
+    arrays = create_arrays()
+    graph = create_digraph(arrays, weight_as_distance=False)
+
+    scores, error = centrality.calculate_betweenness(
+        arrays.to_csr(directed=True, weighted=False), processes=1
+    )
+    expected = nx.betweenness_centrality(graph)
+    assert error is None
+    assert np.allclose(scores, [expected[n] for n in range(arrays.num_nodes)])
+
+
+def test_weighted_betweenness_matches_networkx():
+
+    arrays = create_arrays()
+    graph = create_digraph(arrays, weight_as_distance=True)
+
+    scores, _ = centrality.calculate_betweenness(
+        arrays.to_csr(directed=True, weighted=True, weight_as_distance=True),
+        weighted=True,
+        processes=1,
+    )
+    expected = nx.betweenness_centrality(graph, weight="weight")
+    assert np.allclose(scores, [expected[n] for n in range(arrays.num_nodes)])
+
+
+def test_betweenness_process_pool(monkeypatch):
+
+    monkeypatch.setattr(centrality, "MIN_NODES_FOR_PROCESS_POOL", 0)
+    adjacency = create_arrays().to_csr(directed=True, weighted=False)
+
+    pooled, _ = centrality.calculate_betweenness(adjacency, processes=2)
+    single, _ = centrality.calculate_betweenness(adjacency, processes=1)
+    assert np.allclose(pooled, single)
+
+
+def test_sampled_betweenness():
+
+    adjacency = create_arrays().to_csr(directed=True, weighted=False)
+    exact, _ = centrality.calculate_betweenness(adjacency, processes=1)
+
+    first, error = centrality.calculate_betweenness(
+        adjacency, sample_size=30, seed=7, processes=1
+    )
+    second, _ = centrality.calculate_betweenness(
+        adjacency, sample_size=30, seed=7, processes=1
+    )
+    assert np.array_equal(first, second)
+    assert error is not None and np.all(error >= 0)
+    # on average, the estimate should be about one standard error off
+    assert np.mean(np.abs(first - exact)) < 2 * np.mean(error)
+    assert np.corrcoef(first, exact)[0, 1] > 0.8
+
+
+def test_eigenvector_matches_networkx():
+
+    arrays = create_arrays()
+    adjacency = arrays.to_csr(directed=False, weighted=True)
+
+    graph = nx.Graph()
+    graph.add_nodes_from(range(arrays.num_nodes))
+    coo = adjacency.tocoo()
+    for u, v, w in zip(coo.row, coo.col, coo.data):
+        graph.add_edge(int(u), int(v), weight=float(w))
+
+    scores, iterations, converged = centrality.calculate_eigenvector(
+        adjacency, tolerance=1.0e-8
+    )
+    expected = nx.eigenvector_centrality(graph, weight="weight", tol=1.0e-8)
+    assert converged
+    assert np.allclose(
+        scores, [expected[n] for n in range(arrays.num_nodes)], atol=1e-6
+    )
+
+    # starting from the result should converge right away
+    _, warm_iterations, _ = centrality.calculate_eigenvector(
+        adjacency, tolerance=1.0e-8, start=scores
+    )
+    assert warm_iterations < iterations
+
+
+def test_eigenvector_max_iterations():
+
+    adjacency = create_arrays().to_csr(directed=False, weighted=False)
+    _, iterations, converged = centrality.calculate_eigenvector(
+        adjacency, tolerance=1.0e-12, max_iterations=2
+    )
+    assert iterations == 2
+    assert not converged
+
+
+@pytest.mark.parametrize("harmonic", [False, True])
+@pytest.mark.parametrize("weighted", [False, True])
+def test_closeness_matches_networkx(weighted, harmonic):
+
+    arrays = create_arrays()
+    graph = create_digraph(arrays, weight_as_distance=True)
+    adjacency = arrays.to_csr(directed=True, weighted=weighted, weight_as_distance=True)
+
+    scores = centrality.calculate_closeness(
+        adjacency, weighted=weighted, harmonic=harmonic, processes=1
+    )
+    weight = "weight" if weighted else None
+    if harmonic:
+        expected = nx.harmonic_centrality(graph, distance=weight)
+    else:
+        expected = nx.closeness_centrality(graph, distance=weight)
+    assert np.allclose(scores, [expected[n] for n in range(arrays.num_nodes)])
+
+
+def test_closeness_process_pool(monkeypatch):
+
+    monkeypatch.setattr(centrality, "MIN_NODES_FOR_PROCESS_POOL", 0)
+    adjacency = create_arrays().to_csr(directed=True, weighted=False)
+
+    pooled = centrality.calculate_closeness(adjacency, processes=2)
+    single = centrality.calculate_closeness(adjacency, processes=1)
+    assert np.allclose(pooled, single)
+
+
+def test_sampled_closeness():
+
+    adjacency = create_arrays().to_csr(directed=True, weighted=False)
+    exact = centrality.calculate_closeness(adjacency, harmonic=True, processes=1)
+    sampled = centrality.calculate_closeness(
+        adjacency, harmonic=True, sample_size=40, seed=3, processes=1
+    )
+    assert np.corrcoef(sampled, exact)[0, 1] > 0.8
+    assert np.allclose(
+        centrality.calculate_closeness(
+            adjacency, harmonic=True, sample_size=60, processes=1
+        ),
+        exact,
+    )
@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for the community detection helpers in `kiara_plugin.playground.utils.communities`."""
+
+from typing import Union
+
+import networkx as nx
+import numpy as np
+import pytest
+from networkx.algorithms import community
+
+from kiara_plugin.playground.utils.communities import (
+    calculate_cnm_dendrogram,
+    calculate_louvain,
+    calculate_louvain_runs,
+    calculate_modularity,
+    modularity_adjacency,
+)
+from kiara_plugin.playground.utils.networks import NetworkArrays
+
+
+def create_arrays(G: nx.Graph, weight: Union[str, None] = None) -> NetworkArrays:
+
+    edges = np.array(list(G.edges()), dtype=np.int64).reshape(-1, 2)
+    weights = None
+    if weight is not None:
+        weights = np.array([w for _, _, w in G.edges(data=weight, default=1.0)])
+    return NetworkArrays(
+        num_nodes=G.number_of_nodes(),
+        sources=edges[:, 0],
+        targets=edges[:, 1],
+        weights=weights,
+    )
+
+
+def community_groups(G: nx.Graph, communities) -> np.ndarray:
+
+    groups = np.empty(G.number_of_nodes(), dtype=np.int64)
+    for i, c in enumerate(communities):
+        groups[list(c)] = i
+    return groups
+
+
+def create_graphs():
+
+    # with a self-loop, and more components than some of the requested numbers of communities
+    sparse = nx.gnm_random_graph(60, 40, seed=1)
+    sparse.add_edge(3, 3)
+    return [
+        nx.karate_club_graph(),
+        nx.gnm_random_graph(200, 400, seed=3),
+        nx.barabasi_albert_graph(300, 2, seed=2),
+        sparse,
+    ]
+
+
+@pytest.mark.parametrize("G", create_graphs())
+def test_cnm_partitions_match_networkx(G):
+
+    dendrogram = calculate_cnm_dendrogram(create_arrays(G))
+
+    expected = community.greedy_modularity_communities(G)
+    assert np.array_equal(dendrogram.partition(), community_groups(G, expected))
+
+    for k in [1, 2, 5, 10, G.number_of_nodes()]:
+        expected = community.greedy_modularity_communities(G, cutoff=k, best_n=k)
+        assert np.array_equal(dendrogram.partition(k), community_groups(G, expected))
+
+
+@pytest.mark.parametrize("G", create_graphs())
+def test_cnm_modularity_curve(G):
+
+    dendrogram = calculate_cnm_dendrogram(create_arrays(G))
+    num_communities, modularity = dendrogram.modularity_curve()
+
+    for i in [0, dendrogram.best_num_merges(), dendrogram.num_merges]:
+        k = int(num_communities[i])
+        partition = dendrogram.partition(k)
+        communities = [np.flatnonzero(partition == g) for g in range(k)]
+        expected = community.modularity(G, communities, weight=None)
+        assert modularity[i] == pytest.approx(expected)
+
+
+def test_cnm_without_edges():
+
+    dendrogram = calculate_cnm_dendrogram(
+        NetworkArrays(num_nodes=4, sources=np.array([]), targets=np.array([]))
+    )
+    assert dendrogram.partition().tolist() == [0, 1, 2, 3]
+    with pytest.raises(ValueError):
+        dendrogram.partition(5)
+
+
+@pytest.mark.parametrize("G", create_graphs())
+def test_modularity_matches_networkx(G):
+
+    adjacency = modularity_adjacency(create_arrays(G, weight="weight"))
+    communities = community.louvain_communities(G, seed=1)
+    groups = community_groups(G, communities)
+
+    for resolution in [0.5, 1.0, 2.0]:
+        expected = community.modularity(G, communities, resolution=resolution)
+        assert calculate_modularity(adjacency, groups, resolution) == pytest.approx(
+            expected
+        )
+
+
+@pytest.mark.parametrize("G", create_graphs())
+def test_louvain(G):
+
+    adjacency = modularity_adjacency(create_arrays(G, weight="weight"))
+    groups = calculate_louvain(adjacency, seed=1)
+
+    # about as good as networkx, and every community is connected
+    expected = community.modularity(G, community.louvain_communities(G, seed=1))
+    assert calculate_modularity(adjacency, groups) > expected - 0.02
+    for group in range(groups.max() + 1):
+        assert nx.is_connected(G.subgraph(np.flatnonzero(groups == group).tolist()))
+
+    # largest community first
+    sizes = np.bincount(groups)
+    assert np.all(sizes[:-1] >= sizes[1:])
+
+
+def test_louvain_weights_and_resolution():
+
+    # two triangles with weak internal edges, connected by strong edges
+    G = nx.Graph()
+    G.add_weighted_edges_from(
+        [(0, 1, 1), (1, 2, 1), (0, 2, 1), (3, 4, 1), (4, 5, 1), (3, 5, 1)]
+        + [(0, 3, 10), (1, 4, 10), (2, 5, 10)]
+    )
+    unweighted = calculate_louvain(modularity_adjacency(create_arrays(G)), seed=1)
+    assert len(set(unweighted[[0, 1, 2]])) == 1
+    weighted = calculate_louvain(
+        modularity_adjacency(create_arrays(G, weight="weight")), seed=1
+    )
+    assert len(set(weighted[[0, 3]])) == 1
+    assert len(set(weighted[[0, 1]])) == 2
+
+    # a very high resolution leaves every node on its own
+    adjacency = modularity_adjacency(create_arrays(G))
+    assert calculate_louvain(adjacency, resolution=100, seed=1).max() == 5
+
+
+def test_louvain_runs_in_process_pool():
+
+    G = nx.gnm_random_graph(300, 900, seed=1)
+    adjacency = modularity_adjacency(create_arrays(G))
+
+    runs = calculate_louvain_runs(adjacency, [0.5, 1.0], [1, 2], processes=1)
+    pooled = calculate_louvain_runs(adjacency, [0.5, 1.0], [1, 2], processes=2)
+
+    assert [run[:2] for run in runs] == [(0.5, 1), (0.5, 2), (1.0, 1), (1.0, 2)]
+    for run, pooled_run in zip(runs, pooled):
+        assert np.array_equal(run[2], pooled_run[2])
+        assert run[3] == pytest.approx(calculate_modularity(adjacency, run[2]))
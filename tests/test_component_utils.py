@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for the connectivity helpers in `kiara_plugin.playground.utils.components`."""
+
+import networkx as nx
+import numpy as np
+import pyarrow as pa
+import pytest
+
+from kiara_plugin.playground.utils.components import (
+    calculate_biconnected_components,
+    calculate_connected_components,
+    filter_component,
+)
+from kiara_plugin.playground.utils.networks import NetworkArrays
+
+
+def create_arrays(G: nx.Graph) -> NetworkArrays:
+
+    edges = np.array(list(G.edges()), dtype=np.int64).reshape(-1, 2)
+    return NetworkArrays(
+        num_nodes=G.number_of_nodes(), sources=edges[:, 0], targets=edges[:, 1]
+    )
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_biconnected_components_match_networkx(seed):
+
+    # sparse enough to have several components, cut-points and bridges
+    G = nx.gnm_random_graph(120, 130, seed=seed)
+    arrays = create_arrays(G)
+    is_cut_point, is_bridge, edge_components = calculate_biconnected_components(arrays)
+
+    assert set(np.flatnonzero(is_cut_point)) == set(nx.articulation_points(G))
+
+    edges = list(G.edges())
+    bridges = {edges[i] for i in np.flatnonzero(is_bridge)}
+    assert bridges == {tuple(sorted(e)) for e in nx.bridges(G)}
+
+    components = {}
+    for edge, component in zip(edges, edge_components):
+        components.setdefault(component, set()).add(frozenset(edge))
+    expected = {
+        frozenset(frozenset(e) for e in c) for c in nx.biconnected_component_edges(G)
+    }
+    assert set(frozenset(c) for c in components.values()) == expected
+
+
+def test_biconnected_components_parallel_edges_and_self_loops():
+
+    # 0 = 1 (parallel edges) - 2, plus a self-loop on 2
+    arrays = NetworkArrays(
+        num_nodes=3, sources=np.array([0, 1, 1, 2]), targets=np.array([1, 0, 2, 2])
+    )
+    is_cut_point, is_bridge, edge_components = calculate_biconnected_components(arrays)
+
+    assert is_cut_point.tolist() == [False, True, False]
+    assert is_bridge.tolist() == [False, False, True, False]
+    assert edge_components[0] == edge_components[1]
+    assert edge_components[2] != edge_components[0]
+    assert edge_components[3] == -1
+
+
+def test_biconnected_components_deep_path():
+
+    # deeper than the default recursion limit
+    G = nx.path_graph(5000)
+    is_cut_point, is_bridge, _ = calculate_biconnected_components(create_arrays(G))
+    assert is_cut_point.sum() == 4998
+    assert is_bridge.all()
+
+
+def batches(arrays: NetworkArrays, batch_size: int):
+
+    for start in range(0, arrays.num_edges, batch_size):
+        yield (
+            arrays.sources[start : start + batch_size],
+            arrays.targets[start : start + batch_size],
+        )
+
+
+@pytest.mark.parametrize("batch_size", [1, 7, 1000])
+def test_connected_components_match_networkx(batch_size):
+
+    G = nx.gnm_random_graph(300, 200, seed=1)
+    G.add_edge(5, 5)
+    arrays = create_arrays(G)
+    components, sizes = calculate_connected_components(
+        arrays.num_nodes, batches(arrays, batch_size)
+    )
+
+    expected = sorted(nx.connected_components(G), key=lambda c: (-len(c), min(c)))
+    assert len(sizes) == len(expected)
+    for component, nodes in enumerate(expected):
+        assert set(np.flatnonzero(components == component)) == nodes
+        assert sizes[component] == len(nodes)
+
+
+def test_connected_components_long_path():
+
+    # edges in reverse order, so every union links a new root
+    sources = np.arange(9999, 0, -1)
+    components, sizes = calculate_connected_components(10001, [(sources, sources - 1)])
+    assert sizes.tolist() == [10000, 1]
+    assert components[-1] == 1
+
+
+def test_filter_component():
+
+    from kiara_plugin.network_analysis.models import NetworkData
+
+    # a triangle (with a parallel edge) and a separate pair of nodes
+    network_data = NetworkData.create_network_data(
+        nodes_table=pa.table(
+            {"_node_id": [0, 1, 2, 3, 4], "_label": list("abcde"), "x": [1, 2, 3, 4, 5]}
+        ),
+        edges_table=pa.table(
+            {
+                "_source": [0, 3, 2, 4, 4],
+                "_target": [4, 1, 0, 2, 0],
+                "weight": [1.0, 2.0, 3.0, 4.0, 5.0],
+            }
+        ),
+    )
+    components = np.array([0, 1, 0, 1, 0])
+    nodes_table, edges_table = filter_component(network_data, components, 0)
+
+    assert nodes_table.column("_node_id").to_pylist() == [0, 1, 2]
+    assert nodes_table.column("old_node_id").to_pylist() == [0, 2, 4]
+    assert nodes_table.column("_label").to_pylist() == ["a", "c", "e"]
+    assert nodes_table.column("x").to_pylist() == [1, 3, 5]
+    # the edges table of a network is not necessarily in the order it was created in
+    edges = set(
+        zip(
+            edges_table.column("_source").to_pylist(),
+            edges_table.column("_target").to_pylist(),
+            edges_table.column("old_source_id").to_pylist(),
+            edges_table.column("weight").to_pylist(),
+        )
+    )
+    assert edges == {(0, 2, 0, 1.0), (1, 0, 2, 3.0), (2, 1, 4, 4.0), (2, 0, 4, 5.0)}
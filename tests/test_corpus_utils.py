@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for the parallel text corpus reader in `kiara_plugin.playground.utils.corpus`."""
+
+import hashlib
+import os
+
+import pytest
+from kiara.exceptions import KiaraProcessingException
+
+from kiara_plugin.playground.utils.corpus import (
+    CORPUS_SCHEMA,
+    MANIFEST_SCHEMA,
+    iter_corpus_batches,
+    list_text_files,
+    merge_processed_rows,
+    normalize_texts,
+    read_text_corpus,
+    update_text_corpus,
+)
+
+
+def write_corpus(tmp_path):
+
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "ignored").mkdir()
+    (tmp_path / "b.txt").write_bytes(b"line 1\r\nline 2\rline 3")
+    (tmp_path / "sub" / "a.txt").write_bytes("cafe\u0301".encode("utf-8"))
+    (tmp_path / "ignored" / "c.txt").write_bytes(b"c")
+    (tmp_path / "notes.md").write_bytes(b"notes")
+    for i in range(10):
+        (tmp_path / f"doc_{i}.txt").write_bytes(f"document {i}".encode("utf-8"))
+    return str(tmp_path)
+
+
+def test_list_text_files(tmp_path):
+
+    folder = write_corpus(tmp_path)
+    files = list_text_files(folder, include_files=[".txt"], exclude_dirs=["ignored"])
+    assert [rel_path for rel_path, _ in files] == ["b.txt"] + [
+        f"doc_{i}.txt" for i in range(10)
+    ] + ["sub/a.txt"]
+
+    with pytest.raises(KiaraProcessingException, match="not a folder"):
+        list_text_files(str(tmp_path / "b.txt"))
+
+
+@pytest.mark.parametrize("spill", [False, True])
+def test_read_text_corpus(tmp_path, spill):
+
+    (tmp_path / "corpus").mkdir()
+    folder = write_corpus(tmp_path / "corpus")
+    spill_dir = tmp_path / "spill"
+    spill_dir.mkdir()
+
+    table, manifest = read_text_corpus(
+        folder,
+        include_files=[".txt"],
+        batch_size=3,
+        max_workers=2,
+        spill_dir=str(spill_dir) if spill else None,
+    )
+    assert table.schema == CORPUS_SCHEMA
+    assert table.num_rows == 13
+    assert [len(batch) for batch in table.to_batches()] == [3, 3, 3, 3, 1]
+    assert table.column("id").to_pylist() == list(range(13))
+    rows = {row["rel_path"]: row for row in table.to_pylist()}
+    # line endings are normalised (like when reading in text mode), the size is the one of the file
+    assert rows["b.txt"]["content"] == "line 1\nline 2\nline 3"
+    assert rows["b.txt"]["size"] == 21
+    # the unicode representation is kept as it is
+    assert rows["sub/a.txt"]["content"] == "cafe\u0301"
+    assert rows["sub/a.txt"]["file_name"] == "a.txt"
+    assert rows["ignored/c.txt"]["mime_type"] == "text/plain"
+    # the temporary file is removed right away
+    assert list(spill_dir.iterdir()) == []
+
+    assert manifest.schema == MANIFEST_SCHEMA
+    assert manifest.column("rel_path").equals(table.column("rel_path"))
+    assert manifest.column("size").equals(table.column("size"))
+    assert (
+        manifest.column("content_hash")[0].as_py()
+        == hashlib.sha256(b"line 1\r\nline 2\rline 3").hexdigest()
+    )
+
+
+def test_iter_corpus_batches_keeps_order(tmp_path):
+
+    for i in range(50):
+        (tmp_path / f"{i:02d}.txt").write_text(str(i))
+    files = list_text_files(str(tmp_path))
+    batches = list(iter_corpus_batches(files, batch_size=4, max_workers=8))
+    assert [
+        int(text) for batch, _ in batches for text in batch.column(4).to_pylist()
+    ] == (list(range(50)))
+
+
+def test_read_text_corpus_encoding_errors(tmp_path):
+
+    (tmp_path / "a.txt").write_bytes(b"valid")
+    (tmp_path / "b.txt").write_bytes(b"\xff invalid")
+
+    with pytest.raises(KiaraProcessingException, match="'b.txt'"):
+        read_text_corpus(str(tmp_path))
+
+    table, _ = read_text_corpus(str(tmp_path), errors="replace")
+    assert table.column("content").to_pylist() == ["valid", "� invalid"]
+
+    table, manifest = read_text_corpus(str(tmp_path), errors="skip")
+    assert table.column("rel_path").to_pylist() == ["a.txt"]
+    assert manifest.column("rel_path").to_pylist() == ["a.txt"]
+
+    table, _ = read_text_corpus(str(tmp_path), encoding="latin-1")
+    assert table.column("content").to_pylist() == ["valid", "ÿ invalid"]
+
+
+def test_normalize_texts():
+
+    import pyarrow as pa
+
+    decomposed = "cafe\u0301"
+    texts = pa.array(["a\r\nb\rc\n", decomposed])
+    # the unicode representation is kept as it is by default
+    assert normalize_texts(texts).to_pylist() == ["a\nb\nc\n", decomposed]
+    assert normalize_texts(texts, "NFC").to_pylist() == ["a\nb\nc\n", "caf\u00e9"]
+    with pytest.raises(KiaraProcessingException, match="normalization form"):
+        normalize_texts(texts, "NFX")
+
+
+def test_update_text_corpus(tmp_path):
+
+    folder = tmp_path / "corpus"
+    folder.mkdir()
+    for name in ("a", "b", "c", "d"):
+        (folder / f"{name}.txt").write_text(name)
+    table, manifest = read_text_corpus(str(folder))
+
+    # unchanged, but touched
+    os.utime(folder / "a.txt", ns=(0, 0))
+    # changed
+    (folder / "b.txt").write_text("b changed")
+    # removed
+    (folder / "c.txt").unlink()
+    # new
+    (folder / "e.txt").write_text("e")
+
+    updated, updated_manifest, new_rows = update_text_corpus(
+        str(folder), table, manifest, batch_size=1
+    )
+    assert new_rows.column("rel_path").to_pylist() == ["b.txt", "e.txt"]
+    assert new_rows.column("id").to_pylist() == [4, 5]
+    assert (
+        updated.to_pylist()
+        == [
+            table.to_pylist()[0],
+            table.to_pylist()[3],
+        ]
+        + new_rows.to_pylist()
+    )
+    assert sorted(updated_manifest.column("rel_path").to_pylist()) == [
+        "a.txt",
+        "b.txt",
+        "d.txt",
+        "e.txt",
+    ]
+    touched = updated_manifest.filter(
+        [path == "a.txt" for path in updated_manifest.column("rel_path").to_pylist()]
+    )
+    assert touched.column("mtime_ns").to_pylist() == [0]
+
+    # without any changes, nothing is read, and the previous table is re-used
+    again, again_manifest, no_rows = update_text_corpus(
+        str(folder), updated, updated_manifest
+    )
+    assert no_rows.num_rows == 0
+    assert again.column("content").chunk(0).buffers()[2].address == (
+        updated.column("content").chunk(0).buffers()[2].address
+    )
+    assert again_manifest.sort_by("rel_path").equals(
+        updated_manifest.sort_by("rel_path")
+    )
+
+    with pytest.raises(KiaraProcessingException, match="missing column"):
+        update_text_corpus(str(folder), table.drop_columns(["id"]), manifest)
+
+
+def test_merge_processed_rows(tmp_path):
+
+    import pyarrow.compute as pc
+
+    def process(rows):
+        # stands in for date parsing, tokenisation, ...
+        return rows.append_column("length", pc.utf8_length(rows.column("content")))
+
+    folder = tmp_path / "corpus"
+    folder.mkdir()
+    for name in ("a", "b", "c"):
+        (folder / f"{name}.txt").write_text(name)
+    table, manifest = read_text_corpus(str(folder))
+    processed = merge_processed_rows(table, process(table))
+    assert processed.column("length").to_pylist() == [1, 1, 1]
+
+    (folder / "b.txt").write_text("b changed")
+    (folder / "c.txt").unlink()
+    (folder / "d.txt").write_text("dd")
+    updated, _, new_rows = update_text_corpus(str(folder), table, manifest)
+
+    merged = merge_processed_rows(updated, process(new_rows), processed)
+    assert merged.drop_columns(["length"]).equals(updated)
+    assert merged.column("rel_path").to_pylist() == ["a.txt", "b.txt", "d.txt"]
+    assert merged.column("length").to_pylist() == [1, 9, 2]
+
+    with pytest.raises(KiaraProcessingException, match="missing column"):
+        merge_processed_rows(updated, process(new_rows), table)
+    with pytest.raises(KiaraProcessingException, match="rows"):
+        merge_processed_rows(table, process(new_rows), processed)
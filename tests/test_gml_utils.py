@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for the streaming GML reader in `kiara_plugin.playground.utils.gml`."""
+
+import networkx as nx
+import pytest
+from kiara.exceptions import KiaraProcessingException
+
+from kiara_plugin.playground.utils.gml import read_gml_tables
+
+GML = """Creator "test"
+graph [
+  directed 0
+  node [ id 0 label "a" color "red" ]
+  node [ id 1 label "b &amp; c" ]
+  # comment
+  node [ id 2 label "d" size 1.5 ]
+  edge [ source 0 target 1 weight 2 ]
+  node [ id 3 color "blue"
+    label "multi
+    line"
+  ]
+  edge [ source 2 target 1 ]
+  edge [ source 3 target 0 weight 1 ]
+]
+"""
+
+
+def write(tmp_path, content: str) -> str:
+
+    path = tmp_path / "graph.gml"
+    path.write_text(content)
+    return str(path)
+
+
+@pytest.mark.parametrize("label", ["label", "id"])
+@pytest.mark.parametrize("batch_size", [1, 2, 1000])
+def test_read_gml_matches_networkx(tmp_path, label, batch_size):
+
+    path = write(tmp_path, GML)
+    nodes_table, edges_table = read_gml_tables(path, label=label, batch_size=batch_size)
+
+    # 'NetworkData.create_from_networkx_graph' can't handle attributes that only some nodes have, so the tables are
+    # compared to the networkx graph directly
+    G = nx.read_gml(path, label=label)
+    nodes = list(G.nodes(data=True))
+    assert nodes_table.column("_node_id").to_pylist() == [0, 1, 2, 3]
+    assert nodes_table.column("_label").to_pylist() == [str(n) for n, _ in nodes]
+    assert set(nodes_table.column_names[2:]) == {k for _, d in nodes for k in d}
+    for column_name in nodes_table.column_names[2:]:
+        assert nodes_table.column(column_name).to_pylist() == [
+            d.get(column_name, None) for _, d in nodes
+        ]
+    assert nodes_table.column("_label").to_pylist()[1:] == (
+        ["b & c", "d", "multi line"] if label == "label" else ["1", "2", "3"]
+    )
+
+    names = [n for n, _ in nodes]
+    edges = {
+        (frozenset((names[source], names[target])), weight)
+        for source, target, weight in zip(
+            edges_table.column("_source").to_pylist(),
+            edges_table.column("_target").to_pylist(),
+            edges_table.column("weight").to_pylist(),
+        )
+    }
+    assert edges == {
+        (frozenset((u, v)), d.get("weight")) for u, v, d in G.edges(data=True)
+    }
+
+
+@pytest.mark.parametrize("batch_size", [1, 2, 1000])
+def test_read_gml_mixed_attribute_types(tmp_path, batch_size):
+
+    # 'val' is an int in the first batch and a string in the second one (for a batch size of 2), the column falls
+    # back to strings, no matter where the batch boundaries are
+    path = write(
+        tmp_path,
+        """graph [
+            node [ id 0 label "a" val 1 ] node [ id 1 label "b" ]
+            node [ id 2 label "c" val "x" ] node [ id 3 label "d" val 2 ]
+            edge [ source 0 target 1 weight 1 ] edge [ source 1 target 2 weight 2 ]
+            edge [ source 2 target 3 weight "heavy" ] ]""",
+    )
+    nodes_table, edges_table = read_gml_tables(path, batch_size=batch_size)
+    assert nodes_table.column("val").to_pylist() == ["1", None, "x", "2"]
+    assert edges_table.column("weight").to_pylist() == ["1", "2", "heavy"]
+
+
+def test_read_gml_multigraph(tmp_path):
+
+    path = write(
+        tmp_path,
+        """graph [ multigraph 1 directed 1
+            node [ id 5 label "x" ] node [ id 7 label "y" ]
+            edge [ source 5 target 7 key 0 ] edge [ source 5 target 7 key 1 ]
+            edge [ source 7 target 5 ] ]""",
+    )
+    nodes_table, edges_table = read_gml_tables(path)
+    assert nodes_table.column("_label").to_pylist() == ["x", "y"]
+    assert edges_table.column_names == ["_source", "_target"]
+    assert edges_table.column("_source").to_pylist() == [0, 0, 1]
+    assert edges_table.column("_target").to_pylist() == [1, 1, 0]
+
+
+@pytest.mark.parametrize(
+    "content, message",
+    [
+        ("", "no graph"),
+        ("graph [ node [ id 0 ] ]", "no 'label' attribute"),
+        ('graph [ node [ id 0 label "a" ] node [ id 0 label "b" ] ]', "node id 0"),
+        ('graph [ node [ id 0 label "a" ] node [ id 1 label "a" ] ]', "label 'a'"),
+        ('graph [ node [ id 0 label "a" ] edge [ source 0 target 1 ] ]', "target 1"),
+        (
+            'graph [ node [ id 0 label "a" ] node [ id 1 label "b" ] edge [ source 0 target 1 ] edge [ source 1 target 0 ] ]',
+            "duplicated",
+        ),
+        ('graph [ node [ id 0 label "a" ]', "end of file"),
+    ],
+)
+def test_read_gml_invalid(tmp_path, content, message):
+
+    path = write(tmp_path, content)
+    with pytest.raises(KiaraProcessingException, match=message):
+        read_gml_tables(path)
@@ -0,0 +1,267 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for the lineage data helpers in `kiara_plugin.playground.utils.lineage`."""
+
+import networkx as nx
+import pytest
+
+from kiara.exceptions import KiaraProcessingException
+
+from kiara_plugin.playground.utils.lineage import (
+    MAX_PREVIEW_LENGTH,
+    LineageInfo,
+    create_lineage_data,
+    create_lineage_page,
+    create_parent_index,
+    iter_lineage_nodes,
+    order_lineage_nodes,
+)
+
+
+class DummyModuleTypeInfo(object):
+    def __init__(self, module_type: str):
+        self.module_type = module_type
+
+    def dict(self):
+        return {"type_name": self.module_type}
+
+
+class DummyValue(object):
+    def __init__(self, value_id: str):
+        self.value_id = value_id
+        self.is_set = value_id != "unset"
+
+
+class DummyValues(object):
+    def __init__(self, values):
+        self.values = values
+
+    def get_value_obj(self, field_name: str):
+        return self.values[field_name]
+
+
+class DummyRenderResult(object):
+    def __init__(self, rendered: str):
+        self.rendered = rendered
+
+
+class DummyKiara(object):
+    """Records the calls to the kiara API."""
+
+    def __init__(self):
+        self.calls = []
+
+    def list_module_type_names(self):
+        self.calls.append(("module_type_names",))
+        return ["table.sample"]
+
+    def retrieve_module_type_info(self, module_type: str):
+        self.calls.append(("module_type_info", module_type))
+        return DummyModuleTypeInfo(module_type)
+
+    def get_values(self, **values: str):
+        self.calls.append(("get_values", sorted(values.values())))
+        return DummyValues(
+            {
+                field_name: DummyValue(value_id)
+                for field_name, value_id in values.items()
+            }
+        )
+
+    def render_value(self, value, target_format, render_config):
+        self.calls.append(("render_value", value.value_id))
+        if value.value_id == "big":
+            return DummyRenderResult("x" * (MAX_PREVIEW_LENGTH + 1))
+        return DummyRenderResult(
+            f"{value.value_id}: {render_config['number_of_rows']} rows"
+        )
+
+
+def create_graph() -> nx.DiGraph:
+
+    graph = nx.DiGraph()
+    graph.add_node("module:1", node_type="operation", module_type="table.sample")
+    graph.add_node("module:2", node_type="operation", module_type="table.sample")
+    graph.add_node("module:3", node_type="operation", module_type="EXTERNAL_DATA")
+    for value_id in ("a", "big", "unset"):
+        graph.add_node(f"value:{value_id}", node_type="value")
+    graph.add_edges_from(
+        [
+            ("module:2", "value:a"),
+            ("value:a", "module:1"),
+            ("value:big", "module:1"),
+            ("value:unset", "module:2"),
+            ("module:3", "value:big"),
+        ]
+    )
+    return graph
+
+
+def test_create_lineage_data():
+
+    kiara = DummyKiara()
+    lineage_data = create_lineage_data(
+        create_graph(), LineageInfo(kiara, preview_rows=3)
+    )
+
+    assert list(lineage_data) == ["0", "1", "2", "3", "4", "5"]
+    nodes = {node["id"]: node for node in lineage_data.values()}
+    assert sorted(nodes["module:1"]["parentIds"]) == ["value:a", "value:big"]
+    assert nodes["module:1"]["info"] == {"type_name": "table.sample"}
+    assert nodes["module:3"]["info"] == {"type_name": "EXTERNAL_DATA"}
+    assert nodes["value:a"]["info"] == {"preview_id": "a", "preview": "a: 3 rows"}
+    assert nodes["value:big"]["info"]["preview"].endswith("\n...")
+    assert len(nodes["value:big"]["info"]["preview"]) == MAX_PREVIEW_LENGTH + 4
+    assert nodes["value:unset"]["info"] == {"preview_id": "unset", "preview": None}
+
+    # module type infos are only retrieved once per type, and all values with a single lookup
+    assert kiara.calls[:2] == [
+        ("get_values", ["a", "big", "unset"]),
+        ("render_value", "a"),
+    ]
+    assert [call for call in kiara.calls if call[0] == "module_type_info"] == [
+        ("module_type_info", "table.sample")
+    ]
+
+
+def test_lineage_info_without_previews():
+
+    kiara = DummyKiara()
+    lineage_info = LineageInfo(kiara, preview_rows=0)
+    lineage_data = create_lineage_data(create_graph(), lineage_info)
+
+    previews = [
+        node["info"]
+        for node in lineage_data.values()
+        if node["id"].startswith("value:")
+    ]
+    assert previews == [
+        {"preview_id": value_id, "preview": None} for value_id in ("a", "big", "unset")
+    ]
+    assert all(call[0].startswith("module_type") for call in kiara.calls)
+
+
+def test_lineage_info_renders_previews_once():
+
+    kiara = DummyKiara()
+    lineage_info = LineageInfo(kiara)
+    assert lineage_info.previews(["a", "a"]) == {"a": "a: 10 rows"}
+    assert lineage_info.previews(["a"]) == {"a": "a: 10 rows"}
+    assert kiara.calls == [("get_values", ["a"]), ("render_value", "a")]
+
+
+def test_lineage_info_custom_renderer():
+
+    kiara = DummyKiara()
+
+    def renderer(value, target_format, render_config):
+        return DummyRenderResult(f"custom {value.value_id}")
+
+    lineage_info = LineageInfo(kiara, renderer=renderer)
+    assert lineage_info.previews(["a"]) == {"a": "custom a"}
+    assert kiara.calls == [("get_values", ["a"])]
+
+
+def create_chain(length: int) -> nx.DiGraph:
+    """A lineage of 'length' consecutive operations, each with one extra input value, that ends in 'value:root'."""
+
+    graph = nx.DiGraph()
+    graph.add_node("value:root", node_type="value")
+    child = "value:root"
+    for i in range(length):
+        module_id = f"module:{i}"
+        graph.add_node(module_id, node_type="operation", module_type="table.sample")
+        graph.add_node(f"value:{i}", node_type="value")
+        graph.add_edges_from([(module_id, child), (f"value:{i}", module_id)])
+        child = module_id
+    return graph
+
+
+def test_iter_lineage_nodes():
+
+    graph = create_chain(3)
+    # a shortcut from the input value of the oldest operation to the most recent one
+    graph.add_edge("value:2", "module:0")
+    parent_index = create_parent_index(graph)
+    assert sorted(parent_index["module:0"]) == ["module:1", "value:0", "value:2"]
+
+    nodes = list(iter_lineage_nodes(parent_index, "value:root"))
+    assert nodes[:2] == [("value:root", 0), ("module:0", 1)]
+    # every node is visited once, at its lowest depth
+    assert len(nodes) == graph.number_of_nodes()
+    assert dict(nodes)["value:2"] == 2
+    assert dict(nodes)["module:2"] == 3
+
+    assert list(iter_lineage_nodes(parent_index, "value:root", max_depth=1)) == [
+        ("value:root", 0),
+        ("module:0", 1),
+    ]
+
+
+def test_create_lineage_page():
+
+    kiara = DummyKiara()
+    graph = create_chain(10)
+
+    page = create_lineage_page(
+        graph, "value:root", LineageInfo(kiara), offset=0, page_size=4
+    )
+    assert [node["id"] for node in page["nodes"]] == [
+        "value:root",
+        "module:0",
+        "value:0",
+        "module:1",
+    ]
+    assert [node["depth"] for node in page["nodes"]] == [0, 1, 2, 2]
+    assert page["nodes"][1]["parentIds"] == ["value:0", "module:1"]
+    assert page["total_nodes"] == 21
+    assert page["next_offset"] == 4
+    # only the values of the page are retrieved and rendered
+    assert [call for call in kiara.calls if call[0] != "render_value"] == [
+        ("get_values", ["0", "root"]),
+        ("module_type_names",),
+        ("module_type_info", "table.sample"),
+    ]
+
+    pages = [page]
+    while pages[-1]["next_offset"] is not None:
+        pages.append(
+            create_lineage_page(
+                graph,
+                "value:root",
+                LineageInfo(kiara, preview_rows=0),
+                offset=pages[-1]["next_offset"],
+                page_size=4,
+            )
+        )
+    node_ids = [node["id"] for page in pages for node in page["nodes"]]
+    assert len(pages) == 6
+    assert sorted(node_ids) == sorted(graph.nodes)
+
+    page = create_lineage_page(
+        graph, "value:root", LineageInfo(kiara), max_depth=3, page_size=100
+    )
+    assert page["total_nodes"] == 6
+    assert page["next_offset"] is None
+
+    with pytest.raises(KiaraProcessingException, match="no node"):
+        create_lineage_page(graph, "value:missing", LineageInfo(kiara))
+
+
+def test_order_lineage_nodes_memoised():
+
+    graph = create_chain(3)
+    _, ordered = order_lineage_nodes(graph, "value:root", lineage_id="root")
+    assert len(ordered) == graph.number_of_nodes()
+
+    # the same lineage (and maximum depth) is only ordered once
+    graph.add_node("value:new", node_type="value")
+    graph.add_edge("value:new", "module:0")
+    assert order_lineage_nodes(graph, "value:root", lineage_id="root")[1] is ordered
+    assert (
+        len(order_lineage_nodes(graph, "value:root", max_depth=1, lineage_id="root")[1])
+        == 2
+    )
+    # without a lineage id, nothing is memoised
+    assert len(order_lineage_nodes(graph, "value:root")[1]) == len(ordered) + 1
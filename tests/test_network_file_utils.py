@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for the edge/node list file helpers in `kiara_plugin.playground.utils.network_files`."""
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from kiara.exceptions import KiaraProcessingException
+
+from kiara_plugin.playground.utils.network_files import (
+    aggregate_edges,
+    create_network_tables,
+    encode_node_ids,
+    read_table_file,
+)
+
+
+def test_read_table_file(tmp_path):
+
+    csv_path = tmp_path / "edges.csv"
+    rows = "".join(f"{i},{i + 1},{i % 3}\n" for i in range(100))
+    csv_path.write_text("\ufeffSource,Target,weight\n" + rows)
+    # small blocks, so the file is parsed in several chunks
+    table = read_table_file(str(csv_path), block_size=64)
+    assert table.column_names == ["Source", "Target", "weight"]
+    assert table.column("Target").to_pylist() == list(range(1, 101))
+
+    parquet_path = tmp_path / "edges.parquet"
+    pq.write_table(table, str(parquet_path))
+    assert read_table_file(str(parquet_path)).equals(table)
+
+    with pytest.raises(KiaraProcessingException, match="unsupported"):
+        read_table_file(str(tmp_path / "edges.xlsx"))
+
+
+def test_encode_node_ids():
+
+    sources = pa.chunked_array([["b", "a"], ["c"]])
+    targets = pa.chunked_array([["a", "d", "b"]])
+    dictionary, source_ids, target_ids = encode_node_ids(sources, targets)
+
+    assert dictionary.to_pylist() == ["b", "a", "c", "d"]
+    assert source_ids.type == pa.int32()
+    assert source_ids.to_pylist() == [0, 1, 2]
+    assert target_ids.to_pylist() == [1, 3, 0]
+
+
+def test_encode_node_ids_with_nodes_table():
+
+    # the ids in the nodes table are integers, in the edges table strings
+    dictionary, source_ids, target_ids = encode_node_ids(
+        pa.chunked_array([["3", "1"]]),
+        pa.chunked_array([["5", "3"]]),
+        pa.chunked_array([[1, 2, 3]]),
+    )
+    assert dictionary.to_pylist() == ["1", "2", "3", "5"]
+    assert source_ids.to_pylist() == [2, 0]
+    assert target_ids.to_pylist() == [3, 2]
+
+    with pytest.raises(KiaraProcessingException, match="'2' is used"):
+        encode_node_ids(
+            pa.chunked_array([[1]]),
+            pa.chunked_array([[2]]),
+            pa.chunked_array([[1, 2, 2]]),
+        )
+
+
+def test_aggregate_edges():
+
+    edges = pa.table(
+        {
+            "_source": [0, 1, 0, 0],
+            "_target": [1, 0, 1, 2],
+            "weight": [1.0, 2.0, 3.0, 4.0],
+            "kind": ["x", "y", "z", "w"],
+        }
+    )
+    result = aggregate_edges(edges)
+    assert result.column_names == ["_source", "_target", "weight", "kind"]
+    assert result.to_pylist() == [
+        {"_source": 0, "_target": 1, "weight": 4.0, "kind": "x"},
+        {"_source": 1, "_target": 0, "weight": 2.0, "kind": "y"},
+        {"_source": 0, "_target": 2, "weight": 4.0, "kind": "w"},
+    ]
+
+    counted = aggregate_edges(edges.drop_columns(["weight"]))
+    assert counted.column("weight").to_pylist() == [2, 1, 1]
+
+
+def test_create_network_tables():
+
+    nodes_table = pa.table(
+        {"Id": [10, 20, 30], "Label": ["ten", None, "thirty"], "city": ["a", "b", "c"]}
+    )
+    edges_table = pa.table({"Source": [10, 20, 40], "Target": [20, 30, 10]})
+    nodes, edges = create_network_tables(
+        edges_table, "Source", "Target", nodes_table, "Id", "Label"
+    )
+
+    assert nodes.column("_node_id").type == pa.int32()
+    assert nodes.column("_node_id").to_pylist() == [0, 1, 2, 3]
+    assert nodes.column("_label").to_pylist() == ["ten", "20", "thirty", "40"]
+    assert nodes.column("city").to_pylist() == ["a", "b", "c", None]
+    assert edges.column_names == ["_source", "_target"]
+    assert edges.column("_source").to_pylist() == [0, 1, 3]
+    assert edges.column("_target").to_pylist() == [1, 2, 0]
+
+    with pytest.raises(KiaraProcessingException, match="no column 'From'"):
+        create_network_tables(edges_table, "From", "Target")
@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for the array-based network helpers in `kiara_plugin.playground.utils.networks`."""
+
+import networkx as nx
+import numpy as np
+import pyarrow as pa
+import pytest
+from kiara.exceptions import KiaraProcessingException
+
+from kiara_plugin.playground.utils.networks import (
+    NetworkArrays,
+    augment_network_data,
+    calculate_degree,
+    calculate_weighted_degree,
+    create_ranking_table,
+    node_indexes,
+    rank_scores,
+)
+
+
+def create_multigraph_arrays(seed: int = 1, weighted: bool = False) -> NetworkArrays:
+
+    rng = np.random.default_rng(seed)
+    num_nodes = 40
+    sources = rng.integers(0, num_nodes, 200)
+    targets = rng.integers(0, num_nodes, 200)
+    weights = rng.integers(1, 5, 200).astype(np.float64) if weighted else None
+    return NetworkArrays(
+        num_nodes=num_nodes, sources=sources, targets=targets, weights=weights
+    )
+
+
+def create_multidigraph(arrays: NetworkArrays) -> nx.MultiDiGraph:
+
+    graph = nx.MultiDiGraph()
+    graph.add_nodes_from(range(arrays.num_nodes))
+    weights = arrays.edge_weights()
+    for u, v, w in zip(arrays.sources, arrays.targets, weights):
+        graph.add_edge(int(u), int(v), weight=w)
+    return graph
+
+
+def test_degree_matches_networkx():
+
+    arrays = create_multigraph_arrays()
+    graph = nx.Graph(create_multidigraph(arrays))
+    graph.remove_edges_from(list(nx.selfloop_edges(graph)))
+
+    degree = calculate_degree(arrays)
+    assert degree.tolist() == [graph.degree(n) for n in range(arrays.num_nodes)]
+
+
+@pytest.mark.parametrize("weighted", [False, True])
+def test_weighted_degree_matches_networkx(weighted):
+
+    arrays = create_multigraph_arrays(weighted=weighted)
+    graph = create_multidigraph(arrays)
+
+    weighted_degree = calculate_weighted_degree(arrays)
+    expected = [graph.degree(n, weight="weight") for n in range(arrays.num_nodes)]
+    assert np.allclose(weighted_degree, expected)
+
+
+def test_aggregate_parallel_edges():
+
+    arrays = NetworkArrays(
+        num_nodes=3,
+        sources=np.array([0, 0, 1, 0]),
+        targets=np.array([1, 1, 0, 2]),
+        weights=np.array([1.0, 2.0, 4.0, 8.0]),
+    )
+    inverse, summed = arrays.aggregate_parallel_edges()
+    assert summed[inverse].tolist() == [3.0, 3.0, 4.0, 8.0]
+
+
+def test_to_csr_parallel_edges():
+
+    # two parallel edges of length 1 between 0 and 1, and a detour of length 3 via 2
+    arrays = NetworkArrays(
+        num_nodes=3,
+        sources=np.array([0, 0, 1, 0, 2, 2]),
+        targets=np.array([1, 1, 0, 2, 1, 2]),
+        weights=np.array([1.0, 1.0, 1.0, 1.5, 1.5, 5.0]),
+    )
+
+    summed = arrays.to_csr(directed=True, weighted=True).toarray()
+    assert summed.tolist() == [[0.0, 2.0, 1.5], [1.0, 0.0, 0.0], [0.0, 1.5, 0.0]]
+    # distances: the shortest parallel edge counts, so the direct edge is still shorter than the detour
+    shortest = arrays.to_csr(directed=True, weighted=True, parallel_edges="min")
+    assert shortest.toarray().tolist() == [
+        [0.0, 1.0, 1.5],
+        [1.0, 0.0, 0.0],
+        [0.0, 1.5, 0.0],
+    ]
+    undirected = arrays.to_csr(directed=False, weighted=True, parallel_edges="min")
+    assert undirected.toarray().tolist() == [
+        [0.0, 1.0, 1.5],
+        [1.0, 0.0, 1.5],
+        [1.5, 1.5, 0.0],
+    ]
+    with pytest.raises(KiaraProcessingException, match="parallel edges"):
+        arrays.to_csr(parallel_edges="max")
+
+
+@pytest.mark.parametrize(
+    "method, expected",
+    [
+        ("competition", [1, 1, 3, 3, 5]),
+        ("dense", [1, 1, 2, 2, 3]),
+        ("ordinal", [1, 2, 3, 4, 5]),
+    ],
+)
+def test_rank_scores(method, expected):
+
+    order, ranks = rank_scores(np.array([1, 5, 3, 5, 3]), method=method)
+    assert order.tolist() == [1, 3, 2, 4, 0]
+    assert ranks.tolist() == expected
+
+
+@pytest.mark.parametrize("method", ["competition", "dense", "ordinal"])
+def test_rank_scores_top_k(method):
+
+    scores = np.random.default_rng(5).integers(0, 10, 500)
+    full_order, full_ranks = rank_scores(scores, method=method)
+
+    for top_k in (1, 7, 50, 499, 500, 600):
+        order, ranks = rank_scores(scores, method=method, top_k=top_k)
+        assert order.tolist() == full_order[:top_k].tolist()
+        assert ranks.tolist() == full_ranks[:top_k].tolist()
+
+
+def test_create_ranking_table():
+
+    columns = {"Score": np.array([0.1, 0.3, 0.2]), "Other": np.array([1, 2, 3])}
+    table = create_ranking_table(
+        pa.array([10, 3, 7]), columns, top_k=2, labels=pa.array(["a", "b", "c"])
+    )
+    assert table.column_names == ["Rank", "Node", "Label", "Score", "Other"]
+    assert table.column("Node").to_pylist() == [3, 7]
+    assert table.column("Label").to_pylist() == ["b", "c"]
+    assert table.column("Other").to_pylist() == [2, 3]
+
+    arrays = NetworkArrays(num_nodes=3, sources=np.array([]), targets=np.array([]))
+    table = create_ranking_table(arrays.node_ids, columns)
+    assert table.column_names == ["Rank", "Node", "Score", "Other"]
+    assert table.column("Node").to_pylist() == [1, 2, 0]
+
+
+def test_node_indexes():
+
+    nodes_table = pa.table({"_node_id": [10, 3, 7]})
+    assert node_indexes(nodes_table, np.array([7, 10, 3])).tolist() == [2, 0, 1]
+
+
+def test_augment_network_data():
+
+    from kiara_plugin.network_analysis.models import NetworkData
+
+    network_data = NetworkData.create_from_networkx_graph(nx.path_graph(4))
+    augmented = augment_network_data(
+        network_data, node_columns={"score": np.arange(4, dtype=np.float64)}
+    )
+    assert augmented.nodes.arrow_table.column("score").to_pylist() == [0, 1, 2, 3]
+    assert augmented.edges.arrow_table.num_rows == 3
+
+    # running again replaces the column instead of adding a second one
+    augmented = augment_network_data(augmented, node_columns={"score": np.ones(4)})
+    assert augmented.nodes.arrow_table.schema.names.count("score") == 1
+    assert augmented.nodes.arrow_table.column("score").to_pylist() == [1, 1, 1, 1]
+
+    with pytest.raises(KiaraProcessingException):
+        augment_network_data(network_data, node_columns={"score": np.ones(3)})
@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for the on-disk module result cache in `kiara_plugin.playground.utils.cache`."""
+
+import datetime
+import os
+
+import pyarrow as pa
+import pytest
+from kiara.exceptions import KiaraProcessingException
+
+from kiara_plugin.playground.utils import cache as result_cache
+from kiara_plugin.playground.utils.cache import (
+    CACHE_DIR_ENV_NAME,
+    CACHE_MAX_SIZE_ENV_NAME,
+    MEMORY_CACHE_MAX_ENTRIES,
+    ResultCache,
+    cached_process,
+    get_result_cache,
+    memoised_call,
+)
+from kiara_plugin.playground.utils.tables import count_by_day, rollup_counts
+
+
+class DummyValue(object):
+    def __init__(self, value_hash: str):
+        self.value_hash = value_hash
+
+
+class DummyInputs(object):
+    def __init__(self, **hashes: str):
+        self.hashes = hashes
+
+    @property
+    def field_names(self):
+        return list(self.hashes.keys())
+
+    def get_value_obj(self, field_name: str):
+        return DummyValue(self.hashes[field_name])
+
+    def get_value_data(self, field_name: str):
+        return self.hashes.get(field_name, None)
+
+
+class DummyOutputs(object):
+    def __init__(self):
+        self.values = {}
+
+    def set_values(self, **values):
+        self.values.update(values)
+
+
+class DummyModule(object):
+
+    module_type_name = "dummy"
+    module_instance_cid = "cid"
+
+    def __init__(self):
+        self.calls = 0
+
+    @cached_process("processes")
+    def process(self, inputs, outputs):
+        self.calls += 1
+        outputs.set_values(result=[self.calls])
+
+
+class DummyRandomModule(DummyModule):
+    @cached_process(seed_input="seed", random_inputs=("sample_size",))
+    def process(self, inputs, outputs):
+        self.calls += 1
+        outputs.set_values(result=[self.calls])
+
+
+def test_result_cache_get_put(tmp_path):
+
+    cache = ResultCache(str(tmp_path), max_size=1024 * 1024)
+    key = cache.create_key("module", "input_hash")
+    assert cache.create_key("module", "other_hash") != key
+
+    assert cache.get(key) is None
+    assert cache.put(key, {"a": [1, 2, 3]})
+    assert cache.get(key) == {"a": [1, 2, 3]}
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_result_cache_lru_eviction(tmp_path):
+
+    cache = ResultCache(str(tmp_path), max_size=3500)
+    keys = [cache.create_key(i) for i in range(3)]
+    for i, key in enumerate(keys):
+        cache.put(key, b"x" * 1000)
+        path = cache._entry_path(key)
+        os.utime(path, (i, i))
+
+    # using the oldest entry makes the second one the least recently used
+    assert cache.get(keys[0]) is not None
+    cache.put(cache.create_key(3), b"x" * 1000)
+
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None
+    assert cache.stats()["entries"] == 3
+    assert cache.evictions == 1
+
+    # too big for the whole cache
+    assert not cache.put(cache.create_key(4), b"x" * 5000)
+
+
+def test_result_cache_private_directory(tmp_path):
+
+    base_path = tmp_path / "results"
+    ResultCache(str(base_path), max_size=1024)
+    assert os.stat(base_path).st_mode & 0o777 == 0o700
+
+    # anyone who can write to the directory could make the cache unpickle arbitrary code
+    os.chmod(base_path, 0o777)
+    with pytest.raises(KiaraProcessingException, match="writable by other users"):
+        ResultCache(str(base_path), max_size=1024)
+
+
+def test_result_cache_broken_entry(tmp_path):
+
+    cache = ResultCache(str(tmp_path), max_size=1024 * 1024)
+    key = cache.create_key("broken")
+    cache.put(key, "value")
+    with open(cache._entry_path(key), "wb") as f:
+        f.write(b"not a pickle")
+
+    assert cache.get(key) is None
+    assert not os.path.exists(cache._entry_path(key))
+
+
+def test_cached_process(tmp_path, monkeypatch):
+
+    monkeypatch.setenv(CACHE_DIR_ENV_NAME, str(tmp_path))
+    monkeypatch.delenv(CACHE_MAX_SIZE_ENV_NAME, raising=False)
+    # caching is opt-in
+    assert get_result_cache() is None
+
+    monkeypatch.setenv(CACHE_MAX_SIZE_ENV_NAME, "16")
+    module = DummyModule()
+
+    def run(**hashes):
+        outputs = DummyOutputs()
+        module.process(DummyInputs(**hashes), outputs)
+        return outputs.values["result"]
+
+    assert run(network_data="a", processes="1") == [1]
+    # the number of processes doesn't influence the result
+    assert run(network_data="a", processes="4") == [1]
+    assert run(network_data="b", processes="1") == [2]
+    assert module.calls == 2
+    assert get_result_cache().hits == 1
+
+    monkeypatch.setenv(CACHE_MAX_SIZE_ENV_NAME, "0")
+    assert get_result_cache() is None
+    assert run(network_data="a", processes="1") == [3]
+
+
+def test_cached_process_unseeded(tmp_path, monkeypatch):
+
+    monkeypatch.setenv(CACHE_DIR_ENV_NAME, str(tmp_path))
+    monkeypatch.setenv(CACHE_MAX_SIZE_ENV_NAME, "16")
+    module = DummyRandomModule()
+
+    def run(**hashes):
+        outputs = DummyOutputs()
+        module.process(DummyInputs(**hashes), outputs)
+        return outputs.values["result"]
+
+    # exact results, and sampled ones with a seed are cached
+    assert run(network_data="a") == [1]
+    assert run(network_data="a") == [1]
+    assert run(network_data="a", sample_size="10", seed="1") == [2]
+    assert run(network_data="a", sample_size="10", seed="1") == [2]
+    # random results without a seed never are
+    assert run(network_data="a", sample_size="10") == [3]
+    assert run(network_data="a", sample_size="10") == [4]
+
+
+def test_memoised_call_without_result_cache(monkeypatch):
+
+    monkeypatch.delenv(CACHE_MAX_SIZE_ENV_NAME, raising=False)
+    monkeypatch.setattr(result_cache, "_MEMORY_CACHE", result_cache.OrderedDict())
+    table = pa.table(
+        {
+            "date": [datetime.date(2020, 1, 1), datetime.date(2020, 2, 1)],
+            "publication": ["a", "b"],
+        }
+    )
+    calls = []
+
+    def day_counts():
+        calls.append(1)
+        return count_by_day(table)
+
+    # like the dashboard: switching the granularity doesn't count the documents again
+    for granularity in ["day", "month", "year", "day"]:
+        counts = memoised_call(
+            "day_counts", ["table_hash", "date", "publication"], day_counts
+        )
+        rollup_counts(counts, granularity)
+    assert len(calls) == 1
+
+    for i in range(MEMORY_CACHE_MAX_ENTRIES):
+        memoised_call("day_counts", [i], day_counts)
+    memoised_call("day_counts", ["table_hash", "date", "publication"], day_counts)
+    assert len(calls) == MEMORY_CACHE_MAX_ENTRIES + 2
@@ -0,0 +1,298 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for the Arrow table helpers in `kiara_plugin.playground.utils.tables`."""
+
+import datetime
+
+import pyarrow as pa
+import pytest
+from kiara.exceptions import KiaraProcessingException
+
+from kiara_plugin.playground.utils.tables import (
+    count_by_day,
+    extract_dates,
+    extract_file_name_metadata,
+    map_values,
+    rollup_counts,
+    sample_table,
+    set_column,
+    validate_column_identifier,
+)
+
+
+def test_set_column():
+
+    table = pa.table({"a": [1, 2], "b": ["x", "y"]})
+
+    appended = set_column(table, "c", pa.array([True, False]))
+    assert appended.column_names == ["a", "b", "c"]
+    # the existing columns are not copied
+    assert appended.column("b").chunk(0).buffers()[2].address == (
+        table.column("b").chunk(0).buffers()[2].address
+    )
+
+    replaced = set_column(table, "a", pa.array([3, 4]))
+    assert replaced.column_names == ["a", "b"]
+    assert replaced.column("a").to_pylist() == [3, 4]
+
+    with pytest.raises(KiaraProcessingException, match="3 rows"):
+        set_column(table, "c", pa.array([1, 2, 3]))
+
+
+def test_set_column_with_token_lists():
+
+    table = pa.table({"text": ["a b", "c", ""]})
+    tokens = pa.chunked_array([[["a", "b"], ["c"]], [[]]], type=pa.list_(pa.string()))
+
+    result = set_column(table, "preprocessed_tokens", tokens)
+    assert result.schema.field("preprocessed_tokens").type == pa.list_(pa.string())
+    assert result.column("preprocessed_tokens").to_pylist() == [["a", "b"], ["c"], []]
+    # the token array is used as it is, not copied
+    assert result.column("preprocessed_tokens").chunk(0).values.buffers()[
+        2
+    ].address == (tokens.chunk(0).values.buffers()[2].address)
+
+
+def test_extract_file_name_metadata():
+
+    file_names = pa.chunked_array(
+        [
+            ["sn86069873_1900-01-05_ed-1_seq-1_ocr.txt"],
+            ["corpus/sn83045487_1912-12-31_ed-2_seq-4_ocr.txt"],
+        ]
+    )
+    publications, dates = extract_file_name_metadata(file_names)
+
+    assert publications.to_pylist() == ["sn86069873", "sn83045487"]
+    assert dates.to_pylist() == [
+        datetime.datetime(1900, 1, 5),
+        datetime.datetime(1912, 12, 31),
+    ]
+
+
+def test_extract_file_name_metadata_reports_all_invalid_names():
+
+    file_names = pa.array(
+        [
+            "sn86069873_1900-01-05_ed-1_seq-1_ocr.txt",
+            "readme.txt",
+            None,
+            "sn86069873_1900-13-05_ed-1_seq-1_ocr.txt",
+        ]
+    )
+    with pytest.raises(KiaraProcessingException) as e:
+        extract_file_name_metadata(file_names)
+
+    message = str(e.value)
+    assert "3 file name(s)" in message
+    assert "'readme.txt', None, 'sn86069873_1900-13-05" in message
+
+
+def test_extract_file_name_metadata_with_dates():
+
+    file_names = pa.array(
+        ["sn86069873_1900-01-05_ed-1_seq-1_ocr.txt", "readme_1900-01-05_.txt"]
+    )
+    dates = pa.array([datetime.datetime(1900, 1, 5)] * 2, type=pa.timestamp("ns"))
+
+    publications, result = extract_file_name_metadata(file_names[:1], dates=dates[:1])
+    assert publications.to_pylist() == ["sn86069873"]
+    # the dates are used as they are
+    assert result.equals(dates[:1])
+
+    # file names without a publication reference are invalid, even if they have a date
+    with pytest.raises(KiaraProcessingException, match="1 file name"):
+        extract_file_name_metadata(file_names, dates=dates)
+    with pytest.raises(KiaraProcessingException, match="1 dates for 2 file names"):
+        extract_file_name_metadata(file_names, dates=dates[:1])
+
+
+def test_extract_dates():
+
+    values = pa.chunked_array(
+        [
+            ["sn86069873_1900-01-05_ed-1_seq-1_ocr.txt", "sn86069873_1900-13-05_x"],
+            ["sn86069873_05.01.1901_x", "readme.txt", None],
+        ]
+    )
+
+    dates, missing = extract_dates(values, min_index=11, max_index=21)
+    assert dates.type == pa.timestamp("ns")
+    assert dates.to_pylist() == [datetime.datetime(1900, 1, 5), None, None, None, None]
+    assert missing.to_pylist() == [False, True, True, True, True]
+
+    # patterns and formats are tried in order
+    dates, missing = extract_dates(
+        values,
+        patterns=[r"_(?P<date>\d{4}-\d{2}-\d{2})_", r"_(?P<date>[\d.]+)_"],
+        formats=["%Y-%m-%d", "%d.%m.%Y"],
+    )
+    assert dates.to_pylist() == [
+        datetime.datetime(1900, 1, 5),
+        None,
+        datetime.datetime(1901, 1, 5),
+        None,
+        None,
+    ]
+    assert missing.to_pylist() == [False, True, False, True, True]
+
+    with pytest.raises(KiaraProcessingException, match="no valid date in 4 value"):
+        extract_dates(values, min_index=11, max_index=21, force_non_null=True)
+    with pytest.raises(KiaraProcessingException, match="group named 'date'"):
+        extract_dates(values, patterns=[r"\d{4}"])
+
+
+def test_map_values_matches_pandas_replace():
+
+    import pandas as pd
+
+    column = pa.chunked_array([["a", "b", None, "c"], ["a", "d"]])
+    keys, values = ["a", "c", "x", "a"], ["A", "C", "X", "A2"]
+    mapped = map_values(column, keys, values)
+
+    expected = pd.Series(column.to_pylist()).replace(to_replace=keys, value=values)
+    assert mapped.to_pylist() == [
+        None if pd.isna(value) else value for value in expected
+    ]
+    assert mapped.to_pylist() == ["A2", "b", None, "C", "A2", "d"]
+
+
+def test_map_values_unmapped_policies():
+
+    column = pa.array([1, 2, 3, 2])
+
+    assert map_values(column, [1, 2], ["one", "two"], unmapped="null").to_pylist() == [
+        "one",
+        "two",
+        None,
+        "two",
+    ]
+    assert map_values(column, [1, 2], ["one", "two"]).to_pylist() == [
+        "one",
+        "two",
+        "3",
+        "two",
+    ]
+    with pytest.raises(KiaraProcessingException, match="1 value"):
+        map_values(column, [1, 2], ["one", "two"], unmapped="error")
+    with pytest.raises(KiaraProcessingException, match="2 keys"):
+        map_values(column, [1, 2], ["one"])
+
+
+def test_map_values_mixed_types():
+
+    # arrow arrays can't have mixed types, so the mapping falls back to strings
+    column = pa.array(["a", "b", "c", None])
+    assert map_values(column, ["a", "b"], ["x", 1]).to_pylist() == ["x", "1", "c", None]
+    assert map_values(pa.array([1, 2, 3]), [1, "2"], ["one", "two"]).to_pylist() == [
+        "one",
+        "two",
+        "3",
+    ]
+
+
+def test_sample_table():
+
+    table = pa.table({"a": list(range(1000)), "b": [str(i) for i in range(1000)]})
+
+    sample = sample_table(table, 15, seed=1, batch_size=7)
+    assert sample.num_rows == 15
+    assert sample.column_names == ["a", "b"]
+    rows = sample.column("a").to_pylist()
+    assert rows == sorted(rows)
+    assert sample.column("b").to_pylist() == [str(i) for i in rows]
+
+    # the sample only depends on the seed, not on the batches
+    assert sample_table(table, 15, seed=1, batch_size=1000).equals(sample)
+    assert not sample_table(table, 15, seed=2).equals(sample)
+
+    assert sample_table(table.slice(0, 10), 15, seed=1).num_rows == 10
+
+
+def test_sample_table_is_uniform():
+
+    table = pa.table({"a": list(range(10))})
+    counts = [0] * 10
+    for seed in range(2000):
+        for row in sample_table(table, 3, seed=seed, batch_size=4).column("a"):
+            counts[row.as_py()] += 1
+    # every row is expected in 600 samples
+    assert all(500 < count < 700 for count in counts)
+
+
+def test_sample_table_stratified():
+
+    table = pa.table(
+        {
+            "publication": ["a", "b", "a", None, "b", "a", "c"] * 10,
+            "date": [datetime.date(1900 + i % 3, 1, 1) for i in range(70)],
+        }
+    )
+
+    sample = sample_table(table, 2, seed=1, stratify_by="publication", batch_size=5)
+    publications = sample.column("publication").to_pylist()
+    assert sorted(publications, key=str) == sorted(
+        ["a", "a", "b", "b", "c", "c", None, None], key=str
+    )
+
+    # dates are grouped by year
+    sample = sample_table(table, 4, seed=1, stratify_by="date")
+    assert (
+        sorted(d.year for d in sample.column("date").to_pylist())
+        == [1900] * 4 + [1901] * 4 + [1902] * 4
+    )
+
+
+def test_count_by_day_and_rollup():
+
+    table = pa.table(
+        {
+            "date": pa.array(
+                [
+                    datetime.datetime(1900, 1, 5, 12),
+                    datetime.datetime(1900, 1, 5),
+                    datetime.datetime(1900, 1, 6),
+                    datetime.datetime(1900, 2, 1),
+                    datetime.datetime(1901, 1, 1),
+                ],
+                type=pa.timestamp("ns"),
+            ),
+            "publication": ["b", "b", "a", "b", "b"],
+        }
+    )
+
+    day_counts = count_by_day(table)
+    assert day_counts.column_names == ["date", "publication_name", "count"]
+    assert day_counts.to_pylist() == [
+        {"date": datetime.date(1900, 1, 5), "publication_name": "b", "count": 2},
+        {"date": datetime.date(1900, 1, 6), "publication_name": "a", "count": 1},
+        {"date": datetime.date(1900, 2, 1), "publication_name": "b", "count": 1},
+        {"date": datetime.date(1901, 1, 1), "publication_name": "b", "count": 1},
+    ]
+    assert rollup_counts(day_counts, "day").equals(day_counts)
+
+    assert rollup_counts(day_counts, "month").to_pylist() == [
+        {"date": datetime.date(1900, 1, 1), "publication_name": "a", "count": 1},
+        {"date": datetime.date(1900, 1, 1), "publication_name": "b", "count": 2},
+        {"date": datetime.date(1900, 2, 1), "publication_name": "b", "count": 1},
+        {"date": datetime.date(1901, 1, 1), "publication_name": "b", "count": 1},
+    ]
+    assert rollup_counts(day_counts, "year").to_pylist() == [
+        {"date": datetime.date(1900, 1, 1), "publication_name": "a", "count": 1},
+        {"date": datetime.date(1900, 1, 1), "publication_name": "b", "count": 3},
+        {"date": datetime.date(1901, 1, 1), "publication_name": "b", "count": 1},
+    ]
+
+    with pytest.raises(KiaraProcessingException, match="granularity 'week'"):
+        rollup_counts(day_counts, "week")
+    with pytest.raises(KiaraProcessingException, match="not a date"):
+        count_by_day(table, date_column_name="publication")
+
+
+def test_validate_column_identifier():
+
+    assert validate_column_identifier("publication_2") == "publication_2"
+    for column_name in ("2publication", "publication; DROP TABLE data", 'a"b', ""):
+        with pytest.raises(KiaraProcessingException, match="Invalid column name"):
+            validate_column_identifier(column_name)